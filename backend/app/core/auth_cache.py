@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+# Кэш проверенных токенов: token -> снимок пользователя. Запись живет не дольше
+# ttl_seconds и не дольше срока действия самого токена (exp), при переполнении
+# вытесняются давно не использованные записи. Кэш локален для процесса, поэтому
+# после изменения профиля записи пользователя нужно сбросить через invalidate_user.
+class TokenUserCache:
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: int = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, token: str) -> Optional[Any]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        expires_at, username, user = entry
+        if expires_at <= time.time():
+            self._remove(token, username)
+            self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(token)
+        self._stats["hits"] += 1
+        return user
+
+    def put(self, token: str, username: str, user: Any, token_expires_at: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        if token in self._entries:
+            self._remove(token, self._entries[token][1])
+        self._entries[token] = (expires_at, username, user)
+        self._tokens_by_user.setdefault(username, set()).add(token)
+        while len(self._entries) > self.max_entries:
+            oldest, (_, oldest_username, _) = next(iter(self._entries.items()))
+            self._remove(oldest, oldest_username)
+            self._stats["evictions"] += 1
+
+    def invalidate_user(self, username: str) -> int:
+        tokens = self._tokens_by_user.pop(username, set())
+        for token in tokens:
+            self._entries.pop(token, None)
+        self._stats["invalidations"] += len(tokens)
+        return len(tokens)
+
+    def _remove(self, token: str, username: str) -> None:
+        self._entries.pop(token, None)
+        tokens = self._tokens_by_user.get(username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[username]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
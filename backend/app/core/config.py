@@ -15,10 +15,76 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Пул потоков для bcrypt (0 — по числу ядер, но не больше 4) и лимит очереди до 429
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_PENDING: int = 32
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./audiobridge.db")
     
+    # SQLite: WAL позволяет читать параллельно с записью, busy_timeout — ждать
+    # освобождения блокировки вместо немедленной ошибки "database is locked"
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+    
+    # Пул соединений одного воркера; всего соединений: воркеры * (size + overflow)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 3600
+    
+    # Play sessions ("memory" — only for a single worker and tests)
+    PLAY_SESSION_BACKEND: str = os.getenv("PLAY_SESSION_BACKEND", "sqlite")
+    PLAY_SESSION_TTL_SECONDS: int = 6 * 60 * 60
+    PLAY_SESSION_MAX_ENTRIES: int = 100_000
+    # Прослушивание засчитывается, если с /play до /play-complete прошло не меньше
+    PLAY_MIN_DURATION_SECONDS: int = 25
+    
+    # Фоновые задачи: сверка счетчиков и пересборка структур в памяти
+    COUNTER_RECONCILE_INTERVAL_SECONDS: int = 3600
+    TRACK_SAMPLER_REFRESH_SECONDS: int = 300
+    TRENDING_REFRESH_SECONDS: int = 600
+    TRENDING_RERANK_SECONDS: float = 5
+    SUGGEST_REFRESH_SECONDS: int = 300
+    
+    # Буфер прослушиваний пишется пачкой раз в FLUSH_INTERVAL_MS или по достижении MAX_EVENTS
+    PLAY_BUFFER_FLUSH_INTERVAL_MS: int = 250
+    PLAY_BUFFER_MAX_EVENTS: int = 500
+    
+    # Caches
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    RESPONSE_CACHE_TTL_SECONDS: int = 30
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    
+    # API
+    RANDOM_RECENT_HISTORY: int = 20
+    COMMENT_REPLIES_PREVIEW: int = 3
+    MAX_TRACK_UPLOAD_MB: int = 100
+    MAX_IMAGE_UPLOAD_MB: int = 10
+    
+    # Обработка аудио: процессы анализа, воркеры очереди перекодирования и ffmpeg
+    MEDIA_WORKERS: int = 2
+    TRANSCODE_WORKERS: int = 1
+    FFMPEG_BINARY: str = "ffmpeg"
+    
+    # Uploaded files: "local" — каталог STORAGE_LOCAL_ROOT на этом узле,
+    # "s3" — бакет S3/MinIO, общий для всех узлов (нужен boto3; ключи доступа
+    # берутся из AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_LOCAL_ROOT: str = os.getenv("STORAGE_LOCAL_ROOT", "uploads")
+    # Локальный каталог для загрузок до переноса в хранилище (по умолчанию для local —
+    # STORAGE_LOCAL_ROOT/.staging, для s3 — во временном каталоге). Для local лучше
+    # держать его на том же разделе, что и STORAGE_LOCAL_ROOT: put() тогда — rename
+    STORAGE_STAGING_DIR: Optional[str] = os.getenv("STORAGE_STAGING_DIR")
+    S3_BUCKET: Optional[str] = os.getenv("S3_BUCKET")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "")
+    S3_ENDPOINT_URL: Optional[str] = os.getenv("S3_ENDPOINT_URL")
+    S3_REGION: Optional[str] = os.getenv("S3_REGION")
+    
     class Config:
         case_sensitive = True
 
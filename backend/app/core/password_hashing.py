@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+# Хеширование паролей (bcrypt — сотни миллисекунд CPU) в отдельном пуле потоков:
+# bcrypt отпускает GIL, поэтому event loop продолжает обслуживать запросы.
+# Число запросов в работе и в очереди ограничено; сверх лимита сразу отвечаем 429,
+# чтобы поток логинов не копил бесконечную очередь.
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+class PasswordHashPool:
+    def __init__(self, context: CryptContext, max_workers: Optional[int] = None, max_pending: int = 32):
+        self.context = context
+        self.max_workers = max_workers or DEFAULT_WORKERS
+        self.max_in_flight = self.max_workers + max_pending
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        # Задачи завершаются в потоках пула, поэтому счетчики под блокировкой
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"completed": 0, "failed": 0, "cancelled": 0, "rejected": 0, "max_in_flight": 0}
+
+    def _release(self, future: Future) -> None:
+        # Место освобождается, когда задача в пуле закончилась или отменена до
+        # старта, а не когда отменен ожидающий ее запрос: bcrypt в это время
+        # еще занимает поток, и лимит max_in_flight иначе можно превысить
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                self._stats["cancelled"] += 1
+            elif future.exception() is not None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self._stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many authentication requests, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "in_flight": self._in_flight,
+                "workers": self.max_workers,
+                "capacity": self.max_in_flight,
+            }
+
+# Один пул на процесс: его используют и main.py, и app/utils/security.py
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_pool = PasswordHashPool(
+    pwd_context,
+    max_workers=settings.PASSWORD_HASH_WORKERS or None,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
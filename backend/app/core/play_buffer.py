@@ -0,0 +1,99 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+PlayEvent = Tuple[str, str, datetime]
+
+# Буфер прослушиваний с отложенной записью. Повторные (track_id, username)
+# отбрасываются в памяти, а накопленные события передаются в flush пачкой раз в
+# flush_interval_ms или сразу по достижении max_events — всплеск слушателей
+# стоит одну транзакцию вместо транзакции на каждый запрос. flush выполняется
+# в threadpool и возвращает число реально сохраненных прослушиваний.
+class PlayEventBuffer:
+    def __init__(
+        self,
+        flush: Callable[[List[PlayEvent]], int],
+        max_events: int = 500,
+        flush_interval_ms: int = 250,
+    ):
+        self._flush = flush
+        self.max_events = max_events
+        self.flush_interval = flush_interval_ms / 1000
+        self._pending: Dict[Tuple[str, str], datetime] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "events_received": 0,
+            "events_deduplicated": 0,
+            "plays_stored": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "last_flush_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    def add(self, track_id: str, username: str) -> bool:
+        self._stats["events_received"] += 1
+        key = (track_id, username)
+        if key in self._pending:
+            self._stats["events_deduplicated"] += 1
+            return False
+        self._pending[key] = datetime.utcnow()
+        if len(self._pending) >= self.max_events:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            events = [(track_id, username, played_at) for (track_id, username), played_at in batch.items()]
+            started = time.perf_counter()
+            try:
+                stored = await run_in_threadpool(self._flush, events)
+            except Exception as e:
+                # Возвращаем события в буфер, чтобы не потерять их до следующей попытки
+                for key, played_at in batch.items():
+                    self._pending.setdefault(key, played_at)
+                self._stats["flush_errors"] += 1
+                print(f"Error flushing play events: {str(e)}")
+                return 0
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._stats["flushes"] += 1
+            self._stats["plays_stored"] += stored
+            self._stats["last_flush_size"] = len(events)
+            self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 2)
+            return stored
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> dict:
+        return {**self._stats, "pending": len(self._pending)}
@@ -0,0 +1,145 @@
+import heapq
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Хранилище начала прослушиваний: (track_id, user_id) -> unix-время старта.
+# Записи старше ttl_seconds считаются брошенными и удаляются.
+
+class PlaySessionStore(ABC):
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def start(self, track_id: str, user_id: str, started_at: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def pop(self, track_id: str, user_id: str) -> Optional[float]:
+        ...
+
+    @abstractmethod
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        ...
+
+class MemoryPlaySessionStore(PlaySessionStore):
+    # Локальное хранилище одного процесса (для тестов и запуска в один воркер).
+    # Ограничено по размеру: при переполнении вытесняются записи с самым ранним
+    # стартом. start() может получить и более раннее время (сессию возвращают
+    # после слишком короткого прослушивания), поэтому порядок по времени держит
+    # куча; записи кучи, которые уже перезаписаны или удалены, пропускаются.
+    def __init__(self, ttl_seconds: int, max_entries: int = 100_000):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._sessions: Dict[Tuple[str, str], float] = {}
+        self._heap: List[Tuple[float, Tuple[str, str]]] = []
+
+    def start(self, track_id: str, user_id: str, started_at: Optional[float] = None) -> None:
+        key = (track_id, user_id)
+        started_at = started_at if started_at is not None else time.time()
+        self._sessions[key] = started_at
+        heapq.heappush(self._heap, (started_at, key))
+        self.purge_expired()
+        while len(self._sessions) > self.max_entries:
+            self._pop_earliest()
+        if len(self._heap) > 2 * len(self._sessions) + 64:
+            self._heap = [(started_at, key) for key, started_at in self._sessions.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_earliest(self) -> Optional[float]:
+        while self._heap:
+            started_at, key = heapq.heappop(self._heap)
+            if self._sessions.get(key) == started_at:
+                del self._sessions[key]
+                return started_at
+        return None
+
+    def pop(self, track_id: str, user_id: str) -> Optional[float]:
+        started_at = self._sessions.pop((track_id, user_id), None)
+        if started_at is None or started_at < time.time() - self.ttl_seconds:
+            return None
+        return started_at
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        deadline = (now if now is not None else time.time()) - self.ttl_seconds
+        purged = 0
+        while self._heap and self._heap[0][0] < deadline:
+            started_at, key = heapq.heappop(self._heap)
+            if self._sessions.get(key) == started_at:
+                del self._sessions[key]
+                purged += 1
+        return purged
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+class SQLitePlaySessionStore(PlaySessionStore):
+    # Общее для всех воркеров хранилище в базе приложения, переживает перезапуск
+    PURGE_EVERY = 1000
+
+    def __init__(self, engine: Engine, ttl_seconds: int):
+        super().__init__(ttl_seconds)
+        self.engine = engine
+        self._starts_since_purge = 0
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE IF NOT EXISTS play_sessions ("
+                "track_id VARCHAR NOT NULL, "
+                "user_id VARCHAR NOT NULL, "
+                "started_at REAL NOT NULL, "
+                "PRIMARY KEY (track_id, user_id)"
+                ") WITHOUT ROWID"
+            ))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_play_sessions_started_at ON play_sessions (started_at)"
+            ))
+
+    def start(self, track_id: str, user_id: str, started_at: Optional[float] = None) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                text("INSERT OR REPLACE INTO play_sessions (track_id, user_id, started_at) "
+                     "VALUES (:track_id, :user_id, :started_at)"),
+                {
+                    "track_id": track_id,
+                    "user_id": user_id,
+                    "started_at": started_at if started_at is not None else time.time(),
+                },
+            )
+        self._starts_since_purge += 1
+        if self._starts_since_purge >= self.PURGE_EVERY:
+            self._starts_since_purge = 0
+            self.purge_expired()
+
+    def pop(self, track_id: str, user_id: str) -> Optional[float]:
+        params = {"track_id": track_id, "user_id": user_id}
+        with self.engine.begin() as connection:
+            started_at = connection.execute(
+                text("SELECT started_at FROM play_sessions WHERE track_id = :track_id AND user_id = :user_id"),
+                params,
+            ).scalar()
+            deleted = connection.execute(
+                text("DELETE FROM play_sessions WHERE track_id = :track_id AND user_id = :user_id"),
+                params,
+            ).rowcount
+        # Если другой воркер уже забрал эту запись, прослушивание засчитывается только ему
+        if not deleted or started_at is None or started_at < time.time() - self.ttl_seconds:
+            return None
+        return started_at
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        deadline = (now if now is not None else time.time()) - self.ttl_seconds
+        with self.engine.begin() as connection:
+            return connection.execute(
+                text("DELETE FROM play_sessions WHERE started_at < :deadline"),
+                {"deadline": deadline},
+            ).rowcount
+
+def create_play_session_store(backend: str, ttl_seconds: int, max_entries: int, engine: Engine) -> PlaySessionStore:
+    if backend == "memory":
+        return MemoryPlaySessionStore(ttl_seconds, max_entries)
+    if backend == "sqlite":
+        return SQLitePlaySessionStore(engine, ttl_seconds)
+    raise ValueError(f"Unknown play session backend: {backend}")
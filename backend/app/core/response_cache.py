@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, NamedTuple, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+# Кэш сериализованных JSON-ответов. Каждая запись помнит версии сущностей, из
+# которых собрана ("track:<id>", "user:<name>", ...); обработчики записи
+# увеличивают версию через bump, и запись с устаревшей версией больше не отдается.
+# Версии локальны для процесса, поэтому запись живет не дольше ttl_seconds —
+# это ограничивает устаревание при изменениях из других воркеров.
+# ETag — хеш тела, поэтому он сильный и не зависит от процесса и перезапусков.
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    versions: Dict[str, int]
+    expires_at: float
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match сравнивается слабо (RFC 9110), "*" совпадает с любым ответом
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 2048, ttl_seconds: int = 30):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._clock = 0
+        # bump вызывается и из threadpool (сброс прослушиваний, фоновые задачи)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "not_modified": 0}
+
+    def bump(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._clock += 1
+                self._versions[key] = self._clock
+
+    def snapshot(self, keys: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            return {key: self._versions.get(key, 0) for key in keys}
+
+    def get(self, cache_key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            current = all(self._versions.get(key, 0) == version for key, version in entry.versions.items())
+            if not current or entry.expires_at <= time.time():
+                del self._entries[cache_key]
+                self._stats["stale"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, cache_key: Hashable, body: bytes, versions: Dict[str, int]) -> CachedBody:
+        entry = CachedBody(body, body_etag(body), versions, time.time() + self.ttl_seconds)
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+async def cached_json_response(
+    request: Request,
+    cache: ResponseCache,
+    cache_key: Hashable,
+    depends_on: Iterable[str],
+    build: Callable[[], Awaitable[Any]],
+) -> Response:
+    # Версии снимаются до чтения из базы: если запись в базу успеет произойти
+    # во время сборки, сохраненный ответ сразу окажется устаревшим, а не "свежим"
+    entry = cache.get(cache_key)
+    if entry is None:
+        versions = cache.snapshot(depends_on)
+        body = JSONResponse(jsonable_encoder(await build())).body
+        entry = cache.put(cache_key, body, versions)
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, entry.etag):
+        cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
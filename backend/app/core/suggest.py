@@ -0,0 +1,181 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Подсказки при наборе поиска. Нормализованные названия треков и имена
+# пользователей лежат в префиксном дереве; ключи — название целиком и каждый его
+# хвост, начинающийся с нового слова ("crazy love" находится и по "lo").
+# Каждый узел хранит top-k записей своего поддерева по популярности, поэтому
+# ответ — спуск на длину префикса и срез готового списка, без обхода поддерева.
+# Глубина дерева ограничена MAX_KEY_DEPTH символами: более длинные ключи
+# заканчиваются в узле этой глубины, и для длинных запросов его записи
+# фильтруются по полному ключу. Добавление вставляет запись в top узлов на пути
+# к корню, удаление пересчитывает только узлы, в top которых она была;
+# популярность обновляется периодической пересборкой.
+
+MAX_SUGGESTIONS = 20
+MAX_KEY_DEPTH = 8
+MAX_KEY_WORDS = 8
+
+EntryId = Tuple[str, str]
+
+class Suggestion(NamedTuple):
+    kind: str
+    id: str
+    text: str
+    detail: Optional[str]
+    score: float
+    keys: Tuple[str, ...]
+
+    @property
+    def entry_id(self) -> EntryId:
+        return (self.kind, self.id)
+
+def normalize(value: Optional[str]) -> str:
+    # Нижний регистр, без диакритики, любые разделители — один пробел
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", stripped))
+
+def suggestion_keys(*values: Optional[str]) -> Tuple[str, ...]:
+    keys = []
+    for value in values:
+        words = normalize(value).split()[:MAX_KEY_WORDS]
+        keys.extend(" ".join(words[index:]) for index in range(len(words)))
+    return tuple(dict.fromkeys(keys))
+
+def _rank(entry: Suggestion):
+    return (-entry.score, entry.text, entry.id)
+
+class _Node:
+    __slots__ = ("children", "terminal", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Записи, ключ которых заканчивается здесь (или обрезан на MAX_KEY_DEPTH)
+        self.terminal: Dict[EntryId, Suggestion] = {}
+        self.top: List[Suggestion] = []
+
+    def refresh(self, size: int) -> None:
+        candidates = {entry.entry_id: entry for entry in self.terminal.values()}
+        for child in self.children.values():
+            for entry in child.top:
+                candidates.setdefault(entry.entry_id, entry)
+        self.top = heapq.nsmallest(size, candidates.values(), key=_rank)
+
+    def offer(self, entry: Suggestion, size: int) -> None:
+        if len(self.top) >= size and _rank(entry) >= _rank(self.top[-1]):
+            return
+        if any(current.entry_id == entry.entry_id for current in self.top):
+            return
+        bisect.insort(self.top, entry, key=_rank)
+        del self.top[size:]
+
+    def holds(self, entry_id: EntryId) -> bool:
+        return any(current.entry_id == entry_id for current in self.top)
+
+class SuggestIndex:
+    def __init__(self, top_size: int = MAX_SUGGESTIONS):
+        self.top_size = top_size
+        self._root = _Node()
+        self._entries: Dict[EntryId, Suggestion] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, entries: Iterable[Suggestion]) -> None:
+        # Новое дерево строится целиком, top считается одним обходом снизу вверх
+        root, indexed = _Node(), {}
+        for entry in entries:
+            if entry.keys:
+                indexed[entry.entry_id] = entry
+                for key in entry.keys:
+                    self._path(root, key, create=True)[-1].terminal[entry.entry_id] = entry
+        self._refresh_all(root)
+        with self._lock:
+            self._root, self._entries = root, indexed
+
+    def add(self, entry: Suggestion) -> None:
+        with self._lock:
+            self._remove(entry.entry_id)
+            if not entry.keys:
+                return
+            self._entries[entry.entry_id] = entry
+            for key in entry.keys:
+                path = self._path(self._root, key, create=True)
+                path[-1].terminal[entry.entry_id] = entry
+                for node in path:
+                    node.offer(entry, self.top_size)
+
+    def remove(self, kind: str, entry_id: str) -> None:
+        with self._lock:
+            self._remove((kind, entry_id))
+
+    def get(self, kind: str, entry_id: str) -> Optional[Suggestion]:
+        return self._entries.get((kind, entry_id))
+
+    def suggest(self, query: str, limit: int = 10) -> List[Suggestion]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            path = self._path(self._root, prefix)
+            if path is None:
+                return []
+            node = path[-1]
+            if len(prefix) > MAX_KEY_DEPTH:
+                # Ключи обрезаны по глубине — дальше сравниваем полные ключи записей
+                candidates = [
+                    entry for entry in node.terminal.values()
+                    if any(key.startswith(prefix) for key in entry.keys)
+                ]
+                candidates.sort(key=_rank)
+            else:
+                candidates = node.top
+            return candidates[:limit]
+
+    def _path(self, root: _Node, key: str, create: bool = False) -> Optional[List[_Node]]:
+        node, path = root, [root]
+        for char in key[:MAX_KEY_DEPTH]:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    def _refresh_path(self, path: List[_Node], key: str, entry_id: EntryId) -> None:
+        # Снизу вверх пересчитываются узлы, где была удаляемая запись; пустые узлы
+        # удаляются из родителя. Если у записи есть другой ключ в том же поддереве,
+        # она вернется в top предков и уйдет из них при обработке этого ключа
+        chars = key[:MAX_KEY_DEPTH]
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            if node.holds(entry_id):
+                node.refresh(self.top_size)
+            if depth and not node.top and not node.children:
+                del path[depth - 1].children[chars[depth - 1]]
+
+    def _remove(self, entry_id: EntryId) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for key in entry.keys:
+            path = self._path(self._root, key)
+            if path is None:
+                continue
+            path[-1].terminal.pop(entry_id, None)
+            self._refresh_path(path, key, entry_id)
+
+    def _refresh_all(self, node: _Node) -> None:
+        for child in node.children.values():
+            self._refresh_all(child)
+        node.refresh(self.top_size)
@@ -0,0 +1,156 @@
+import random
+import threading
+from collections import OrderedDict, deque
+from typing import Collection, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+# Выбор случайного трека без чтения всей таблицы. id треков хранятся в массиве
+# (удаление — перестановкой последнего элемента на место удаляемого), поэтому
+# равновероятный выбор стоит O(1). Для выбора с весом по прослушиваниям или лайкам
+# веса лежат в дереве Фенвика: выбор и обновление веса — O(log n).
+# Вес трека — счетчик + 1, чтобы треки без прослушиваний тоже могли выпасть.
+
+MODES = ("uniform", "plays", "likes")
+WEIGHTED_MODES = ("plays", "likes")
+
+class FenwickTree:
+    def __init__(self):
+        self._tree: List[int] = [0]
+        self._values: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _prefix(self, count: int) -> int:
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+
+    def append(self, value: int) -> None:
+        self._values.append(value)
+        index = len(self._values)
+        # Узел index покрывает элементы (index - lowbit, index]
+        self._tree.append(value + self._prefix(index - 1) - self._prefix(index - (index & -index)))
+
+    def add(self, position: int, delta: int) -> None:
+        self._values[position] += delta
+        index = position + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def set(self, position: int, value: int) -> None:
+        self.add(position, value - self._values[position])
+
+    def pop(self) -> int:
+        # Последний элемент не входит ни в один узел с меньшим номером
+        self._tree.pop()
+        return self._values.pop()
+
+    def value(self, position: int) -> int:
+        return self._values[position]
+
+    def total(self) -> int:
+        return self._prefix(len(self._values))
+
+    def find(self, target: int) -> int:
+        # Наименьшая позиция, у которой префиксная сумма больше target
+        position = 0
+        step = 1 << (len(self._tree).bit_length())
+        while step:
+            next_position = position + step
+            if next_position < len(self._tree) and self._tree[next_position] <= target:
+                position = next_position
+                target -= self._tree[next_position]
+            step >>= 1
+        return position
+
+class TrackSampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._weights: Dict[str, FenwickTree] = {mode: FenwickTree() for mode in WEIGHTED_MODES}
+
+    def load(self, rows: Iterable[Tuple[str, int, int]]) -> None:
+        # Полная пересборка: rows — (id, plays, likes_count)
+        ids, positions = [], {}
+        weights = {mode: FenwickTree() for mode in WEIGHTED_MODES}
+        for track_id, plays, likes in rows:
+            positions[track_id] = len(ids)
+            ids.append(track_id)
+            weights["plays"].append((plays or 0) + 1)
+            weights["likes"].append((likes or 0) + 1)
+        with self._lock:
+            self._ids, self._positions, self._weights = ids, positions, weights
+
+    def add(self, track_id: str, plays: int = 0, likes: int = 0) -> None:
+        with self._lock:
+            if track_id in self._positions:
+                return
+            self._positions[track_id] = len(self._ids)
+            self._ids.append(track_id)
+            self._weights["plays"].append(plays + 1)
+            self._weights["likes"].append(likes + 1)
+
+    def remove(self, track_id: str) -> None:
+        with self._lock:
+            position = self._positions.pop(track_id, None)
+            if position is None:
+                return
+            last_id = self._ids.pop()
+            for tree in self._weights.values():
+                last_weight = tree.pop()
+                if position < len(self._ids):
+                    tree.set(position, last_weight)
+            if position < len(self._ids):
+                self._ids[position] = last_id
+                self._positions[last_id] = position
+
+    def bump(self, track_id: str, mode: str, delta: int) -> None:
+        with self._lock:
+            position = self._positions.get(track_id)
+            if position is None:
+                return
+            tree = self._weights[mode]
+            tree.set(position, max(1, tree.value(position) + delta))
+
+    def _pick(self, mode: str) -> str:
+        if mode == "uniform":
+            return self._ids[random.randrange(len(self._ids))]
+        tree = self._weights[mode]
+        return self._ids[tree.find(random.randrange(tree.total()))]
+
+    def sample(self, mode: str = "uniform", exclude: Collection[str] = (), attempts: int = 8) -> Optional[str]:
+        # Недавно прослушанные треки отсеиваются повторной попыткой; если библиотека
+        # почти вся в exclude, после attempts попыток отдаем что выпало
+        with self._lock:
+            if not self._ids:
+                return None
+            track_id = self._pick(mode)
+            for _ in range(attempts - 1):
+                if track_id not in exclude:
+                    break
+                track_id = self._pick(mode)
+            return track_id
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+class RecentTracks:
+    # Последние выданные пользователю треки, чтобы shuffle не повторялся
+    def __init__(self, size: int = 20, max_users: int = 10_000):
+        self.size = size
+        self.max_users = max_users
+        self._recent: "OrderedDict[str, Deque[str]]" = OrderedDict()
+
+    def remember(self, username: str, track_id: str) -> None:
+        history = self._recent.pop(username, None) or deque(maxlen=self.size)
+        history.append(track_id)
+        self._recent[username] = history
+        while len(self._recent) > self.max_users:
+            self._recent.popitem(last=False)
+
+    def get(self, username: str) -> Set[str]:
+        return set(self._recent.get(username, ()))
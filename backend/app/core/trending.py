@@ -0,0 +1,132 @@
+import bisect
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# Тренды: у каждого трека в каждом окне есть счет — сумма весов прослушиваний и
+# лайков, затухающая экспоненциально с периодом полураспада окна. Чтобы не
+# пересчитывать затухание при каждом событии, вес события хранится как
+# weight * 2 ** ((t - epoch) / half_life): затухание у всех треков одинаковое,
+# поэтому порядок не меняется, а новое событие просто прибавляется к счету.
+# Периодически счета пересобираются из базы (события старше горизонта окна
+# выпадают), а между пересборками обновляются инкрементально в этом процессе.
+#
+# Для сортировки и курсора используется log2 счета в абсолютной шкале
+# (log2(score) + epoch / half_life) — он не зависит ни от текущего времени,
+# ни от epoch, поэтому курсор остается валидным после пересборки.
+
+PLAY_WEIGHT = 1.0
+LIKE_WEIGHT = 3.0
+HOUR = 3600
+DAY = 24 * HOUR
+
+# окно: (период полураспада, горизонт) в секундах
+TRENDING_WINDOWS = {
+    "day": (6 * HOUR, DAY),
+    "week": (1.5 * DAY, 7 * DAY),
+    "month": (7 * DAY, 30 * DAY),
+}
+DEFAULT_TRENDING_WINDOW = "week"
+# При таком показателе степени база epoch сдвигается, чтобы не выйти за пределы float
+MAX_EXPONENT = 256
+
+Timestamp = Union[datetime, str, float]
+RankKey = Tuple[float, str]
+
+def to_timestamp(value: Timestamp) -> float:
+    # Время в базе хранится как naive UTC (datetime.utcnow)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+class TrendingWindow:
+    def __init__(self, half_life_seconds: float, horizon_seconds: float):
+        self.half_life = half_life_seconds
+        self.horizon = horizon_seconds
+        self.epoch = time.time()
+        self.scores: Dict[str, float] = {}
+
+    def _rebase(self, epoch: float) -> None:
+        factor = 2 ** ((self.epoch - epoch) / self.half_life)
+        self.scores = {track_id: score * factor for track_id, score in self.scores.items()}
+        self.epoch = epoch
+
+    def add(self, track_id: str, weight: float, at: float) -> None:
+        if (at - self.epoch) / self.half_life > MAX_EXPONENT:
+            self._rebase(at)
+        score = self.scores.get(track_id, 0.0) + weight * 2 ** ((at - self.epoch) / self.half_life)
+        # Снятый лайк может увести счет в ноль или чуть ниже из-за округления
+        if score > 1e-12 * 2 ** ((at - self.epoch) / self.half_life):
+            self.scores[track_id] = score
+        else:
+            self.scores.pop(track_id, None)
+
+    def load(self, events: Iterable[Tuple[str, float, float]], now: float) -> None:
+        self.epoch = now - self.horizon
+        self.scores = {}
+        for track_id, weight, at in events:
+            if at >= self.epoch:
+                self.add(track_id, weight, at)
+
+    def ranked(self) -> List[RankKey]:
+        # Отсортировано по убыванию счета; элемент — (-log2 счета, track_id)
+        offset = self.epoch / self.half_life
+        return sorted((-(math.log2(score) + offset), track_id) for track_id, score in self.scores.items())
+
+class TrendingEngine:
+    def __init__(self, windows: Dict[str, Tuple[float, float]] = TRENDING_WINDOWS, rerank_seconds: float = 5.0):
+        self.windows = {name: TrendingWindow(*params) for name, params in windows.items()}
+        self.rerank_seconds = rerank_seconds
+        self._ranked: Dict[str, List[RankKey]] = {name: [] for name in windows}
+        self._ranked_at: Dict[str, float] = {name: 0.0 for name in windows}
+        self._dirty = set(windows)
+        self._lock = threading.Lock()
+
+    def load(self, events: Iterable[Tuple[str, float, Timestamp]]) -> None:
+        now = time.time()
+        events = [(track_id, weight, to_timestamp(at)) for track_id, weight, at in events]
+        with self._lock:
+            for name, window in self.windows.items():
+                window.load(events, now)
+                self._ranked[name] = window.ranked()
+                self._ranked_at[name] = now
+            self._dirty.clear()
+
+    def record(self, track_id: str, weight: float, at: Optional[Timestamp] = None) -> None:
+        at = to_timestamp(at) if at is not None else time.time()
+        with self._lock:
+            for window in self.windows.values():
+                window.add(track_id, weight, at)
+            self._dirty.update(self.windows)
+
+    def remove(self, track_id: str) -> None:
+        with self._lock:
+            for window in self.windows.values():
+                window.scores.pop(track_id, None)
+            self._dirty.update(self.windows)
+
+    def _current_ranking(self, name: str) -> List[RankKey]:
+        # Пересортировка не чаще раза в rerank_seconds: под постоянным потоком
+        # прослушиваний рейтинг иначе сортировался бы на каждый запрос
+        now = time.time()
+        if name in self._dirty and now - self._ranked_at[name] >= self.rerank_seconds:
+            self._ranked[name] = self.windows[name].ranked()
+            self._ranked_at[name] = now
+            self._dirty.discard(name)
+        return self._ranked[name]
+
+    def page(self, name: str, after: Optional[RankKey], limit: int) -> List[RankKey]:
+        # Возвращает до limit элементов (log2 счета, track_id) после курсора after
+        with self._lock:
+            ranking = self._current_ranking(name)
+            start = bisect.bisect_right(ranking, (-after[0], after[1])) if after else 0
+            return [(-key, track_id) for key, track_id in ranking[start:start + limit]]
+
+    def __len__(self) -> int:
+        return max((len(window.scores) for window in self.windows.values()), default=0)
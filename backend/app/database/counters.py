@@ -0,0 +1,44 @@
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database.schema import add_missing_columns
+
+# Денормализованные счетчики трека: лайки, комментарии и прослушивания (агрегаты
+# пользователя живут в user_stats, см. app/database/user_stats.py). Обновляются
+# атомарными UPDATE ... SET x = x + 1 в обработчиках (plays — пачками из буфера
+# прослушиваний), а reconcile_counters() пересчитывает их с нуля и чинит расхождения.
+# Прослушивание засчитывается пользователю один раз, поэтому plays — это число
+# строк track_plays трека.
+TRACK_COUNTER_COLUMNS = {
+    "likes_count": "INTEGER NOT NULL DEFAULT 0",
+    "comments_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+COUNTER_SOURCES = {
+    ("tracks", "likes_count"): "SELECT COUNT(*) FROM likes WHERE likes.track_id = tracks.id",
+    ("tracks", "comments_count"): "SELECT COUNT(*) FROM comments WHERE comments.track_id = tracks.id",
+    ("tracks", "plays"): "SELECT COUNT(*) FROM track_plays WHERE track_plays.track_id = tracks.id",
+}
+
+def ensure_counter_columns(engine) -> None:
+    add_missing_columns(engine, "tracks", TRACK_COUNTER_COLUMNS)
+
+def reconcile_counters(connection: Connection) -> Dict[str, int]:
+    # Обновляем только разошедшиеся строки, возвращаем количество исправленных по каждому счетчику
+    repaired = {}
+    for (table, column), source in COUNTER_SOURCES.items():
+        result = connection.execute(text(
+            f"UPDATE {table} SET {column} = ({source}) WHERE {column} IS NOT ({source})"
+        ))
+        repaired[f"{table}.{column}"] = result.rowcount
+    return repaired
+
+if __name__ == "__main__":
+    from app.database.database import engine
+
+    ensure_counter_columns(engine)
+    with engine.begin() as connection:
+        for counter, rows in reconcile_counters(connection).items():
+            print(f"{counter}: {rows} rows repaired")
@@ -1,11 +1,82 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import Settings, settings
 
-engine = create_engine(settings.DATABASE_URL)
+def apply_sqlite_pragmas(dbapi_connection, config: Settings) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+        # Отрицательное значение cache_size задается в килобайтах, а не в страницах
+        cursor.execute(f"PRAGMA cache_size=-{int(config.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE_BYTES)}")
+    finally:
+        cursor.close()
+
+def pool_options(config: Settings) -> dict:
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": config.DB_POOL_RECYCLE_SECONDS,
+    }
+
+def is_in_memory(url: str) -> bool:
+    path = url.split("?")[0].split("://", 1)[-1]
+    return path in ("", "/:memory:")
+
+def create_database_engine(url: str = None, config: Settings = settings) -> Engine:
+    url = url or config.DATABASE_URL
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True, **pool_options(config))
+
+    engine = create_engine(
+        url,
+        # timeout драйвера — то же ожидание блокировки, что и busy_timeout
+        connect_args={"check_same_thread": False, "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **({} if is_in_memory(url) else pool_options(config)),
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, config)
+
+    return engine
+
+def create_async_database_engine(url: str = None, config: Settings = settings) -> AsyncEngine:
+    # Тот же движок поверх aiosqlite: запросы выполняются в потоке драйвера,
+    # и event loop не простаивает, пока SQLite читает с диска
+    url = url or config.DATABASE_URL
+    if url.startswith("sqlite:"):
+        url = "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if not url.startswith("sqlite"):
+        return create_async_engine(url, pool_pre_ping=True, **pool_options(config))
+
+    # Для файловой базы aiosqlite по умолчанию не держит пул (NullPool) —
+    # каждое соединение заново открывает файл и выполняет pragmas
+    engine = create_async_engine(
+        url,
+        connect_args={"timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **({} if is_in_memory(url) else {"poolclass": AsyncAdaptedQueuePool, **pool_options(config)}),
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, config)
+
+    return engine
+
+engine = create_database_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_database_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Dependency
@@ -14,4 +85,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db 
@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database.counters import reconcile_counters
+from app.database.user_stats import USER_STATS_TABLE, recompute_user_stats
+from app.utils.blob_store import BLOBS_TABLE
+from app.media.transcode import TRANSCODE_JOBS_TABLE
+
+# Версионированные миграции схемы. create_all создает только отсутствующие таблицы,
+# а изменения существующих (индексы и т.п.) применяются здесь по порядку версий.
+# Примененные версии хранятся в schema_migrations. Миграции должны быть
+# идемпотентными: при старте нескольких воркеров одна и та же миграция может
+# выполниться дважды.
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, name: str):
+    def register(upgrade: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, name, upgrade))
+        return upgrade
+    return register
+
+@migration(1, "hot path indexes")
+def add_hot_path_indexes(connection: Connection) -> None:
+    # Без уникального индекса в базе могли накопиться повторные лайки — оставляем первый
+    duplicates = connection.execute(text(
+        "DELETE FROM likes WHERE rowid NOT IN "
+        "(SELECT MIN(rowid) FROM likes GROUP BY track_id, username)"
+    )).rowcount
+    for statement in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_likes_track_username ON likes (track_id, username)",
+        "CREATE INDEX IF NOT EXISTS ix_likes_username_created ON likes (username, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_comments_track_created ON comments (track_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_tracks_owner_created ON tracks (owner_username, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_tracks_created ON tracks (created_at, id)",
+    ):
+        connection.execute(text(statement))
+    if duplicates:
+        reconcile_counters(connection)
+
+@migration(2, "comment thread indexes")
+def add_comment_thread_indexes(connection: Connection) -> None:
+    # Страница верхнеуровневых комментариев трека и ответы на комментарий
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_comments_track_parent_created "
+        "ON comments (track_id, parent_id, created_at, id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_comments_parent_created ON comments (parent_id, created_at, id)"
+    ))
+
+@migration(3, "user stats table")
+def add_user_stats(connection: Connection) -> None:
+    # Счетчики пользователя переезжают из users в материализованную user_stats
+    connection.execute(text(USER_STATS_TABLE))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_tracks_owner_plays ON tracks (owner_username, plays, id)"
+    ))
+    recompute_user_stats(connection)
+    existing = {row[1] for row in connection.execute(text("PRAGMA table_info(users)"))}
+    for column in ("total_tracks", "total_plays", "total_likes"):
+        if column in existing:
+            connection.execute(text(f"ALTER TABLE users DROP COLUMN {column}"))
+
+@migration(4, "trending indexes")
+def add_trending_indexes(connection: Connection) -> None:
+    # Пересборка трендов читает события за окно по времени
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_track_plays_played_track ON track_plays (played_at, track_id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_likes_created_track ON likes (created_at, track_id)"
+    ))
+
+@migration(5, "content-addressed track blobs")
+def add_blobs(connection: Connection) -> None:
+    # Файлы уже загруженных треков переносит python -m app.utils.blob_store migrate;
+    # пересчет счетчиков блобов ищет ссылки по tracks.file_path
+    connection.execute(text(BLOBS_TABLE))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_tracks_file_path ON tracks (file_path)"))
+
+@migration(6, "hls transcode jobs")
+def add_transcode_jobs(connection: Connection) -> None:
+    # Уже загруженные блобы сразу ставятся в очередь на перекодирование
+    connection.execute(text(TRANSCODE_JOBS_TABLE))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transcode_jobs_status_available "
+        "ON transcode_jobs (status, available_at)"
+    ))
+    connection.execute(text(
+        "INSERT OR IGNORE INTO transcode_jobs (blob_sha256, status, attempts, available_at, updated_at) "
+        "SELECT sha256, 'pending', 0, :now, :now FROM blobs"
+    ), {"now": datetime.utcnow()})
+
+@migration(7, "keyset tiebreaker indexes")
+def add_id_to_keyset_indexes(connection: Connection) -> None:
+    # Треки автора и комментарии трека сортируются по (created_at, id); без id
+    # в индексе SQLite досортировывает результат во временном B-дереве.
+    # Базы, где миграция 1 создала индексы без id, пересобираются
+    for index, table, columns in (
+        ("ix_tracks_owner_created", "tracks", "owner_username, created_at, id"),
+        ("ix_comments_track_created", "comments", "track_id, created_at, id"),
+    ):
+        existing = [row[2] for row in connection.execute(text(f"PRAGMA index_info({index})"))]
+        if existing == [column.strip() for column in columns.split(",")]:
+            continue
+        connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+        connection.execute(text(f"CREATE INDEX {index} ON {table} ({columns})"))
+
+def applied_versions(connection: Connection) -> List[int]:
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR NOT NULL, "
+        "applied_at DATETIME NOT NULL"
+        ")"
+    ))
+    return [version for (version,) in connection.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+def run_migrations(engine: Engine, target: Optional[int] = None) -> List[int]:
+    with engine.begin() as connection:
+        applied = set(applied_versions(connection))
+    done = []
+    for item in sorted(MIGRATIONS, key=lambda item: item.version):
+        if item.version in applied or (target is not None and item.version > target):
+            continue
+        # Каждая миграция — отдельная транзакция вместе с записью о ней
+        with engine.begin() as connection:
+            item.upgrade(connection)
+            connection.execute(
+                text("INSERT OR IGNORE INTO schema_migrations (version, name, applied_at) "
+                     "VALUES (:version, :name, :applied_at)"),
+                {"version": item.version, "name": item.name, "applied_at": datetime.utcnow()},
+            )
+        done.append(item.version)
+    return done
+
+if __name__ == "__main__":
+    from app.database.database import engine
+
+    for version in run_migrations(engine):
+        print(f"Applied migration {version}")
+    with engine.connect() as connection:
+        print(f"Schema version: {max(applied_versions(connection), default=0)}")
@@ -0,0 +1,13 @@
+from typing import Dict
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+def add_missing_columns(engine: Engine, table: str, columns: Dict[str, str]) -> None:
+    # create_all не изменяет существующие таблицы, поэтому новые колонки
+    # добавляем в рабочую базу через ALTER TABLE
+    existing = {column["name"] for column in inspect(engine).get_columns(table)}
+    with engine.begin() as connection:
+        for name, ddl in columns.items():
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
@@ -0,0 +1,109 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+# Полнотекстовый индекс поверх таблиц tracks и users (SQLite FTS5).
+# Индексы хранят только токены (external content), сами строки берутся из
+# исходных таблиц по rowid. Триггеры держат индекс в актуальном состоянии.
+#
+# Таблицы tracks и users не имеют INTEGER PRIMARY KEY, поэтому VACUUM может
+# перенумеровать их rowid. Поэтому индекс пересобирается rebuild_search_index()
+# в задаче сверки счетчиков — при старте приложения и затем периодически.
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+MAX_QUERY_TERMS = 8
+
+# bm25: совпадение в названии трека весит больше, чем в имени владельца
+TRACK_RANK = "bm25(tracks_fts, 10.0, 1.0)"
+USER_RANK = "bm25(users_fts, 10.0, 5.0, 2.0)"
+
+SEARCH_INDEXES = {
+    "tracks_fts": ("tracks", ["name", "owner_username"]),
+    "users_fts": ("users", ["username", "nickname", "full_name"]),
+}
+
+def _index_ddl(index: str, table: str, columns: List[str]) -> List[str]:
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+        f"{cols}, content='{table}', content_rowid='rowid', "
+        f"tokenize='{TOKENIZER}', prefix='1 2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.rowid, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.rowid, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.rowid, {old_values}); "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.rowid, {new_values}); END",
+    ]
+
+def fts5_available(engine: Engine) -> bool:
+    with engine.connect() as connection:
+        try:
+            connection.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)"))
+            connection.execute(text("DROP TABLE temp.fts5_probe"))
+            return True
+        except OperationalError:
+            return False
+
+def ensure_search_index(engine: Engine) -> bool:
+    if engine.dialect.name != "sqlite" or not fts5_available(engine):
+        return False
+    with engine.begin() as connection:
+        existing = {
+            name for (name,) in connection.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'")
+            )
+        }
+        for index, (table, columns) in SEARCH_INDEXES.items():
+            for statement in _index_ddl(index, table, columns):
+                connection.execute(text(statement))
+            # Индекс только что создан — заполняем его уже существующими строками
+            if index not in existing:
+                connection.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+    return True
+
+def rebuild_search_index(connection) -> None:
+    for index in SEARCH_INDEXES:
+        connection.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+
+def build_match_query(query: str) -> Optional[str]:
+    # Каждое слово запроса ищется по префиксу, все слова должны совпасть: "lo ra" -> "lo"* "ra"*
+    terms = re.findall(r"\w+", query.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _ranked_search(
+    index: str,
+    table: str,
+    key: str,
+    rank: str,
+    match: str,
+    limit: int,
+    after: Optional[Tuple[float, str]],
+) -> Tuple[Any, Dict[str, Any]]:
+    params: Dict[str, Any] = {"match": match, "limit": limit}
+    where = ""
+    if after is not None:
+        where = "WHERE score > :after_score OR (score = :after_score AND key > :after_key)"
+        params["after_score"], params["after_key"] = after
+    statement = text(
+        f"SELECT key, score FROM ("
+        f"SELECT t.{key} AS key, {rank} AS score FROM {index} "
+        f"JOIN {table} t ON t.rowid = {index}.rowid "
+        f"WHERE {index} MATCH :match"
+        f") {where} ORDER BY score, key LIMIT :limit"
+    )
+    return statement, params
+
+def track_search_statement(match: str, limit: int, after: Optional[Tuple[float, str]] = None):
+    return _ranked_search("tracks_fts", "tracks", "id", TRACK_RANK, match, limit, after)
+
+def user_search_statement(match: str, limit: int, after: Optional[Tuple[float, str]] = None):
+    return _ranked_search("users_fts", "users", "username", USER_RANK, match, limit, after)
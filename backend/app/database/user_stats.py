@@ -0,0 +1,121 @@
+import json
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+
+# Материализованная статистика пользователя (таблица user_stats): итоговые счетчики,
+# прослушивания его треков по дням и самые популярные треки. Обработчики меняют
+# строку инкрементально, а recompute_user_stats() периодически пересобирает ее
+# из исходных таблиц и заодно выбрасывает дни старше USER_STATS_DAYS.
+
+USER_STATS_DAYS = 30
+TOP_TRACKS_LIMIT = 5
+
+USER_STATS_TABLE = (
+    "CREATE TABLE IF NOT EXISTS user_stats ("
+    "username VARCHAR NOT NULL PRIMARY KEY REFERENCES users (username), "
+    "total_tracks INTEGER NOT NULL DEFAULT 0, "
+    "total_plays INTEGER NOT NULL DEFAULT 0, "
+    "total_likes INTEGER NOT NULL DEFAULT 0, "
+    "plays_by_day VARCHAR NOT NULL DEFAULT '{}', "
+    "top_tracks VARCHAR NOT NULL DEFAULT '[]', "
+    "updated_at DATETIME)"
+)
+
+TOP_TRACKS_SOURCE = (
+    "SELECT json_group_array(json_object('id', id, 'name', name, 'plays', plays)) FROM ("
+    "SELECT id, name, plays FROM tracks WHERE tracks.owner_username = {owner} "
+    "ORDER BY plays DESC, id DESC LIMIT :top_limit)"
+)
+
+USER_STATS_SOURCES = {
+    "total_tracks": "SELECT COUNT(*) FROM tracks WHERE tracks.owner_username = users.username",
+    "total_plays": (
+        "SELECT COALESCE(SUM(tracks.plays), 0) FROM tracks WHERE tracks.owner_username = users.username"
+    ),
+    "total_likes": (
+        "SELECT COUNT(*) FROM likes JOIN tracks ON tracks.id = likes.track_id "
+        "WHERE tracks.owner_username = users.username"
+    ),
+    "plays_by_day": (
+        "SELECT json_group_object(day, plays) FROM ("
+        "SELECT date(track_plays.played_at) AS day, COUNT(*) AS plays FROM track_plays "
+        "JOIN tracks ON tracks.id = track_plays.track_id "
+        "WHERE tracks.owner_username = users.username AND track_plays.played_at >= :since "
+        "GROUP BY day)"
+    ),
+    "top_tracks": TOP_TRACKS_SOURCE.format(owner="users.username"),
+}
+
+def window_start(today: date, days: int = USER_STATS_DAYS) -> date:
+    return today - timedelta(days=days - 1)
+
+def recompute_user_stats(connection, usernames: Optional[Iterable[str]] = None) -> int:
+    # Полный пересчет (или только для перечисленных пользователей) одним upsert-ом
+    columns = list(USER_STATS_SOURCES)
+    params = {
+        "since": window_start(datetime.utcnow().date()).isoformat(),
+        "top_limit": TOP_TRACKS_LIMIT,
+        "now": datetime.utcnow(),
+    }
+    condition = "1"
+    if usernames is not None:
+        names = list(usernames)
+        if not names:
+            return 0
+        placeholders = ", ".join(f":user_{index}" for index in range(len(names)))
+        condition = f"users.username IN ({placeholders})"
+        params.update({f"user_{index}": name for index, name in enumerate(names)})
+    sources = ", ".join(f"({USER_STATS_SOURCES[column]})" for column in columns)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns + ["updated_at"])
+    return connection.execute(text(
+        f"INSERT INTO user_stats (username, {', '.join(columns)}, updated_at) "
+        f"SELECT users.username, {sources}, :now FROM users WHERE {condition} "
+        f"ON CONFLICT (username) DO UPDATE SET {updates}"
+    ), params).rowcount
+
+def create_user_stats(connection, username: str) -> None:
+    connection.execute(
+        text(
+            "INSERT OR IGNORE INTO user_stats "
+            "(username, total_tracks, total_plays, total_likes, plays_by_day, top_tracks, updated_at) "
+            "VALUES (:username, 0, 0, 0, '{}', '[]', :now)"
+        ),
+        {"username": username, "now": datetime.utcnow()}
+    )
+
+def add_daily_plays(connection, track_id: str, day: date, plays: int) -> None:
+    # json_set выполняется внутри UPDATE, поэтому параллельные воркеры не теряют приращения
+    path = f'$."{day.isoformat()}"'
+    connection.execute(text(
+        "UPDATE user_stats SET plays_by_day = json_set(plays_by_day, :path, "
+        "COALESCE(json_extract(plays_by_day, :path), 0) + :plays) "
+        "WHERE username = (SELECT owner_username FROM tracks WHERE id = :track_id)"
+    ), {"path": path, "plays": plays, "track_id": track_id})
+
+def refresh_top_tracks(connection, username: str) -> None:
+    connection.execute(text(
+        f"UPDATE user_stats SET top_tracks = ({TOP_TRACKS_SOURCE.format(owner=':username')}), "
+        "updated_at = :now WHERE username = :username"
+    ), {"username": username, "top_limit": TOP_TRACKS_LIMIT, "now": datetime.utcnow()})
+
+def plays_per_day(plays_by_day: Optional[str], today: date, days: int = USER_STATS_DAYS) -> List[dict]:
+    # Непрерывный ряд за последние days дней, дни без прослушиваний — нули
+    counts = json.loads(plays_by_day or "{}")
+    start = window_start(today, days)
+    series = []
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        series.append({"date": day, "plays": counts.get(day, 0)})
+    return series
+
+def top_tracks(top_tracks_json: Optional[str]) -> List[dict]:
+    tracks = json.loads(top_tracks_json or "[]")
+    return sorted(tracks, key=lambda track: (track["plays"] or 0, track["id"]), reverse=True)
+
+if __name__ == "__main__":
+    from app.database.database import engine
+
+    with engine.begin() as connection:
+        print(f"user_stats: {recompute_user_stats(connection)} rows recomputed")
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from app.routes import auth, users
 from app.core.config import settings
+from app.database.database import Base, engine
+
+# Создаем все таблицы при запуске приложения
+Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -0,0 +1,59 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.core.config import settings
+from app.database.schema import add_missing_columns
+from app.media.mp3 import AudioInfo, analyze_mp3, format_duration
+
+# Анализ аудиофайлов выполняется в отдельных процессах: разбор фреймов — чистый
+# CPU, и в потоке он бы держал GIL и тормозил обработку запросов.
+MEDIA_WORKERS = settings.MEDIA_WORKERS
+
+MEDIA_COLUMNS = {
+    "duration_seconds": "FLOAT",
+    "bitrate_kbps": "INTEGER",
+    "sample_rate": "INTEGER",
+    "channels": "INTEGER",
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def ensure_media_columns(engine) -> None:
+    add_missing_columns(engine, "tracks", MEDIA_COLUMNS)
+
+def media_fields(info: AudioInfo) -> dict:
+    return {
+        "duration": format_duration(info.duration_seconds),
+        "duration_seconds": round(info.duration_seconds, 3),
+        "bitrate_kbps": round(info.bitrate / 1000),
+        "sample_rate": info.sample_rate,
+        "channels": info.channels,
+    }
+
+def analyze_track_file(path: str) -> dict:
+    return media_fields(analyze_mp3(path))
+
+def create_media_executor(max_workers: int = MEDIA_WORKERS) -> ProcessPoolExecutor:
+    # spawn, а не fork: родительский процесс многопоточный (threadpool, пул соединений)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def get_media_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = create_media_executor()
+    return _executor
+
+def shutdown_media_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def run_in_media_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_media_executor(), func, *args)
+
+async def analyze_in_pool(path: str) -> dict:
+    return await run_in_media_pool(analyze_track_file, path)
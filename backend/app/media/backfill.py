@@ -0,0 +1,86 @@
+# Повторный анализ уже загруженных треков: длительность, битрейт, частота, каналы.
+#
+#   python -m app.media.backfill            # только треки без данных
+#   python -m app.media.backfill --all --workers 8
+import argparse
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+
+from sqlalchemy import text
+
+from app.media.analysis import MEDIA_WORKERS, analyze_track_file, create_media_executor, ensure_media_columns
+from app.utils.storage import StorageBackend, storage_key
+
+UPDATE_TRACK_MEDIA = text(
+    "UPDATE tracks SET duration = :duration, duration_seconds = :duration_seconds, "
+    "bitrate_kbps = :bitrate_kbps, sample_rate = :sample_rate, channels = :channels "
+    "WHERE id = :id"
+)
+
+def backfill(engine, storage: StorageBackend, only_missing: bool = True,
+             workers: int = MEDIA_WORKERS, batch_size: int = 100) -> dict:
+    ensure_media_columns(engine)
+    query = "SELECT id, file_path FROM tracks"
+    if only_missing:
+        query += " WHERE duration_seconds IS NULL"
+    with engine.connect() as connection:
+        tracks = connection.execute(text(query)).all()
+
+    summary = {"tracks": len(tracks), "updated": 0, "failed": 0}
+    updates = []
+
+    def flush():
+        if updates:
+            with engine.begin() as connection:
+                connection.execute(UPDATE_TRACK_MEDIA, updates)
+            summary["updated"] += len(updates)
+            updates.clear()
+
+    def submit(pool, track_id, file_path):
+        # Из S3 файл скачивается во временный и удаляется сразу после анализа
+        try:
+            local = storage.local_copy(storage_key(file_path))
+        except Exception as e:
+            summary["failed"] += 1
+            print(f"Error fetching track {track_id}: {str(e)}")
+            return None
+        future = pool.submit(analyze_track_file, local.path)
+        future.add_done_callback(lambda _: local.release())
+        return future
+
+    def collect(future, track_id):
+        try:
+            updates.append({**future.result(), "id": track_id})
+        except Exception as e:
+            summary["failed"] += 1
+            print(f"Error analyzing track {track_id}: {str(e)}")
+        if len(updates) >= batch_size:
+            flush()
+
+    # Вперед скачивается не больше max_in_flight файлов: анализ начинается сразу,
+    # а временные копии из S3 не копятся на диске для всей библиотеки
+    max_in_flight = max(1, workers) * 2
+    with create_media_executor(workers) as pool:
+        futures = {}
+        for track_id, file_path in tracks:
+            if len(futures) >= max_in_flight:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, futures.pop(future))
+            future = submit(pool, track_id, file_path)
+            if future is not None:
+                futures[future] = track_id
+        for future in as_completed(futures):
+            collect(future, futures[future])
+    flush()
+    return summary
+
+if __name__ == "__main__":
+    from app.core.config import settings
+    from app.database.database import engine
+    from app.utils.storage import storage_from_settings
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--all", action="store_true", help="re-analyse tracks that already have data")
+    parser.add_argument("--workers", type=int, default=MEDIA_WORKERS)
+    args = parser.parse_args()
+    print(backfill(engine, storage_from_settings(settings), only_missing=not args.all, workers=args.workers))
@@ -0,0 +1,23 @@
+import subprocess
+
+from app.core.config import settings
+
+FFMPEG_BINARY = settings.FFMPEG_BINARY
+
+class FFmpegError(RuntimeError):
+    pass
+
+def run_ffmpeg(arguments: list) -> bytes:
+    command = [FFMPEG_BINARY, "-nostdin", "-hide_banner", "-v", "error", *arguments]
+    try:
+        result = subprocess.run(command, capture_output=True, check=False)
+    except FileNotFoundError:
+        raise FFmpegError(f"{FFMPEG_BINARY} not found")
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", errors="replace").strip()
+        raise FFmpegError(message or f"ffmpeg exited with code {result.returncode}")
+    return result.stdout
+
+def decode_pcm(path: str, sample_rate: int, channels: int = 1) -> bytes:
+    # Сырые 16-битные сэмплы (little-endian), каналы сведены в channels
+    return run_ffmpeg(["-i", path, "-vn", "-ac", str(channels), "-ar", str(sample_rate), "-f", "s16le", "-"])
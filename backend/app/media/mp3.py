@@ -0,0 +1,169 @@
+import mmap
+import os
+import struct
+from typing import NamedTuple, Optional, Tuple
+
+# Разбор MPEG audio (MP3) по заголовкам фреймов без декодирования.
+# Длительность VBR-файлов берется из заголовка Xing/Info или VBRI, а если его
+# нет — считается проходом по всем фреймам, поэтому она точная и для CBR, и для VBR.
+
+MPEG_1, MPEG_2, MPEG_25 = 3, 2, 0
+LAYER_1, LAYER_2, LAYER_3 = 3, 2, 1
+
+BITRATES = {
+    (MPEG_1, LAYER_1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (MPEG_1, LAYER_2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (MPEG_1, LAYER_3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (MPEG_2, LAYER_1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (MPEG_2, LAYER_2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (MPEG_2, LAYER_3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {
+    MPEG_1: (44100, 48000, 32000),
+    MPEG_2: (22050, 24000, 16000),
+    MPEG_25: (11025, 12000, 8000),
+}
+
+XING_FRAMES_FLAG = 0x1
+ID3V1_SIZE = 128
+
+class MP3ParseError(ValueError):
+    pass
+
+class FrameHeader(NamedTuple):
+    version: int
+    layer: int
+    bitrate: int
+    sample_rate: int
+    channels: int
+    samples: int
+    length: int
+
+class AudioInfo(NamedTuple):
+    duration_seconds: float
+    bitrate: int
+    sample_rate: int
+    channels: int
+    frames: int
+    vbr: bool
+
+def parse_frame_header(data, offset: int) -> Optional[FrameHeader]:
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x3
+    layer = (b1 >> 1) & 0x3
+    bitrate_index = (b2 >> 4) & 0xF
+    sample_rate_index = (b2 >> 2) & 0x3
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    table_version = MPEG_1 if version == MPEG_1 else MPEG_2
+    bitrate = BITRATES[(table_version, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x1
+    channels = 1 if (b3 >> 6) == 0x3 else 2
+
+    if layer == LAYER_1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == LAYER_2 or version == MPEG_1 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return FrameHeader(version, layer, bitrate, sample_rate, channels, samples, length)
+
+def _skip_id3v2(data) -> int:
+    offset = 0
+    # Теги могут идти подряд; размер записан в syncsafe-формате (по 7 бит на байт)
+    while data[offset:offset + 3] == b"ID3" and offset + 10 <= len(data):
+        flags = data[offset + 5]
+        size_bytes = data[offset + 6:offset + 10]
+        size = (size_bytes[0] << 21) | (size_bytes[1] << 14) | (size_bytes[2] << 7) | size_bytes[3]
+        offset += 10 + size + (10 if flags & 0x10 else 0)
+    return offset
+
+def _find_first_frame(data, start: int, end: int) -> Optional[Tuple[int, FrameHeader]]:
+    # Ложные синхрослова встречаются в обложках и тегах, поэтому фрейм
+    # считается найденным, только если за ним сразу начинается следующий
+    offset = data.find(b"\xff", start, end)
+    while offset != -1:
+        header = parse_frame_header(data, offset)
+        if header:
+            next_offset = offset + header.length
+            if next_offset >= end or parse_frame_header(data, next_offset):
+                return offset, header
+        offset = data.find(b"\xff", offset + 1, end)
+    return None
+
+def _vbr_frame_count(data, offset: int, header: FrameHeader) -> Optional[int]:
+    if header.version == MPEG_1:
+        side_info = 17 if header.channels == 1 else 32
+    else:
+        side_info = 9 if header.channels == 1 else 17
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & XING_FRAMES_FLAG:
+            return struct.unpack(">I", data[xing + 8:xing + 12])[0]
+    vbri = offset + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        return struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+    return None
+
+def _audio_end(data) -> int:
+    end = len(data)
+    if end >= ID3V1_SIZE and data[end - ID3V1_SIZE:end - ID3V1_SIZE + 3] == b"TAG":
+        end -= ID3V1_SIZE
+    return end
+
+def analyze_mp3_data(data) -> AudioInfo:
+    end = _audio_end(data)
+    found = _find_first_frame(data, _skip_id3v2(data), end)
+    if not found:
+        raise MP3ParseError("No MPEG audio frames found")
+    first_offset, first = found
+
+    frames = _vbr_frame_count(data, first_offset, first)
+    if frames:
+        duration = frames * first.samples / first.sample_rate
+        audio_bytes = end - first_offset - first.length
+        bitrate = int(audio_bytes * 8 / duration) if duration else first.bitrate
+        return AudioInfo(duration, bitrate, first.sample_rate, first.channels, frames, True)
+
+    # Заголовка VBR нет — проходим по всем фреймам
+    frames, samples, bits = 0, 0, 0
+    bitrates = set()
+    offset = first_offset
+    while offset < end:
+        header = parse_frame_header(data, offset)
+        if header is None or offset + header.length > end:
+            found = _find_first_frame(data, offset + 1, end)
+            if not found:
+                break
+            offset, header = found
+            if offset + header.length > end:
+                break
+        frames += 1
+        samples += header.samples
+        bits += header.length * 8
+        bitrates.add(header.bitrate)
+        offset += header.length
+
+    duration = samples / first.sample_rate
+    bitrate = int(bits / duration) if duration else first.bitrate
+    return AudioInfo(duration, bitrate, first.sample_rate, first.channels, frames, len(bitrates) > 1)
+
+def analyze_mp3(path: str) -> AudioInfo:
+    if os.path.getsize(path) == 0:
+        raise MP3ParseError("Empty file")
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return analyze_mp3_data(data)
+
+def format_duration(seconds: float) -> str:
+    total = int(round(seconds))
+    hours, rest = divmod(total, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
@@ -0,0 +1,158 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.media.ffmpeg import run_ffmpeg
+from app.media.mp3 import analyze_mp3
+
+# Перекодирование треков для адаптивного стриминга (HLS). Из загруженного файла
+# получаются AAC-версии с разным битрейтом, нарезанные на сегменты; мастер-плейлист
+# перечисляет их, и плеер сам выбирает качество по пропускной способности канала.
+# Версии строятся для блоба (см. app/utils/blob_store.py), а не для трека, поэтому
+# одинаковые загрузки перекодируются один раз; лежат они в хранилище под
+# hls/<sha256>/<rendition>/.
+#
+# Очередь заданий — таблица transcode_jobs, общая для всех воркеров: задание
+# захватывается одним UPDATE, при ошибке возвращается в очередь с растущей
+# задержкой, после TRANSCODE_MAX_ATTEMPTS попыток помечается failed. Задание,
+# зависшее в running (воркер упал), снова доступно через TRANSCODE_JOB_TIMEOUT,
+# а если это была последняя попытка — помечается failed.
+
+class Rendition(NamedTuple):
+    name: str
+    bitrate_kbps: int
+
+RENDITIONS = (
+    Rendition("low", 64),
+    Rendition("medium", 128),
+    Rendition("high", 256),
+)
+HLS_DIR_NAME = "hls"
+HLS_SEGMENT_SECONDS = 6
+HLS_CODECS = "mp4a.40.2"
+PLAYLIST_NAME = "index.m3u8"
+
+TRANSCODE_MAX_ATTEMPTS = 4
+TRANSCODE_RETRY_SECONDS = 30
+TRANSCODE_JOB_TIMEOUT = timedelta(minutes=30)
+
+TRANSCODE_JOBS_TABLE = (
+    "CREATE TABLE IF NOT EXISTS transcode_jobs ("
+    "blob_sha256 VARCHAR NOT NULL PRIMARY KEY, "
+    "status VARCHAR NOT NULL DEFAULT 'pending', "
+    "attempts INTEGER NOT NULL DEFAULT 0, "
+    "renditions VARCHAR, "
+    "last_error VARCHAR, "
+    "available_at DATETIME NOT NULL, "
+    "updated_at DATETIME)"
+)
+
+def renditions_for(source_kbps: Optional[int]) -> List[Rendition]:
+    # Версии с битрейтом выше исходного не делаем: качество от них не вырастет
+    if not source_kbps:
+        return list(RENDITIONS)
+    chosen = [rendition for rendition in RENDITIONS if rendition.bitrate_kbps <= source_kbps]
+    return chosen or [RENDITIONS[0]]
+
+def hls_prefix(sha256: str) -> str:
+    return f"{HLS_DIR_NAME}/{sha256}/"
+
+def transcode_hls(source_path: str, output_dir: str) -> List[str]:
+    # Выполняется в пуле процессов: один запуск ffmpeg декодирует файл один раз
+    # и кодирует все версии. Возвращает имена построенных версий
+    try:
+        source_kbps = round(analyze_mp3(source_path).bitrate / 1000)
+    except Exception:
+        source_kbps = None
+    renditions = renditions_for(source_kbps)
+    arguments = ["-i", source_path]
+    for rendition in renditions:
+        directory = os.path.join(output_dir, rendition.name)
+        os.makedirs(directory, exist_ok=True)
+        arguments += [
+            "-map", "0:a", "-vn", "-c:a", "aac", "-b:a", f"{rendition.bitrate_kbps}k",
+            "-f", "hls", "-hls_time", str(HLS_SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+            "-hls_segment_filename", os.path.join(directory, "seg-%05d.ts"),
+            os.path.join(directory, PLAYLIST_NAME),
+        ]
+    run_ffmpeg(arguments)
+    return [rendition.name for rendition in renditions]
+
+def master_playlist(base_url: str, rendition_names: List[str]) -> str:
+    bitrates = {rendition.name: rendition.bitrate_kbps for rendition in RENDITIONS}
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for name in sorted(rendition_names, key=lambda name: bitrates[name]):
+        # BANDWIDTH — пиковый битрейт с накладными расходами MPEG-TS (~10%)
+        bandwidth = bitrates[name] * 1100
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},CODECS="{HLS_CODECS}"')
+        lines.append(f"{base_url}{name}/{PLAYLIST_NAME}")
+    return "\n".join(lines) + "\n"
+
+def enqueue_transcode(connection, sha256: str) -> None:
+    connection.execute(text(
+        "INSERT OR IGNORE INTO transcode_jobs (blob_sha256, status, attempts, available_at, updated_at) "
+        "VALUES (:sha256, 'pending', 0, :now, :now)"
+    ), {"sha256": sha256, "now": datetime.utcnow()})
+
+def claim_transcode_job(connection) -> Optional[Tuple[str, int]]:
+    # Захват одного доступного задания; возвращает (sha256, номер попытки).
+    # Зависшее задание, у которого попытки закончились, больше не захватывается —
+    # оно помечается failed, иначе трек навсегда остался бы в ожидании
+    now = datetime.utcnow()
+    connection.execute(text(
+        "UPDATE transcode_jobs SET status = 'failed', last_error = :error, updated_at = :now "
+        "WHERE status = 'running' AND updated_at < :stale AND attempts >= :max_attempts"
+    ), {
+        "now": now, "stale": now - TRANSCODE_JOB_TIMEOUT, "max_attempts": TRANSCODE_MAX_ATTEMPTS,
+        "error": "Timed out after the last attempt",
+    })
+    row = connection.execute(text(
+        "UPDATE transcode_jobs SET status = 'running', attempts = attempts + 1, updated_at = :now "
+        "WHERE blob_sha256 = COALESCE("
+        "(SELECT blob_sha256 FROM transcode_jobs WHERE status = 'pending' AND available_at <= :now "
+        "ORDER BY available_at LIMIT 1), "
+        "(SELECT blob_sha256 FROM transcode_jobs WHERE status = 'running' AND updated_at < :stale "
+        "AND attempts < :max_attempts LIMIT 1)) "
+        "RETURNING blob_sha256, attempts"
+    ), {"now": now, "stale": now - TRANSCODE_JOB_TIMEOUT, "max_attempts": TRANSCODE_MAX_ATTEMPTS}).first()
+    return (row[0], row[1]) if row else None
+
+def complete_transcode_job(connection, sha256: str, rendition_names: List[str]) -> bool:
+    # False — задание удалили (блоб удален), пока шло перекодирование
+    return bool(connection.execute(text(
+        "UPDATE transcode_jobs SET status = 'done', renditions = :renditions, last_error = NULL, "
+        "updated_at = :now WHERE blob_sha256 = :sha256"
+    ), {"sha256": sha256, "renditions": json.dumps(rendition_names), "now": datetime.utcnow()}).rowcount)
+
+def fail_transcode_job(connection, sha256: str, attempts: int, error: str) -> str:
+    now = datetime.utcnow()
+    status = "failed" if attempts >= TRANSCODE_MAX_ATTEMPTS else "pending"
+    delay = timedelta(seconds=TRANSCODE_RETRY_SECONDS * 2 ** (attempts - 1))
+    connection.execute(text(
+        "UPDATE transcode_jobs SET status = :status, last_error = :error, available_at = :available_at, "
+        "updated_at = :now WHERE blob_sha256 = :sha256"
+    ), {"sha256": sha256, "status": status, "error": error[:1000], "available_at": now + delay, "now": now})
+    return status
+
+def delete_orphaned_transcode_job(connection, sha256: str) -> bool:
+    # Задание удаляется вместе с последней ссылкой на блоб; True — версии можно удалять
+    return bool(connection.execute(text(
+        "DELETE FROM transcode_jobs WHERE blob_sha256 = :sha256 "
+        "AND NOT EXISTS (SELECT 1 FROM blobs WHERE blobs.sha256 = :sha256)"
+    ), {"sha256": sha256}).rowcount)
+
+def prune_transcode_jobs(connection) -> int:
+    return connection.execute(text(
+        "DELETE FROM transcode_jobs WHERE blob_sha256 NOT IN (SELECT sha256 FROM blobs)"
+    )).rowcount
+
+def transcode_status(connection, sha256: str) -> Optional[Dict]:
+    row = connection.execute(text(
+        "SELECT status, renditions FROM transcode_jobs WHERE blob_sha256 = :sha256"
+    ), {"sha256": sha256}).first()
+    if row is None:
+        return None
+    return {"status": row[0], "renditions": json.loads(row[1]) if row[1] else []}
@@ -0,0 +1,88 @@
+import os
+import struct
+import tempfile
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+from app.media.ffmpeg import decode_pcm
+
+# Пики для отрисовки волны: пары (min, max) в int8 на несколько уровней детализации.
+# Самый подробный уровень считается по PCM, каждый следующий — сверткой
+# предыдущего, поэтому декодирование выполняется один раз.
+#
+# Формат файла (little-endian):
+#   magic "ABWF", version u8, levels u8, reserved u16, sample_rate u32, duration_ms u32
+#   peaks u32 для каждого уровня
+#   данные уровней подряд: peaks * 2 байт int8 (min0, max0, min1, max1, ...)
+
+WAVEFORM_SAMPLE_RATE = 8000
+WAVEFORM_RESOLUTIONS = (4096, 1024, 256)
+DEFAULT_WAVEFORM_RESOLUTION = 1024
+
+MAGIC = b"ABWF"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHII")
+
+class WaveformError(ValueError):
+    pass
+
+class WaveformLevel(NamedTuple):
+    resolution: int
+    duration_ms: int
+    peaks: bytes
+
+def _to_int8(level: np.ndarray) -> np.ndarray:
+    return (level.astype(np.int32) * 127 // 32767).astype(np.int8)
+
+def compute_peaks(samples: np.ndarray, resolutions: Sequence[int] = WAVEFORM_RESOLUTIONS) -> List[np.ndarray]:
+    finest = resolutions[0]
+    if samples.size == 0:
+        samples = np.zeros(1, dtype=np.int16)
+    # Дополняем последним сэмплом до кратного числа, чтобы разложить в матрицу
+    per_bucket = -(-samples.size // finest)
+    padded = np.pad(samples, (0, per_bucket * finest - samples.size), mode="edge")
+    buckets = padded.reshape(finest, per_bucket)
+    levels = [np.stack((buckets.min(axis=1), buckets.max(axis=1)), axis=1)]
+    for resolution in resolutions[1:]:
+        previous = levels[-1]
+        factor = previous.shape[0] // resolution
+        if factor < 1 or previous.shape[0] % resolution:
+            raise WaveformError("Each resolution must evenly divide the previous one")
+        grouped = previous.reshape(resolution, factor, 2)
+        levels.append(np.stack((grouped[:, :, 0].min(axis=1), grouped[:, :, 1].max(axis=1)), axis=1))
+    return [_to_int8(level) for level in levels]
+
+def encode_waveform(levels: List[np.ndarray], sample_rate: int, duration_ms: int) -> bytes:
+    header = HEADER.pack(MAGIC, VERSION, len(levels), 0, sample_rate, duration_ms)
+    table = struct.pack(f"<{len(levels)}I", *(level.shape[0] for level in levels))
+    return header + table + b"".join(level.tobytes() for level in levels)
+
+def generate_waveform(audio_path: str, output_path: str) -> int:
+    samples = np.frombuffer(decode_pcm(audio_path, WAVEFORM_SAMPLE_RATE), dtype="<i2")
+    duration_ms = samples.size * 1000 // WAVEFORM_SAMPLE_RATE
+    data = encode_waveform(compute_peaks(samples), WAVEFORM_SAMPLE_RATE, duration_ms)
+
+    directory = os.path.dirname(output_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".waveform-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return len(data)
+
+def read_waveform_level(path: str, resolution: int = DEFAULT_WAVEFORM_RESOLUTION) -> WaveformLevel:
+    # Отдаем наименьший уровень, в котором пиков не меньше запрошенного
+    with open(path, "rb") as file:
+        magic, version, level_count, _, _, duration_ms = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise WaveformError("Unsupported waveform file")
+        counts = struct.unpack(f"<{level_count}I", file.read(4 * level_count))
+        candidates = [count for count in counts if count >= resolution]
+        chosen = min(candidates) if candidates else max(counts)
+        index = counts.index(chosen)
+        file.seek(2 * sum(counts[:index]), os.SEEK_CUR)
+        return WaveformLevel(chosen, duration_ms, file.read(2 * chosen))
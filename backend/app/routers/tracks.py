@@ -3,10 +3,14 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from fastapi.responses import FileResponse
 import os
-import shutil
 from datetime import datetime
 import uuid
+import time
+from ..core.config import settings
+from ..core.play_sessions import create_play_session_store
 from ..database import get_db
+from ..database.database import engine
+from ..utils.uploads import save_upload
 from ..models import Track, User
 from ..auth import get_current_user
 from ..schemas import TrackCreate, TrackResponse
@@ -16,9 +20,18 @@ router = APIRouter()
 # Минимальное время прослушивания в секундах
 MIN_PLAY_DURATION = 25
 
-# Словарь для хранения времени начала прослушивания
-# Формат: {(track_id, user_id): start_time}
-track_play_starts = {}
+# Максимальные размеры загружаемых файлов
+MAX_TRACK_UPLOAD_BYTES = 100 * 1024 * 1024
+MAX_COVER_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Хранилище времени начала прослушивания: {(track_id, user_id): start_time}
+# Общее для всех воркеров и ограниченное по времени жизни записей
+play_sessions = create_play_session_store(
+    settings.PLAY_SESSION_BACKEND,
+    ttl_seconds=settings.PLAY_SESSION_TTL_SECONDS,
+    max_entries=settings.PLAY_SESSION_MAX_ENTRIES,
+    engine=engine,
+)
 
 @router.get("/uploads/music/{track_id}.mp3")
 async def get_track_file(
@@ -31,7 +44,7 @@ async def get_track_file(
         raise HTTPException(status_code=404, detail="Track not found")
     
     # Записываем время начала прослушивания для конкретного пользователя
-    track_play_starts[(track_id, current_user.id)] = datetime.now()
+    play_sessions.start(track_id, str(current_user.id))
     
     return FileResponse(f"uploads/music/{track_id}.mp3")
 
@@ -45,20 +58,17 @@ async def complete_track_play(
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    # Получаем время начала прослушивания для конкретного пользователя
-    start_time = track_play_starts.get((track_id, current_user.id))
+    # Получаем и сразу удаляем время начала прослушивания для конкретного пользователя
+    start_time = play_sessions.pop(track_id, str(current_user.id))
     if start_time:
         # Вычисляем длительность прослушивания
-        play_duration = (datetime.now() - start_time).total_seconds()
+        play_duration = time.time() - start_time
         
         # Если прослушивание длилось больше минимального времени, увеличиваем счетчик
         if play_duration >= MIN_PLAY_DURATION:
             track.plays += 1
             db.commit()
             print(f"Track {track_id} played for {play_duration} seconds, plays count increased to {track.plays}")
-        
-        # Удаляем запись о начале прослушивания
-        del track_play_starts[(track_id, current_user.id)]
     
     return {"status": "success", "plays": track.plays}
 
@@ -86,8 +96,7 @@ async def upload_track(
     file_path = f"uploads/music/{track_id}{file_extension}"
     os.makedirs("uploads/music", exist_ok=True)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await save_upload(file, file_path, MAX_TRACK_UPLOAD_BYTES)
     
     # Сохраняем обложку, если она есть
     cover_path = None
@@ -96,8 +105,7 @@ async def upload_track(
         cover_path = f"uploads/covers/{track_id}{cover_extension}"
         os.makedirs("uploads/covers", exist_ok=True)
         
-        with open(cover_path, "wb") as buffer:
-            shutil.copyfileobj(cover.file, buffer)
+        await save_upload(cover, cover_path, MAX_COVER_UPLOAD_BYTES)
     
     # Создаем запись в базе данных
     track = Track(
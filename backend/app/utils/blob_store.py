@@ -0,0 +1,270 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from app.media.transcode import HLS_DIR_NAME, enqueue_transcode
+from app.utils.storage import PUBLIC_PREFIX, StorageBackend, public_path, storage_key
+
+# Хранилище файлов треков по содержимому: файл лежит один раз под ключом
+# blobs/<ab>/<cd>/<sha256><ext> в app/utils/storage.py, а строка в таблице blobs
+# считает, сколько треков (Track.file_path) на него ссылается. Одинаковые
+# загрузки разных пользователей занимают место в хранилище один раз.
+#
+# Счетчик меняется в той же транзакции SQLite, что и запись о треке, а с
+# хранилищем работают только вне ее: prepare() до транзакции, ensure() и
+# BlobRelease.finish() после commit. Так медленные запросы к S3 не держат
+# блокировку записи SQLite. Если последняя ссылка на блоб была снята между
+# prepare() и транзакцией, ensure() положит файл заново; если блоб снова получил
+# ссылку, пока finish() его убирал, finish() вернет файл на место.
+
+BLOB_DIR_NAME = "blobs"
+INCOMING_PREFIX = ".incoming-"
+TOMBSTONE_SUFFIX = ".deleted"
+# Временные файлы в staging_dir: загрузки, недописанные файлы save_upload, копии
+# для обработки, каталоги перекодирования
+STAGING_PREFIXES = (INCOMING_PREFIX, ".upload-", ".copy-", ".waveform-", ".hls-")
+# Файлы без строки в blobs моложе этого возраста сборщик не трогает: это могут
+# быть загрузки, транзакция которых еще не закончилась
+GC_GRACE_SECONDS = 3600
+HASH_CHUNK_SIZE = 1024 * 1024
+
+BLOBS_TABLE = (
+    "CREATE TABLE IF NOT EXISTS blobs ("
+    "sha256 VARCHAR NOT NULL PRIMARY KEY, "
+    "path VARCHAR NOT NULL UNIQUE, "
+    "size INTEGER NOT NULL, "
+    "refcount INTEGER NOT NULL DEFAULT 0, "
+    "created_at DATETIME)"
+)
+
+def blob_relative_path(sha256: str, extension: str = "") -> str:
+    return "/".join((BLOB_DIR_NAME, sha256[:2], sha256[2:4], f"{sha256}{extension.lower()}"))
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class BlobRelease:
+    # Результат release(): orphaned — снята последняя ссылка, и после commit файл
+    # нужно убрать из хранилища (finish). До commit хранилище не трогается
+    def __init__(self, store: "BlobStore", key: str, orphaned: bool):
+        self.store = store
+        self.key = key
+        self.orphaned = orphaned
+
+    def finish(self) -> None:
+        # Файл сначала переносится в tombstone, затем проверяется, не сослалась ли
+        # на блоб новая загрузка того же содержимого (ее ensure() после commit
+        # увидит, что файла нет, и положит его заново). Брошенные tombstone
+        # удаляет collect_garbage
+        storage = self.store.storage
+        if not self.orphaned or storage.stat(self.key) is None:
+            return
+        directory, _, name = self.key.rpartition("/")
+        tombstone = f"{directory}/.{name}.{uuid.uuid4().hex}{TOMBSTONE_SUFFIX}"
+        storage.move(self.key, tombstone)
+        if self.store.is_referenced(self.key):
+            storage.move(tombstone, self.key)
+        else:
+            storage.delete(tombstone)
+
+class BlobStore:
+    def __init__(self, storage: StorageBackend, engine):
+        self.storage = storage
+        self.engine = engine
+
+    def incoming_path(self) -> str:
+        # Локальный временный файл для потоковой записи загрузки
+        return self.storage.staging_path(INCOMING_PREFIX)
+
+    def relative_path(self, file_path: str) -> Optional[str]:
+        if not file_path or not file_path.startswith(public_path(BLOB_DIR_NAME + "/")):
+            return None
+        return storage_key(file_path)
+
+    def blob_sha256(self, file_path: str) -> Optional[str]:
+        relative = self.relative_path(file_path)
+        return relative.rpartition("/")[2].split(".")[0] if relative else None
+
+    def _put(self, key: str, source_path: str, keep_source: bool) -> None:
+        if keep_source:
+            # put() забирает файл, поэтому в хранилище уходит копия из staging_dir
+            copy_path = self.storage.staging_path(".copy-")
+            shutil.copyfile(source_path, copy_path)
+            source_path = copy_path
+        self.storage.put(key, source_path)
+
+    def prepare(self, source_path: str, sha256: str, extension: str = "", keep_source: bool = False) -> None:
+        # Вызывается до транзакции: новое содержимое загружается в хранилище
+        # (в S3 это может быть долго), не удерживая блокировку записи SQLite.
+        # keep_source — исходный файл нужен до commit (миграция старых загрузок)
+        key = blob_relative_path(sha256, extension)
+        if self.storage.stat(key) is None:
+            self._put(key, source_path, keep_source)
+
+    def acquire(self, connection, sha256: str, size: int, extension: str = "") -> str:
+        # Увеличивает счетчик блоба (создает его при первой ссылке). Вызывать внутри
+        # транзакции, в которой создается ссылающийся трек; в хранилище не обращается
+        relative = connection.execute(text(
+            "INSERT INTO blobs (sha256, path, size, refcount, created_at) "
+            "VALUES (:sha256, :path, :size, 1, :now) "
+            "ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + 1 "
+            "RETURNING path"
+        ), {
+            "sha256": sha256, "path": blob_relative_path(sha256, extension), "size": size, "now": datetime.utcnow()
+        }).scalar_one()
+        return public_path(relative)
+
+    def ensure(self, source_path: str, file_path: str) -> None:
+        # Вызывается после commit транзакции с acquire(): если блоб удалили между
+        # prepare() и транзакцией, он кладется заново из source_path (если
+        # prepare() его не забрал). Удалять source_path можно только после этого
+        relative = storage_key(file_path)
+        if self.storage.stat(relative) is not None:
+            return
+        if not os.path.exists(source_path):
+            print(f"Blob {relative} is missing and its source is gone")
+            return
+        self.storage.put(relative, source_path)
+
+    def release(self, connection, file_path: str) -> Optional[BlobRelease]:
+        # Уменьшает счетчик; последняя ссылка удаляет строку, а файл убирается
+        # после commit через BlobRelease.finish(). None — путь не из хранилища
+        # блобов (старый файл в uploads/music)
+        relative = self.relative_path(file_path)
+        if relative is None:
+            return None
+        connection.execute(
+            text("UPDATE blobs SET refcount = refcount - 1 WHERE path = :path"), {"path": relative}
+        )
+        orphaned = connection.execute(
+            text("DELETE FROM blobs WHERE path = :path AND refcount <= 0"), {"path": relative}
+        ).rowcount
+        return BlobRelease(self, relative, bool(orphaned))
+
+    def is_referenced(self, relative: str) -> bool:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                text("SELECT 1 FROM blobs WHERE path = :path"), {"path": relative}
+            ).first() is not None
+
+    def reconcile(self, connection) -> int:
+        # Счетчики пересчитываются по Track.file_path, строки без ссылок удаляются
+        # (их файлы подберет collect_garbage)
+        updated = connection.execute(text(
+            "UPDATE blobs SET refcount = (SELECT COUNT(*) FROM tracks "
+            "WHERE tracks.file_path = :prefix || blobs.path) "
+            "WHERE refcount IS NOT (SELECT COUNT(*) FROM tracks "
+            "WHERE tracks.file_path = :prefix || blobs.path)"
+        ), {"prefix": PUBLIC_PREFIX}).rowcount
+        connection.execute(text("DELETE FROM blobs WHERE refcount <= 0"))
+        return updated
+
+    def collect_garbage(self, connection, grace_seconds: int = GC_GRACE_SECONDS) -> Dict[str, int]:
+        # Удаляет блобы без строки в blobs, их HLS-версии, старые tombstone и
+        # брошенные временные файлы загрузок. Вызывать в транзакции после reconcile()
+        rows = connection.execute(text("SELECT sha256, path FROM blobs")).all()
+        known = {path for _, path in rows}
+        known_hashes = {sha256 for sha256, _ in rows}
+        cutoff = time.time() - grace_seconds
+        removed = {"orphans": 0, "renditions": 0, "incoming": 0, "tombstones": 0}
+        for stored in list(self.storage.list(BLOB_DIR_NAME + "/")):
+            if stored.modified > cutoff:
+                continue
+            if stored.key.endswith(TOMBSTONE_SUFFIX):
+                kind = "tombstones"
+            elif stored.key not in known:
+                kind = "orphans"
+            else:
+                continue
+            self.storage.delete(stored.key)
+            removed[kind] += 1
+        for stored in list(self.storage.list(HLS_DIR_NAME + "/")):
+            if stored.modified <= cutoff and stored.key.split("/")[1] not in known_hashes:
+                self.storage.delete(stored.key)
+                removed["renditions"] += 1
+        for name in os.listdir(self.storage.staging_dir):
+            path = os.path.join(self.storage.staging_dir, name)
+            try:
+                if not name.startswith(STAGING_PREFIXES) or os.stat(path).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                _remove(path)
+            removed["incoming"] += 1
+        return removed
+
+def migrate_uploads(engine, store: BlobStore, upload_dir: str = "uploads") -> Dict[str, int]:
+    # Переносит файлы треков из старого каталога upload_dir (uploads/music) в
+    # хранилище блобов; дубликаты удаляются. Каждый трек — отдельная транзакция,
+    # поэтому прерванную миграцию можно просто запустить еще раз
+    from app.utils.uploads import resolve_upload_path
+
+    with engine.connect() as connection:
+        tracks = connection.execute(text(
+            "SELECT id, file_path FROM tracks WHERE file_path NOT LIKE :prefix"
+        ), {"prefix": public_path(BLOB_DIR_NAME + "/%")}).all()
+    result = {"tracks": len(tracks), "migrated": 0, "deduplicated": 0, "missing": 0}
+    for track_id, file_path in tracks:
+        source = resolve_upload_path(file_path, upload_dir) if file_path else None
+        if not source or not os.path.isfile(source):
+            result["missing"] += 1
+            continue
+        sha256 = file_sha256(source)
+        extension = os.path.splitext(source)[1]
+        store.prepare(source, sha256, extension, keep_source=True)
+        with engine.begin() as connection:
+            duplicate = connection.execute(
+                text("SELECT 1 FROM blobs WHERE sha256 = :sha256"), {"sha256": sha256}
+            ).first() is not None
+            new_path = store.acquire(connection, sha256, os.path.getsize(source), extension)
+            connection.execute(
+                text("UPDATE tracks SET file_path = :path WHERE id = :id"), {"path": new_path, "id": track_id}
+            )
+            enqueue_transcode(connection, sha256)
+        # Старый файл удаляется только после успешного commit
+        store.ensure(source, new_path)
+        _remove(source)
+        result["migrated"] += 1
+        result["deduplicated"] += duplicate
+    return result
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.config import settings
+    from app.database.database import engine
+    from app.utils.storage import storage_from_settings
+
+    parser = argparse.ArgumentParser(description="Content-addressed track storage maintenance")
+    parser.add_argument("command", choices=["migrate", "gc"])
+    parser.add_argument("--upload-dir", default="uploads", help="directory with not yet migrated files")
+    parser.add_argument("--grace-seconds", type=int, default=GC_GRACE_SECONDS)
+    args = parser.parse_args()
+
+    store = BlobStore(storage_from_settings(settings), engine)
+    if args.command == "migrate":
+        for key, value in migrate_uploads(engine, store, args.upload_dir).items():
+            print(f"{key}: {value}")
+    with engine.begin() as connection:
+        print(f"refcounts repaired: {store.reconcile(connection)}")
+        for key, value in store.collect_garbage(connection, args.grace_seconds).items():
+            print(f"removed {key}: {value}")
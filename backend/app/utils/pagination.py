@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+invalid_cursor_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid cursor",
+)
+
+def encode_cursor(*values: Any) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise invalid_cursor_exception
+    if not isinstance(values, list) or len(values) != size:
+        raise invalid_cursor_exception
+    return values
+
+def decode_time_cursor(cursor: str) -> Tuple[datetime, str]:
+    created_at, row_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (TypeError, ValueError):
+        raise invalid_cursor_exception
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, str]:
+    score, key = decode_cursor(cursor, 2)
+    try:
+        return float(score), str(key)
+    except (TypeError, ValueError):
+        raise invalid_cursor_exception
+
+def page_limit(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    # Без limit и cursor список отдается целиком, как до пагинации: существующие
+    # клиенты ожидают полный список. None — без ограничения
+    if limit is None and not cursor:
+        return None
+    return limit or DEFAULT_PAGE_SIZE
+
+def paginate_by_time(query, created_column, id_column, cursor: Optional[str], limit: Optional[int], ascending: bool = False):
+    # Keyset-пагинация от новых к старым (или от старых к новым) по (created_at, id):
+    # глубокие страницы стоят столько же, сколько первая, т.к. OFFSET не используется
+    if ascending:
+        query = query.order_by(created_column, id_column)
+    else:
+        query = query.order_by(created_column.desc(), id_column.desc())
+    if cursor:
+        created_at, row_id = decode_time_cursor(cursor)
+        position = tuple_(created_column, id_column)
+        boundary = tuple_(created_at, row_id)
+        query = query.filter(position > boundary if ascending else position < boundary)
+    # Запрашиваем на одну строку больше, чтобы узнать, есть ли следующая страница
+    return query.limit(limit + 1) if limit is not None else query
+
+def paginate_by_key(query, key_column, cursor: Optional[str], limit: Optional[int]):
+    query = query.order_by(key_column)
+    if cursor:
+        (key,) = decode_cursor(cursor, 1)
+        query = query.filter(key_column > key)
+    return query.limit(limit + 1) if limit is not None else query
+
+def split_page(rows: Sequence, limit: Optional[int]) -> Tuple[List, bool]:
+    rows = list(rows)
+    if limit is None:
+        return rows, False
+    return rows[:limit], len(rows) > limit
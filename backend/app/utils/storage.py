@@ -0,0 +1,307 @@
+import mimetypes
+import os
+import shutil
+import stat
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from typing import Iterator, NamedTuple, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import Settings
+from app.utils.streaming import CHUNK_SIZE, RangeIteratorResponse, conditional_ranges, file_etag, range_file_response
+
+# Хранилище загруженных файлов. Ключ — путь относительно корня хранилища
+# ("blobs/ab/cd/<sha256>.mp3", "covers/<id>.png"), в API он публикуется как
+# "/uploads/<ключ>". LocalStorage хранит файлы в каталоге одного узла,
+# S3Storage — в S3-совместимом бакете (AWS, MinIO), общем для всех узлов.
+#
+# Загрузки сначала пишутся в локальный staging_dir (там же считается хеш),
+# put() переносит готовый файл в хранилище. Имена, начинающиеся с точки,
+# служебные (временные файлы, tombstone) и наружу не отдаются.
+
+PUBLIC_PREFIX = "/uploads/"
+STAGING_DIR_NAME = ".staging"
+# Типы, которые mimetypes определяет неверно или не знает (.ts — сегменты HLS)
+MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    etag: str
+    modified: float
+
+class LocalCopy(NamedTuple):
+    # Локальный файл для обработки (ffmpeg, волна); temporary — удалить после
+    path: str
+    temporary: bool
+
+    def release(self) -> None:
+        if self.temporary:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+def public_path(key: str) -> str:
+    return f"{PUBLIC_PREFIX}{key}"
+
+def storage_key(path: str) -> str:
+    # "/uploads/covers/x.png" -> "covers/x.png"
+    return path[len(PUBLIC_PREFIX):] if path.startswith(PUBLIC_PREFIX) else path.lstrip("/")
+
+def is_public_key(key: str) -> bool:
+    # Разделитель только "/": обратный слеш и ":" (диск в Windows) в ключах не бывают
+    parts = key.split("/")
+    return bool(key) and "\\" not in key and ":" not in key and all(
+        part and not part.startswith(".") for part in parts
+    )
+
+def guess_media_type(key: str) -> str:
+    extension = os.path.splitext(key)[1].lower()
+    return MEDIA_TYPES.get(extension) or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+class StorageBackend(ABC):
+    staging_dir: str
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[StoredObject]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, source_path: str) -> None:
+        # Переносит локальный файл в хранилище; source_path после вызова не существует
+        ...
+
+    @abstractmethod
+    def get_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        # Байты [start, end] включительно, кусками
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def move(self, key: str, new_key: str) -> None:
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        ...
+
+    @abstractmethod
+    def fetch(self, key: str, path: str) -> None:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        # Путь к файлу на этом узле, если хранилище локальное (для sendfile)
+        return None
+
+    def staging_path(self, prefix: str = ".incoming-") -> str:
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return os.path.join(self.staging_dir, f"{prefix}{uuid.uuid4()}")
+
+    def local_copy(self, key: str) -> LocalCopy:
+        path = self.local_path(key)
+        if path is not None:
+            return LocalCopy(path, False)
+        path = self.staging_path(".copy-") + os.path.splitext(key)[1]
+        try:
+            self.fetch(key, path)
+        except BaseException:
+            LocalCopy(path, True).release()
+            raise
+        return LocalCopy(path, True)
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str = "uploads", staging_dir: Optional[str] = None):
+        self.root = root
+        self.staging_dir = staging_dir or os.path.join(root, STAGING_DIR_NAME)
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        # Итоговый путь (после "..", символических ссылок, а в Windows — "\\" и
+        # букв дисков) обязан остаться внутри root, как в проверке StaticFiles
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, *key.split("/")))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Storage key outside of the storage root: {key!r}")
+        return path
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat_result = os.stat(self.path(key))
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+        return StoredObject(key, stat_result.st_size, file_etag(stat_result), stat_result.st_mtime)
+
+    def put(self, key: str, source_path: str) -> None:
+        destination = self.path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            os.replace(source_path, destination)
+        except OSError:
+            # staging_dir на другом разделе: копия рядом с целью, затем атомарная замена
+            temp_path = os.path.join(os.path.dirname(destination), f".put-{uuid.uuid4()}")
+            shutil.move(source_path, temp_path)
+            os.replace(temp_path, destination)
+
+    def get_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def move(self, key: str, new_key: str) -> None:
+        destination = self.path(new_key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(self.path(key), destination)
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        for directory, _, files in os.walk(self.path(prefix)):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+                stored = self.stat(key)
+                if stored is not None:
+                    yield stored
+
+    def fetch(self, key: str, path: str) -> None:
+        shutil.copyfile(self.path(key), path)
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        return path if os.path.isfile(path) else None
+
+class S3Storage(StorageBackend):
+    # Любое S3-совместимое хранилище; для MinIO задается endpoint_url.
+    # Учетные данные берутся boto3 из окружения (AWS_ACCESS_KEY_ID и т.д.)
+    NOT_FOUND = {"404", "NoSuchKey", "NotFound"}
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region_name: Optional[str] = None, staging_dir: Optional[str] = None, client=None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError("S3 storage requires boto3 (pip install boto3)") from e
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region_name)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.staging_dir = staging_dir or os.path.join(tempfile.gettempdir(), "audiobridge-staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _is_not_found(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in self.NOT_FOUND
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self.client.exceptions.ClientError as e:
+            if self._is_not_found(e):
+                return None
+            raise
+        return StoredObject(key, head["ContentLength"], head["ETag"], head["LastModified"].timestamp())
+
+    def put(self, key: str, source_path: str) -> None:
+        self.client.upload_file(
+            source_path, self.bucket, self._object_key(key),
+            ExtraArgs={"ContentType": guess_media_type(key)}
+        )
+        os.remove(source_path)
+
+    def get_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        body = self.client.get_object(
+            Bucket=self.bucket, Key=self._object_key(key), Range=f"bytes={start}-{end}"
+        )["Body"]
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def move(self, key: str, new_key: str) -> None:
+        # В S3 нет переименования: копия и удаление исходного объекта
+        self.client.copy_object(
+            Bucket=self.bucket, Key=self._object_key(new_key),
+            CopySource={"Bucket": self.bucket, "Key": self._object_key(key)}
+        )
+        self.delete(key)
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for item in page.get("Contents", []):
+                yield StoredObject(
+                    item["Key"][len(self.prefix):], item["Size"], item["ETag"], item["LastModified"].timestamp()
+                )
+
+    def fetch(self, key: str, path: str) -> None:
+        self.client.download_file(self.bucket, self._object_key(key), path)
+
+def create_storage(backend: str, local_root: str = "uploads", bucket: Optional[str] = None,
+                   prefix: str = "", endpoint_url: Optional[str] = None, region_name: Optional[str] = None,
+                   staging_dir: Optional[str] = None) -> StorageBackend:
+    if backend == "local":
+        return LocalStorage(local_root, staging_dir)
+    if backend == "s3":
+        if not bucket:
+            raise ValueError("S3 storage requires a bucket name")
+        return S3Storage(bucket, prefix, endpoint_url, region_name, staging_dir)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def storage_from_settings(config: Settings) -> StorageBackend:
+    return create_storage(
+        config.STORAGE_BACKEND,
+        local_root=config.STORAGE_LOCAL_ROOT,
+        bucket=config.S3_BUCKET,
+        prefix=config.S3_PREFIX,
+        endpoint_url=config.S3_ENDPOINT_URL,
+        region_name=config.S3_REGION,
+        staging_dir=config.STORAGE_STAGING_DIR,
+    )
+
+async def storage_response(
+    request: Request, storage: StorageBackend, stored: StoredObject, media_type: str
+) -> Response:
+    # С локального диска файл отдается через sendfile, из S3 — Range-запросами к объекту.
+    # Проверка локального пути обращается к диску, поэтому выполняется в threadpool
+    path = await run_in_threadpool(storage.local_path, stored.key)
+    if path is not None:
+        return await range_file_response(request, path, media_type)
+    headers, response, ranges = conditional_ranges(request, stored.size, stored.etag, stored.modified)
+    if response is not None:
+        return response
+    return RangeIteratorResponse(
+        lambda start, end: storage.get_range(stored.key, start, end),
+        stored.size,
+        media_type,
+        ranges=ranges,
+        headers=headers,
+        send_body=request.method != "HEAD",
+    )
@@ -0,0 +1,268 @@
+import os
+import secrets
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncContextManager, Awaitable, Callable, Iterator, List, Optional, Tuple
+
+import anyio
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 64 * 1024
+MAX_RANGES = 16
+
+ByteRange = Tuple[int, int]
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    # Возвращает отсортированные и объединенные диапазоны [start, end] включительно.
+    # None — заголовок отсутствует или некорректен (отдаем файл целиком),
+    # RangeNotSatisfiable — ни один диапазон не попадает в файл (416).
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        start_text, sep, end_text = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if start_text:
+                start = int(start_text)
+                end = int(end_text) if end_text else size - 1
+                if end_text and end < start:
+                    return None
+            else:
+                suffix = int(end_text)
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start < 0 or start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def if_range_matches(if_range: Optional[str], etag: str, last_modified: float) -> bool:
+    # If-Range сравнивается строго: слабые ETag и неточные даты не подходят
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    try:
+        return int(parsedate_to_datetime(if_range).timestamp()) == int(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+def not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+class RangeResponse(Response, ABC):
+    # Ответ с содержимым целиком или его частями (одна часть — 206 с Content-Range,
+    # несколько — multipart/byteranges). Откуда читать байты, решает подкласс
+    def __init__(
+        self,
+        size: int,
+        media_type: str,
+        ranges: Optional[List[ByteRange]] = None,
+        headers: Optional[dict] = None,
+        send_body: bool = True,
+    ):
+        self.ranges = ranges
+        self.send_body = send_body
+        self.parts: List[Tuple[bytes, int, int]] = []
+
+        if ranges and len(ranges) == 1:
+            start, end = ranges[0]
+            status_code = 206
+            self.parts = [(b"", start, end - start + 1)]
+            content_length = end - start + 1
+            headers = {**(headers or {}), "Content-Range": f"bytes {start}-{end}/{size}"}
+        elif ranges:
+            status_code = 206
+            boundary = secrets.token_hex(16)
+            for start, end in ranges:
+                part_header = (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((part_header, start, end - start + 1))
+            self.trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            content_length = sum(len(header) + count for header, _, count in self.parts)
+            # Каждая часть, кроме первой, отделяется CRLF перед границей
+            content_length += 2 * (len(self.parts) - 1) + len(self.trailer)
+            media_type = f"multipart/byteranges; boundary={boundary}"
+        else:
+            status_code = 200
+            self.parts = [(b"", 0, size)]
+            content_length = size
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.headers["content-length"] = str(content_length)
+
+    @abstractmethod
+    def body_source(self, scope: Scope) -> AsyncContextManager[Callable[[Send, int, int], Awaitable[None]]]:
+        # Контекст, отдающий функцию send_range(send, offset, count)
+        ...
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        multipart = len(self.parts) > 1
+        async with self.body_source(scope) as send_range:
+            for index, (part_header, offset, count) in enumerate(self.parts):
+                prefix = (b"\r\n" if index else b"") + part_header if multipart else b""
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                await send_range(send, offset, count)
+        await send({
+            "type": "http.response.body",
+            "body": self.trailer if multipart else b"",
+            "more_body": False,
+        })
+
+class RangeFileResponse(RangeResponse):
+    # Если сервер поддерживает ASGI-расширение http.response.zerocopysend, байты
+    # отдаются через sendfile, иначе читаются в threadpool кусками по CHUNK_SIZE,
+    # не занимая event loop.
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        media_type: str,
+        ranges: Optional[List[ByteRange]] = None,
+        headers: Optional[dict] = None,
+        send_body: bool = True,
+    ):
+        self.path = path
+        super().__init__(stat_result.st_size, media_type, ranges, headers, send_body)
+
+    @asynccontextmanager
+    async def body_source(self, scope: Scope):
+        zero_copy = "http.response.zerocopysend" in scope.get("extensions", {})
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            async def send_range(send: Send, offset: int, count: int) -> None:
+                if zero_copy:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": file.wrapped,
+                        "offset": offset,
+                        "count": count,
+                        "more_body": True,
+                    })
+                    return
+                await file.seek(offset)
+                remaining = count
+                while remaining > 0:
+                    chunk = await file.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+            yield send_range
+
+class RangeIteratorResponse(RangeResponse):
+    # Части читаются функцией read_range(start, end) -> итератор байтов
+    # (например, Range-запросом к объектному хранилищу) в threadpool
+    def __init__(
+        self,
+        read_range: Callable[[int, int], Iterator[bytes]],
+        size: int,
+        media_type: str,
+        ranges: Optional[List[ByteRange]] = None,
+        headers: Optional[dict] = None,
+        send_body: bool = True,
+    ):
+        self.read_range = read_range
+        super().__init__(size, media_type, ranges, headers, send_body)
+
+    @asynccontextmanager
+    async def body_source(self, scope: Scope):
+        async def send_range(send: Send, offset: int, count: int) -> None:
+            if not count:
+                return
+            async for chunk in iterate_in_threadpool(self.read_range(offset, offset + count - 1)):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+        yield send_range
+
+def conditional_ranges(request: Request, size: int, etag: str, last_modified: float):
+    # Общая часть ответов с Range: заголовки и либо готовый ответ (304/416),
+    # либо запрошенные диапазоны (None — отдавать целиком)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+    }
+    if not_modified(request, etag, last_modified):
+        return headers, Response(status_code=304, headers=headers), None
+    ranges = None
+    if if_range_matches(request.headers.get("if-range"), etag, last_modified):
+        try:
+            ranges = parse_range_header(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return headers, Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            ), None
+    return headers, None, ranges
+
+async def range_file_response(request: Request, path: str, media_type: str) -> Response:
+    # stat — обращение к диску, поэтому не в event loop
+    stat_result = await run_in_threadpool(os.stat, path)
+    headers, response, ranges = conditional_ranges(
+        request, stat_result.st_size, file_etag(stat_result), stat_result.st_mtime
+    )
+    if response is not None:
+        return response
+    return RangeFileResponse(
+        path,
+        stat_result,
+        media_type,
+        ranges=ranges,
+        headers=headers,
+        send_body=request.method != "HEAD",
+    )
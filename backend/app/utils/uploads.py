@@ -0,0 +1,104 @@
+import hashlib
+import os
+import tempfile
+from typing import Dict, NamedTuple
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Запас на заголовки частей multipart и текстовые поля формы
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class SavedUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+def _write_chunk(file, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    file.write(chunk)
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+async def save_upload(upload: UploadFile, path: str, max_bytes: int) -> SavedUpload:
+    # Файл копируется кусками: чтение, запись и хеширование идут в threadpool и
+    # не блокируют event loop. Пишем во временный файл рядом с целевым и
+    # переименовываем его атомарно, чтобы никто не увидел недописанный файл.
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File is too large. Maximum size is {max_bytes // (1024 * 1024)} MB."
+                    )
+                await run_in_threadpool(_write_chunk, temp_file, digest, chunk)
+        await run_in_threadpool(os.replace, temp_path, path)
+    except BaseException:
+        _discard(temp_path)
+        raise
+    return SavedUpload(path=path, size=size, sha256=digest.hexdigest())
+
+def resolve_upload_path(public_path: str, upload_dir: str = "uploads") -> str:
+    # "/uploads/music/<id>.mp3" -> путь к файлу внутри upload_dir
+    prefix = "/uploads/"
+    relative = public_path[len(prefix):] if public_path.startswith(prefix) else public_path.lstrip("/")
+    return os.path.join(upload_dir, relative)
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request body is too large. Maximum size is {max_bytes // (1024 * 1024)} MB."
+    )
+
+class RequestBodyLimitMiddleware:
+    # Starlette разбирает multipart целиком до вызова обработчика, поэтому лимит в
+    # save_upload срабатывает, когда все тело уже принято во временные файлы.
+    # Здесь тело ограничивается на входе: по Content-Length запрос отклоняется
+    # сразу, без него (chunked) — как только принятые байты превысили лимит.
+    # limits — путь -> максимальный размер тела POST-запроса в байтах
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            error = _too_large(limit)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Разбор формы прерывается, ответ 413 отдает обработчик исключений FastAPI
+                    raise _too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,105 @@
+# Задержка быстрых запросов, пока параллельно выполняются медленные:
+# синхронная Session внутри async def против AsyncSession (aiosqlite).
+#
+#   python -m benchmarks.async_db_benchmark --slow 4 --fast 50
+#
+# База создается во временном каталоге, рабочая audiobridge.db не затрагивается.
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database.database import create_async_database_engine, create_database_engine
+
+# Медленный запрос: рекурсивный CTE, который SQLite считает сотни миллисекунд
+SLOW_QUERY = text(
+    "WITH RECURSIVE numbers(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM numbers WHERE n < :count) "
+    "SELECT count(*) FROM numbers"
+)
+FAST_QUERY = text("SELECT 1")
+
+def build_app(url: str) -> FastAPI:
+    app = FastAPI()
+    SyncSession = sessionmaker(bind=create_database_engine(url))
+    AsyncSessionFactory = async_sessionmaker(create_async_database_engine(url))
+
+    def get_sync_db():
+        with SyncSession() as db:
+            yield db
+
+    async def get_async_db():
+        async with AsyncSessionFactory() as db:
+            yield db
+
+    # Так сейчас устроены эндпоинты main.py: async def + синхронная сессия
+    @app.get("/sync/slow")
+    async def sync_slow(count: int, db: Session = Depends(get_sync_db)):
+        return {"n": db.execute(SLOW_QUERY, {"count": count}).scalar()}
+
+    @app.get("/sync/fast")
+    async def sync_fast(db: Session = Depends(get_sync_db)):
+        return {"n": db.execute(FAST_QUERY).scalar()}
+
+    @app.get("/async/slow")
+    async def async_slow(count: int, db: AsyncSession = Depends(get_async_db)):
+        return {"n": (await db.execute(SLOW_QUERY, {"count": count})).scalar()}
+
+    @app.get("/async/fast")
+    async def async_fast(db: AsyncSession = Depends(get_async_db)):
+        return {"n": (await db.execute(FAST_QUERY)).scalar()}
+
+    return app
+
+async def run_mode(client: httpx.AsyncClient, mode: str, slow: int, fast: int, count: int) -> dict:
+    latencies = []
+
+    async def fast_request():
+        started = time.perf_counter()
+        response = await client.get(f"/{mode}/fast")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    async def fast_stream():
+        # Быстрые запросы идут один за другим, пока выполняются медленные
+        for _ in range(fast):
+            await fast_request()
+
+    started = time.perf_counter()
+    slow_requests = [client.get(f"/{mode}/slow", params={"count": count}) for _ in range(slow)]
+    await asyncio.gather(fast_stream(), *slow_requests)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "fast p50 ms": round(statistics.median(latencies), 2),
+        "fast p99 ms": round(latencies[int(len(latencies) * 0.99)], 2),
+        "fast max ms": round(latencies[-1], 2),
+        "wall s": round(elapsed, 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slow", type=int, default=4, help="concurrent slow requests")
+    parser.add_argument("--fast", type=int, default=50, help="sequential fast requests")
+    parser.add_argument("--count", type=int, default=2_000_000, help="rows generated by the slow query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = build_app(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for mode in ("sync", "async"):
+                await client.get(f"/{mode}/fast")
+                result = await run_mode(client, mode, args.slow, args.fast, args.count)
+                print(f"{mode + ' session':>14}: " + ", ".join(f"{key} {value}" for key, value in result.items()))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+# Задержка посторонних запросов во время потока логинов:
+# bcrypt прямо в async-обработчике против PasswordHashPool.
+#
+#   python -m benchmarks.login_flood_benchmark --logins 40 --pings 100
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from passlib.context import CryptContext
+
+from app.core.password_hashing import PasswordHashPool
+
+def build_app(workers: int, max_pending: int):
+    app = FastAPI()
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pool = PasswordHashPool(context, max_workers=workers, max_pending=max_pending)
+    hashed = context.hash("secret")
+
+    # Так было в main.py: verify выполняется в потоке event loop
+    @app.post("/inline/login")
+    async def inline_login():
+        if not context.verify("secret", hashed):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.post("/pooled/login")
+    async def pooled_login():
+        if not await pool.verify("secret", hashed):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app, pool
+
+async def run_mode(client: httpx.AsyncClient, mode: str, logins: int, pings: int) -> dict:
+    latencies = []
+    statuses = []
+
+    async def login():
+        statuses.append((await client.post(f"/{mode}/login")).status_code)
+
+    async def ping(index: int):
+        # Запросы отправляются по расписанию; задержка считается от запланированного
+        # момента, поэтому учитывается и время, пока event loop был занят
+        scheduled = started + index * interval
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        (await client.get("/ping")).raise_for_status()
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+
+    interval = 0.02
+    started = time.perf_counter()
+    await asyncio.gather(*(ping(i) for i in range(pings)), *(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "ping p50 ms": round(statistics.median(latencies), 2),
+        "ping p99 ms": round(latencies[int(len(latencies) * 0.99)], 2),
+        "logins ok": statuses.count(200),
+        "logins 429": statuses.count(429),
+        "wall s": round(elapsed, 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40, help="concurrent login requests")
+    parser.add_argument("--pings", type=int, default=100, help="requests to an unrelated endpoint, one every 20 ms")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=16)
+    args = parser.parse_args()
+
+    app, pool = build_app(args.workers, args.max_pending)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for mode in ("inline", "pooled"):
+            result = await run_mode(client, mode, args.logins, args.pings)
+            print(f"{mode + ' bcrypt':>14}: " + ", ".join(f"{key} {value}" for key, value in result.items()))
+    print(f"pool metrics: {pool.metrics()}")
+    pool.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+# Сравнение поиска через ilike ('%q%') и через FTS5-индекс.
+#
+#   python -m benchmarks.search_benchmark --tracks 200000 --users 50000
+#
+# База создается во временном каталоге, рабочая audiobridge.db не затрагивается.
+import argparse
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, text
+
+from app.database.search_index import (
+    ensure_search_index, build_match_query, track_search_statement, user_search_statement
+)
+
+SYLLABLES = [
+    "la", "lo", "ve", "mi", "ra", "su", "ko", "ne", "ta", "ri", "do", "na", "be", "zo", "ka",
+    "но", "чь", "ле", "то", "ра", "ду", "ми", "се", "ро", "зв",
+]
+WORDS = sorted({
+    "".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4))) for _ in range(5000)
+})
+
+# Те же запросы, что строит ilike-ветка в main.py (с сортировкой для пагинации)
+ILIKE_TRACKS = text(
+    "SELECT id FROM tracks WHERE lower(name) LIKE lower(:pattern) "
+    "OR lower(owner_username) LIKE lower(:pattern) ORDER BY created_at DESC, id DESC LIMIT :limit"
+)
+ILIKE_USERS = text(
+    "SELECT username FROM users WHERE lower(username) LIKE lower(:pattern) "
+    "OR lower(nickname) LIKE lower(:pattern) OR lower(full_name) LIKE lower(:pattern) "
+    "ORDER BY username LIMIT :limit"
+)
+
+def random_name(words: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(words))
+
+def populate(engine, tracks: int, users: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE users (username VARCHAR PRIMARY KEY, nickname VARCHAR, full_name VARCHAR)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE tracks (id VARCHAR PRIMARY KEY, name VARCHAR, owner_username VARCHAR, "
+            "created_at DATETIME)"
+        ))
+        usernames = [
+            "".join(random.choices(string.ascii_lowercase, k=8)) + str(i) for i in range(users)
+        ]
+        connection.execute(
+            text("INSERT INTO users VALUES (:username, :nickname, :full_name)"),
+            [
+                {"username": name, "nickname": random_name(1), "full_name": random_name(2)}
+                for name in usernames
+            ],
+        )
+        connection.execute(
+            text("INSERT INTO tracks VALUES (:id, :name, :owner, datetime('now', :offset))"),
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "name": random_name(3),
+                    "owner": random.choice(usernames),
+                    "offset": f"-{i} seconds",
+                }
+                for i in range(tracks)
+            ],
+        )
+        connection.execute(text("CREATE INDEX ix_bench_tracks_created ON tracks (created_at, id)"))
+
+def measure(connection, statement, params, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(statement, params).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def report(label: str, timings: list) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<14} median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        print(f"Populating {args.tracks} tracks and {args.users} users...")
+        populate(engine, args.tracks, args.users)
+        started = time.perf_counter()
+        if not ensure_search_index(engine):
+            print("SQLite is built without FTS5, nothing to compare")
+            return
+        print(f"FTS5 index built in {time.perf_counter() - started:.1f} s")
+
+        sample = random.sample(WORDS, 3)
+        queries = [sample[0][:2], sample[0][:4], sample[0], sample[1], f"{sample[1]} {sample[2][:3]}"]
+        with engine.connect() as connection:
+            for query in queries:
+                print(f"\nquery: {query!r}")
+                pattern = {"pattern": f"%{query}%", "limit": args.limit}
+                match = build_match_query(query)
+                report("ilike tracks", measure(connection, ILIKE_TRACKS, pattern, args.repeat))
+                report("fts tracks", measure(connection, *track_search_statement(match, args.limit), args.repeat))
+                report("ilike users", measure(connection, ILIKE_USERS, pattern, args.repeat))
+                report("fts users", measure(connection, *user_search_statement(match, args.limit), args.repeat))
+
+if __name__ == "__main__":
+    main()
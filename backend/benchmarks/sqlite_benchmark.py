@@ -0,0 +1,122 @@
+# Пропускная способность SQLite при параллельных чтениях и записях:
+# движок по умолчанию против create_database_engine (WAL, pragmas, пул).
+#
+#   python -m benchmarks.sqlite_benchmark --readers 8 --writers 4 --seconds 10
+#
+# Базы создаются во временном каталоге, рабочая audiobridge.db не затрагивается.
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from app.database.database import create_database_engine
+
+READ_PAGE = text("SELECT id, name, plays FROM tracks ORDER BY created_at DESC, id DESC LIMIT 20")
+WRITE_PLAY = text(
+    "INSERT INTO track_plays (id, track_id, username, played_at) VALUES (:id, :track_id, :username, :played_at)"
+)
+BUMP_PLAYS = text("UPDATE tracks SET plays = plays + 1 WHERE id = :track_id")
+
+def populate(engine, tracks: int) -> list:
+    track_ids = [str(uuid.uuid4()) for _ in range(tracks)]
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE tracks (id VARCHAR PRIMARY KEY, name VARCHAR, created_at DATETIME, plays INTEGER)"
+        ))
+        connection.execute(text("CREATE INDEX ix_tracks_created ON tracks (created_at, id)"))
+        connection.execute(text(
+            "CREATE TABLE track_plays (id VARCHAR PRIMARY KEY, track_id VARCHAR, username VARCHAR, played_at DATETIME)"
+        ))
+        connection.execute(
+            text("INSERT INTO tracks VALUES (:id, :name, :created_at, 0)"),
+            [
+                {"id": track_id, "name": f"Track {i}", "created_at": start + timedelta(minutes=i)}
+                for i, track_id in enumerate(track_ids)
+            ],
+        )
+    return track_ids
+
+def run_load(engine, track_ids: list, readers: int, writers: int, seconds: float) -> dict:
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    write_latencies = []
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(READ_PAGE).all()
+                key = "reads"
+            except (OperationalError, PoolTimeoutError):
+                key = "errors"
+            with lock:
+                stats[key] += 1
+
+    def writer(index: int):
+        counter = 0
+        while not stop.is_set():
+            track_id = track_ids[counter % len(track_ids)]
+            counter += 1
+            started = time.perf_counter()
+            try:
+                with engine.begin() as connection:
+                    connection.execute(WRITE_PLAY, {
+                        "id": str(uuid.uuid4()), "track_id": track_id,
+                        "username": f"user{index}", "played_at": datetime.utcnow(),
+                    })
+                    connection.execute(BUMP_PLAYS, {"track_id": track_id})
+                key = "writes"
+            except (OperationalError, PoolTimeoutError):
+                key = "errors"
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                stats[key] += 1
+                if key == "writes":
+                    write_latencies.append(elapsed)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    write_latencies.sort()
+    return {
+        "reads/s": round(stats["reads"] / seconds),
+        "writes/s": round(stats["writes"] / seconds),
+        "errors": stats["errors"],
+        "write p50 ms": round(statistics.median(write_latencies), 2) if write_latencies else None,
+        "write p99 ms": round(write_latencies[int(len(write_latencies) * 0.99)], 2) if write_latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, factory in (("default engine", create_engine), ("tuned engine", create_database_engine)):
+            url = f"sqlite:///{os.path.join(directory, label.replace(' ', '_'))}.db"
+            engine = factory(url)
+            track_ids = populate(engine, args.tracks)
+            result = run_load(engine, track_ids, args.readers, args.writers, args.seconds)
+            engine.dispose()
+            print(f"{label:>15}: " + ", ".join(f"{key} {value}" for key, value in result.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Нагрузочный тест стриминга: N одновременных слушателей запрашивают случайные
+# диапазоны трека (как при перемотке) у запущенного сервера.
+#
+#   uvicorn main:app --workers 4
+#   python -m benchmarks.stream_benchmark --track-id <id> --listeners 50 --requests 40
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from urllib.parse import urlparse
+
+def listener(base_url: str, path: str, size: int, requests: int, range_size: int, results: list, lock):
+    url = urlparse(base_url)
+    connection = HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    latencies, received = [], 0
+    for _ in range(requests):
+        start = random.randrange(0, max(size - range_size, 1))
+        started = time.perf_counter()
+        connection.request("GET", path, headers={"Range": f"bytes={start}-{start + range_size - 1}"})
+        response = connection.getresponse()
+        first_byte = time.perf_counter()
+        body = response.read()
+        if response.status != 206:
+            raise RuntimeError(f"Unexpected status {response.status}")
+        latencies.append((first_byte - started) * 1000)
+        received += len(body)
+    connection.close()
+    with lock:
+        results.append((latencies, received))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--track-id", required=True)
+    parser.add_argument("--listeners", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--range-size", type=int, default=256 * 1024)
+    args = parser.parse_args()
+
+    path = f"/tracks/{args.track_id}/stream"
+    url = urlparse(args.base_url)
+    probe = HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    probe.request("HEAD", path)
+    response = probe.getresponse()
+    response.read()
+    if response.status != 200:
+        raise SystemExit(f"HEAD {path} returned {response.status}")
+    size = int(response.getheader("Content-Length"))
+
+    results, lock = [], threading.Lock()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.listeners) as pool:
+        futures = [
+            pool.submit(listener, args.base_url, path, size, args.requests, args.range_size, results, lock)
+            for _ in range(args.listeners)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for listener_latencies, _ in results for latency in listener_latencies)
+    received = sum(received for _, received in results)
+    print(f"{len(latencies)} range requests from {args.listeners} listeners in {elapsed:.2f} s")
+    print(f"throughput     {received / elapsed / 1024 / 1024:8.1f} MiB/s, {len(latencies) / elapsed:8.1f} req/s")
+    print(f"time to first byte: median {statistics.median(latencies):.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+
+if __name__ == "__main__":
+    main()
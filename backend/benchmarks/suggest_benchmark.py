@@ -0,0 +1,85 @@
+# Задержка подсказок поиска (SuggestIndex) на синтетических данных, без базы.
+#
+#   python -m benchmarks.suggest_benchmark --tracks 200000 --users 50000
+#
+# Показывает время сборки дерева, ответа на префиксы разной длины и
+# инкрементального добавления и удаления трека.
+import argparse
+import random
+import statistics
+import string
+import time
+import uuid
+
+from app.core.suggest import SuggestIndex, Suggestion, suggestion_keys
+
+SYLLABLES = [
+    "la", "lo", "ve", "mi", "ra", "su", "ko", "ne", "ta", "ri", "do", "na", "be", "zo", "ka",
+    "но", "чь", "ле", "то", "ра", "ду", "ми", "се", "ро", "зв",
+]
+WORDS = sorted({
+    "".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4))) for _ in range(5000)
+})
+
+def random_name(words: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(words))
+
+def entries(tracks: int, users: int):
+    usernames = ["".join(random.choices(string.ascii_lowercase, k=8)) + str(i) for i in range(users)]
+    for username in usernames:
+        nickname = random_name(1)
+        yield Suggestion(
+            "user", username, nickname, username, random.paretovariate(1.2),
+            suggestion_keys(username, nickname, random_name(2))
+        )
+    for _ in range(tracks):
+        name = random_name(3)
+        yield Suggestion(
+            "track", str(uuid.uuid4()), name, random.choice(usernames), random.paretovariate(1.2),
+            suggestion_keys(name)
+        )
+
+def report(label: str, timings: list) -> None:
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{label:<22} median {statistics.median(timings) * 1000:8.1f} us   p99 {p99 * 1000:8.1f} us")
+
+def measure(action, arguments) -> list:
+    timings = []
+    for argument in arguments:
+        started = time.perf_counter()
+        action(argument)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    index = SuggestIndex()
+    data = list(entries(args.tracks, args.users))
+    started = time.perf_counter()
+    index.load(data)
+    print(f"Index of {len(index)} entries built in {time.perf_counter() - started:.1f} s\n")
+
+    for length in (1, 2, 3, 5, 8):
+        prefixes = [random.choice(WORDS)[:length] for _ in range(args.repeat)]
+        report(f"prefix length {length}", measure(lambda prefix: index.suggest(prefix, args.limit), prefixes))
+    report("two words", measure(
+        lambda query: index.suggest(query, args.limit),
+        [f"{random.choice(WORDS)} {random.choice(WORDS)[:2]}" for _ in range(args.repeat)]
+    ))
+
+    added = [
+        Suggestion("track", str(uuid.uuid4()), name, "bench", 0.0, suggestion_keys(name))
+        for name in (random_name(3) for _ in range(args.repeat // 10))
+    ]
+    report("add track", measure(index.add, added))
+    report("remove track", measure(lambda entry: index.remove(entry.kind, entry.id), added))
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,72 @@
 from datetime import datetime, timedelta
 from typing import Optional, List
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request
+from fastapi import (
+    FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request, Response, Query, BackgroundTasks
+)
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
-import shutil
 import uuid
-from sqlalchemy import create_engine, Column, String, DateTime, ForeignKey, Boolean, Integer, func, UniqueConstraint
+from sqlalchemy import (
+    Column, String, DateTime, ForeignKey, Boolean, Integer, Float, func, UniqueConstraint, Index, select, union_all
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker, Session, aliased
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from fastapi.middleware.cors import CORSMiddleware
 import time
-from fastapi.staticfiles import StaticFiles
-import random
+import asyncio
+import shutil
+import tempfile
+from collections import Counter, defaultdict
+from starlette.concurrency import run_in_threadpool
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_rank_cursor, page_limit, paginate_by_time,
+    paginate_by_key, split_page
+)
+from app.database.search_index import (
+    ensure_search_index, rebuild_search_index, build_match_query, track_search_statement, user_search_statement
+)
+from app.database.counters import ensure_counter_columns, reconcile_counters
+from app.database.migrations import run_migrations
+from app.database.user_stats import (
+    create_user_stats, recompute_user_stats, add_daily_plays, refresh_top_tracks, plays_per_day, top_tracks
+)
+from app.database.database import engine, async_engine, get_async_db
+from app.core.play_buffer import PlayEventBuffer
+from app.core.play_sessions import create_play_session_store
+from app.core.auth_cache import TokenUserCache
+from app.core.response_cache import ResponseCache, cached_json_response, etag_matches
+from app.core.password_hashing import password_pool
+from app.core.track_sampler import TrackSampler, RecentTracks
+from app.core.trending import (
+    TRENDING_WINDOWS, DEFAULT_TRENDING_WINDOW, PLAY_WEIGHT, LIKE_WEIGHT, TrendingEngine
+)
+from app.core.suggest import MAX_SUGGESTIONS, SuggestIndex, Suggestion, suggestion_keys
+from app.utils.uploads import MULTIPART_OVERHEAD_BYTES, RequestBodyLimitMiddleware, save_upload
+from app.utils.blob_store import BlobStore
+from app.utils.storage import (
+    guess_media_type, is_public_key, public_path, storage_from_settings, storage_key, storage_response
+)
+from app.core.config import settings
+from app.media.analysis import ensure_media_columns, analyze_in_pool, run_in_media_pool, shutdown_media_executor
+from app.media.waveform import (
+    WAVEFORM_RESOLUTIONS, DEFAULT_WAVEFORM_RESOLUTION, generate_waveform, read_waveform_level
+)
+from app.media.transcode import (
+    PLAYLIST_NAME, claim_transcode_job, complete_transcode_job, delete_orphaned_transcode_job, enqueue_transcode,
+    fail_transcode_job, hls_prefix, master_playlist, prune_transcode_jobs, transcode_hls, transcode_status
+)
+from app.utils.streaming import not_modified
 
 # Load environment variables
 load_dotenv()
 
-# Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./audiobridge.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Database setup: общий движок с настройками SQLite (WAL, pragmas, пул) из app/core/config.py
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -32,14 +76,25 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 app = FastAPI()
 
+# Upload size limits
+MAX_TRACK_UPLOAD_BYTES = settings.MAX_TRACK_UPLOAD_MB * 1024 * 1024
+MAX_IMAGE_UPLOAD_BYTES = settings.MAX_IMAGE_UPLOAD_MB * 1024 * 1024
+
+# Тело загрузки ограничивается еще при приеме (трек и обложка + служебные части
+# multipart). Добавляется до CORS, чтобы ответ 413 тоже получил CORS-заголовки
+app.add_middleware(
+    RequestBodyLimitMiddleware,
+    limits={
+        "/tracks/upload": MAX_TRACK_UPLOAD_BYTES + MAX_IMAGE_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/users/me/avatar": MAX_IMAGE_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    },
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -47,22 +102,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor", "Content-Range", "Accept-Ranges", "ETag",
+        "X-Waveform-Resolution", "X-Waveform-Duration-Ms",
+    ],
 )
 
-# Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# File storage setup: локальный каталог или S3-совместимый бакет, файлы
+# публикуются как /uploads/<ключ> (см. app/utils/storage.py)
+storage = storage_from_settings(settings)
+AVATAR_PREFIX = "avatars"
+COVER_PREFIX = "covers"
+WAVEFORM_PREFIX = "waveforms"
 
-# File storage setup
-UPLOAD_DIR = "uploads"
-AVATAR_DIR = os.path.join(UPLOAD_DIR, "avatars")
-MUSIC_DIR = os.path.join(UPLOAD_DIR, "music")
-COVER_DIR = os.path.join(UPLOAD_DIR, "covers")
+# Аудиофайлы треков хранятся по хешу содержимого под blobs/, см. app/utils/blob_store.py
+blob_store = BlobStore(storage, engine)
 
-# Create necessary directories
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(AVATAR_DIR, exist_ok=True)
-os.makedirs(MUSIC_DIR, exist_ok=True)
-os.makedirs(COVER_DIR, exist_ok=True)
+# Длительность считается в фоне после загрузки; до этого клиент получает заглушку
+PENDING_DURATION = "0:00"
 
 # Database models
 class User(Base):
@@ -76,6 +133,18 @@ class User(Base):
     avatar_path = Column(String, nullable=True)
     nickname = Column(String, nullable=True)
 
+class UserStats(Base):
+    # Материализованная статистика пользователя, см. app/database/user_stats.py
+    __tablename__ = "user_stats"
+
+    username = Column(String, ForeignKey("users.username"), primary_key=True)
+    total_tracks = Column(Integer, nullable=False, default=0, server_default="0")
+    total_plays = Column(Integer, nullable=False, default=0, server_default="0")
+    total_likes = Column(Integer, nullable=False, default=0, server_default="0")
+    plays_by_day = Column(String, nullable=False, default="{}", server_default="{}")  # JSON {"YYYY-MM-DD": plays}
+    top_tracks = Column(String, nullable=False, default="[]", server_default="[]")  # JSON [{"id", "name", "plays"}]
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class Track(Base):
     __tablename__ = "tracks"
     
@@ -87,6 +156,45 @@ class Track(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     plays = Column(Integer, default=0)
     duration = Column(String, nullable=True)
+    likes_count = Column(Integer, default=0)
+    comments_count = Column(Integer, default=0)
+    duration_seconds = Column(Float, nullable=True)
+    bitrate_kbps = Column(Integer, nullable=True)
+    sample_rate = Column(Integer, nullable=True)
+    channels = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_tracks_owner_created", "owner_username", "created_at", "id"),
+        Index("ix_tracks_created", "created_at", "id"),
+        Index("ix_tracks_owner_plays", "owner_username", "plays", "id"),
+        Index("ix_tracks_file_path", "file_path"),
+    )
+
+class Blob(Base):
+    # Аудиофайл в хранилище по содержимому; refcount — число треков с этим file_path
+    __tablename__ = "blobs"
+
+    sha256 = Column(String, primary_key=True)
+    path = Column(String, nullable=False, unique=True)
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TranscodeJob(Base):
+    # Задание на HLS-версии блоба, см. app/media/transcode.py
+    __tablename__ = "transcode_jobs"
+
+    blob_sha256 = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    renditions = Column(String, nullable=True)  # JSON ["low", "medium", ...]
+    last_error = Column(String, nullable=True)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_transcode_jobs_status_available", "status", "available_at"),
+    )
 
 class Like(Base):
     __tablename__ = "likes"
@@ -96,6 +204,12 @@ class Like(Base):
     username = Column(String, ForeignKey("users.username"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ux_likes_track_username", "track_id", "username", unique=True),
+        Index("ix_likes_username_created", "username", "created_at", "id"),
+        Index("ix_likes_created_track", "created_at", "track_id"),
+    )
+
 class Comment(Base):
     __tablename__ = "comments"
     
@@ -106,6 +220,12 @@ class Comment(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     parent_id = Column(String, ForeignKey("comments.id"), nullable=True)
 
+    __table_args__ = (
+        Index("ix_comments_track_created", "track_id", "created_at", "id"),
+        Index("ix_comments_track_parent_created", "track_id", "parent_id", "created_at", "id"),
+        Index("ix_comments_parent_created", "parent_id", "created_at", "id"),
+    )
+
 class TrackPlay(Base):
     __tablename__ = "track_plays"
     
@@ -116,10 +236,17 @@ class TrackPlay(Base):
     
     __table_args__ = (
         UniqueConstraint('track_id', 'username', name='unique_track_play'),
+        Index("ix_track_plays_played_track", "played_at", "track_id"),
     )
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+ensure_counter_columns(engine)
+ensure_media_columns(engine)
+run_migrations(engine)
+
+# Full-text search index (falls back to ilike when SQLite is built without FTS5)
+SEARCH_INDEX_ENABLED = ensure_search_index(engine)
 
 # Pydantic models
 class UserBase(BaseModel):
@@ -129,6 +256,13 @@ class UserBase(BaseModel):
     nickname: Optional[str] = None
     avatar_path: Optional[str] = None
 
+class UserSnapshot(UserBase):
+    # Неизменяемая копия пользователя для кэша авторизации (не привязана к сессии)
+    disabled: Optional[bool] = None
+    
+    class Config:
+        frozen = True
+
 class UserCreate(UserBase):
     password: str
 
@@ -145,9 +279,6 @@ class Token(BaseModel):
     refresh_token: str
     token_type: str
 
-class TokenData(BaseModel):
-    username: Optional[str] = None
-
 class TrackBase(BaseModel):
     name: str
 
@@ -169,6 +300,23 @@ class TrackResponse(TrackBase):
     class Config:
         from_attributes = True
 
+class UserProfileResponse(BaseModel):
+    # Отдаются только поля, запрошенные через ?fields=
+    user: Optional[UserBase] = None
+    tracks: Optional[List[TrackResponse]] = None
+    tracks_next_cursor: Optional[str] = None
+    liked: Optional[List[TrackResponse]] = None
+    liked_next_cursor: Optional[str] = None
+    stats: Optional[dict] = None
+
+PROFILE_FIELDS = ("user", "tracks", "liked", "stats")
+
+class SuggestionResponse(BaseModel):
+    type: str  # "track" или "user"
+    id: str
+    text: str
+    detail: Optional[str] = None
+
 class CommentBase(BaseModel):
     text: str
 
@@ -186,6 +334,23 @@ class CommentResponse(CommentBase):
     class Config:
         from_attributes = True
 
+class CommentThreadResponse(CommentResponse):
+    # replies — первые ответы (от старых к новым), остальные догружаются
+    # через /comments/{id}/replies начиная с replies_next_cursor; он не null,
+    # пока пришли не все replies_count ответов
+    replies_count: int = 0
+    replies: List["CommentThreadResponse"] = []
+    replies_next_cursor: Optional[str] = None
+
+# Атомарное изменение денормализованного счетчика: UPDATE ... SET x = x + amount
+def bump_counter(db: Session, column, condition, amount: int = 1):
+    db.query(column.class_).filter(condition).update(
+        {column: column + amount}, synchronize_session=False
+    )
+
+def owner_of_track(track_id: str):
+    return select(Track.owner_username).where(Track.id == track_id).scalar_subquery()
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -194,6 +359,323 @@ def get_db():
     finally:
         db.close()
 
+# Background jobs
+periodic_tasks: List[asyncio.Task] = []
+
+def run_counter_reconciliation():
+    # Вместе со счетчиками треков пересобирается и user_stats, а также
+    # полнотекстовый индекс (rowid, на которые он ссылается, меняет VACUUM)
+    with engine.begin() as connection:
+        if SEARCH_INDEX_ENABLED:
+            rebuild_search_index(connection)
+        repaired = reconcile_counters(connection)
+        recompute_user_stats(connection)
+        repaired["blobs.refcount"] = blob_store.reconcile(connection)
+        repaired["transcode_jobs"] = prune_transcode_jobs(connection)
+    response_cache.clear()
+    drift = {counter: rows for counter, rows in repaired.items() if rows}
+    if drift:
+        print(f"Counter drift repaired: {drift}")
+
+async def reconcile_counters_periodically():
+    while True:
+        try:
+            await run_in_threadpool(run_counter_reconciliation)
+        except Exception as e:
+            print(f"Error reconciling counters: {str(e)}")
+        await asyncio.sleep(settings.COUNTER_RECONCILE_INTERVAL_SECONDS)
+
+# Случайные треки выбираются из id в памяти; загрузка, добавления и удаления в этом
+# процессе применяются сразу, изменения из других воркеров — при периодической пересборке
+track_sampler = TrackSampler()
+recent_tracks = RecentTracks(size=settings.RANDOM_RECENT_HISTORY)
+
+def load_track_sampler():
+    with SessionLocal() as db:
+        track_sampler.load(db.query(Track.id, Track.plays, Track.likes_count).all())
+
+async def refresh_track_sampler_periodically():
+    while True:
+        await asyncio.sleep(settings.TRACK_SAMPLER_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(load_track_sampler)
+        except Exception as e:
+            print(f"Error refreshing track sampler: {str(e)}")
+
+# Тренды: счета с затуханием пересобираются из базы раз в settings.TRENDING_REFRESH_SECONDS,
+# а между пересборками прослушивания и лайки этого процесса учитываются сразу
+trending = TrendingEngine(rerank_seconds=settings.TRENDING_RERANK_SECONDS)
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+def trending_buckets(db: Session, column, weight: float, since: datetime):
+    # События окна читаются диапазоном по индексу (время, track_id) и собираются
+    # в часовые группы здесь: GROUP BY трека и часа в SQL этот индекс не
+    # использует и обходит всю таблицу с сортировкой во временном B-дереве.
+    # Временем группы считается среднее время ее событий (unix time)
+    buckets = {}
+    for track_id, happened_at in db.query(column.class_.track_id, column).filter(column >= since):
+        timestamp = (happened_at - UNIX_EPOCH).total_seconds()
+        key = (track_id, int(timestamp // 3600))
+        count, total = buckets.get(key, (0, 0.0))
+        buckets[key] = (count + 1, total + timestamp)
+    return [
+        (track_id, weight * count, total / count)
+        for (track_id, _), (count, total) in buckets.items()
+    ]
+
+def load_trending():
+    since = datetime.utcnow() - timedelta(seconds=max(horizon for _, horizon in TRENDING_WINDOWS.values()))
+    with SessionLocal() as db:
+        events = trending_buckets(db, TrackPlay.played_at, PLAY_WEIGHT, since)
+        events += trending_buckets(db, Like.created_at, LIKE_WEIGHT, since)
+    trending.load(events)
+
+async def refresh_trending_periodically():
+    while True:
+        await asyncio.sleep(settings.TRENDING_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(load_trending)
+        except Exception as e:
+            print(f"Error refreshing trending: {str(e)}")
+
+# Подсказки поиска: дерево в памяти пересобирается раз в settings.SUGGEST_REFRESH_SECONDS
+# (так обновляется популярность), загрузки, удаления и правки профиля применяются сразу
+suggest_index = SuggestIndex()
+
+def track_suggestion(track_id: str, name: str, owner_username: str, score: float = 0) -> Suggestion:
+    return Suggestion("track", track_id, name, owner_username, score, suggestion_keys(name))
+
+def user_suggestion(username: str, nickname: Optional[str], full_name: Optional[str], score: float = 0) -> Suggestion:
+    return Suggestion(
+        "user", username, nickname or username, username, score, suggestion_keys(username, nickname, full_name)
+    )
+
+def load_suggest_index():
+    with SessionLocal() as db:
+        tracks = db.query(Track.id, Track.name, Track.owner_username, Track.plays, Track.likes_count).all()
+        users = db.query(
+            User.username, User.nickname, User.full_name, UserStats.total_plays, UserStats.total_likes
+        ).outerjoin(UserStats, UserStats.username == User.username).all()
+    entries = [
+        track_suggestion(track_id, name, owner, PLAY_WEIGHT * (plays or 0) + LIKE_WEIGHT * (likes or 0))
+        for track_id, name, owner, plays, likes in tracks
+    ]
+    entries += [
+        user_suggestion(username, nickname, full_name, PLAY_WEIGHT * (plays or 0) + LIKE_WEIGHT * (likes or 0))
+        for username, nickname, full_name, plays, likes in users
+    ]
+    suggest_index.load(entries)
+
+async def refresh_suggest_index_periodically():
+    while True:
+        await asyncio.sleep(settings.SUGGEST_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(load_suggest_index)
+        except Exception as e:
+            print(f"Error refreshing search suggestions: {str(e)}")
+
+def flush_play_events(events) -> int:
+    # Вся пачка прослушиваний записывается одной транзакцией; уже существующие
+    # пары (track_id, username) пропускаются уникальным ограничением
+    db = SessionLocal()
+    try:
+        stored = Counter()
+        daily = Counter()
+        new_plays = []
+        for track_id, username, played_at in events:
+            result = db.execute(
+                sqlite_insert(TrackPlay)
+                .values(id=str(uuid.uuid4()), track_id=track_id, username=username, played_at=played_at)
+                .on_conflict_do_nothing(index_elements=["track_id", "username"])
+            )
+            if result.rowcount:
+                stored[track_id] += 1
+                daily[(track_id, played_at.date())] += 1
+                new_plays.append((track_id, played_at))
+        for track_id, plays in stored.items():
+            bump_counter(db, Track.plays, Track.id == track_id, plays)
+            bump_counter(db, UserStats.total_plays, UserStats.username == owner_of_track(track_id), plays)
+        for (track_id, day), plays in daily.items():
+            add_daily_plays(db, track_id, day, plays)
+        # Топ треков зависит от прослушиваний — обновляем его у затронутых авторов
+        if stored:
+            owners = db.query(Track.owner_username).filter(Track.id.in_(list(stored))).distinct()
+            owners = [owner for (owner,) in owners.all()]
+            for owner in owners:
+                refresh_top_tracks(db, owner)
+        db.commit()
+        for track_id, plays in stored.items():
+            track_sampler.bump(track_id, "plays", plays)
+        for track_id, played_at in new_plays:
+            trending.record(track_id, PLAY_WEIGHT, played_at)
+        if stored:
+            response_cache.bump(*(f"track:{track_id}" for track_id in stored), *(f"stats:{owner}" for owner in owners))
+        return sum(stored.values())
+    finally:
+        db.close()
+
+play_buffer = PlayEventBuffer(
+    flush_play_events,
+    max_events=settings.PLAY_BUFFER_MAX_EVENTS,
+    flush_interval_ms=settings.PLAY_BUFFER_FLUSH_INTERVAL_MS,
+)
+
+# Начала прослушиваний: /play записывает старт, /play-complete засчитывает
+# прослушивание, если прошло не меньше settings.PLAY_MIN_DURATION_SECONDS
+play_sessions = create_play_session_store(
+    settings.PLAY_SESSION_BACKEND,
+    ttl_seconds=settings.PLAY_SESSION_TTL_SECONDS,
+    max_entries=settings.PLAY_SESSION_MAX_ENTRIES,
+    engine=engine,
+)
+
+def store_track_media(track_id: str, fields: dict):
+    with SessionLocal() as db:
+        db.query(Track).filter(Track.id == track_id).update(fields, synchronize_session=False)
+        db.commit()
+    response_cache.bump(f"track:{track_id}")
+
+async def analyze_track_media(track_id: str, path: str):
+    # Длительность и параметры аудио считаются после ответа клиенту, в пуле процессов
+    try:
+        fields = await analyze_in_pool(path)
+    except Exception as e:
+        print(f"Error analyzing track {track_id}: {str(e)}")
+        return
+    await run_in_threadpool(store_track_media, track_id, fields)
+
+def waveform_key(track_id: str) -> str:
+    return f"{WAVEFORM_PREFIX}/{track_id}.peaks"
+
+async def generate_track_waveform(track_id: str, path: str):
+    output_path = storage.staging_path(".waveform-")
+    try:
+        await run_in_media_pool(generate_waveform, path, output_path)
+        await run_in_threadpool(storage.put, waveform_key(track_id), output_path)
+    except Exception as e:
+        print(f"Error generating waveform for track {track_id}: {str(e)}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+def read_stored_waveform(key: str, resolution: int):
+    local = storage.local_copy(key)
+    try:
+        return read_waveform_level(local.path, resolution)
+    finally:
+        local.release()
+
+async def process_uploaded_track(track_id: str, file_path: str):
+    # ffmpeg читает локальный файл: для S3 объект на время обработки скачивается
+    try:
+        local = await run_in_threadpool(storage.local_copy, storage_key(file_path))
+    except Exception as e:
+        print(f"Error fetching track {track_id}: {str(e)}")
+        return
+    try:
+        await analyze_track_media(track_id, local.path)
+        await generate_track_waveform(track_id, local.path)
+    finally:
+        local.release()
+
+# HLS-версии строятся фоновыми задачами этого процесса; задания берутся из общей
+# очереди transcode_jobs, поэтому при нескольких воркерах каждое выполняется один раз
+TRANSCODE_POLL_SECONDS = 10
+transcode_wakeup = asyncio.Event()
+
+def upload_renditions(sha256: str, output_dir: str) -> None:
+    # Сегменты раньше плейлистов: плейлист не должен ссылаться на еще не загруженные файлы
+    files = []
+    for directory, _, names in os.walk(output_dir):
+        files.extend(os.path.join(directory, name) for name in names)
+    files.sort(key=lambda path: os.path.basename(path) == PLAYLIST_NAME)
+    for path in files:
+        relative = os.path.relpath(path, output_dir).replace(os.sep, "/")
+        storage.put(hls_prefix(sha256) + relative, path)
+
+def delete_renditions(sha256: str) -> None:
+    for stored in list(storage.list(hls_prefix(sha256))):
+        storage.delete(stored.key)
+
+async def transcode_blob(sha256: str) -> None:
+    with SessionLocal() as db:
+        blob = db.query(Blob.path).filter(Blob.sha256 == sha256).first()
+    if blob is None:
+        with engine.begin() as connection:
+            delete_orphaned_transcode_job(connection, sha256)
+        return
+    local = await run_in_threadpool(storage.local_copy, blob.path)
+    output_dir = tempfile.mkdtemp(dir=storage.staging_dir, prefix=".hls-")
+    try:
+        renditions = await run_in_media_pool(transcode_hls, local.path, output_dir)
+        await run_in_threadpool(upload_renditions, sha256, output_dir)
+    finally:
+        local.release()
+        shutil.rmtree(output_dir, ignore_errors=True)
+    with engine.begin() as connection:
+        completed = complete_transcode_job(connection, sha256, renditions)
+    if not completed:
+        # Блоб удалили во время перекодирования
+        await run_in_threadpool(delete_renditions, sha256)
+
+def claim_next_transcode_job():
+    with engine.begin() as connection:
+        return claim_transcode_job(connection)
+
+async def process_transcode_queue():
+    while True:
+        transcode_wakeup.clear()
+        try:
+            job = await run_in_threadpool(claim_next_transcode_job)
+        except Exception as e:
+            print(f"Error claiming transcode job: {str(e)}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(transcode_wakeup.wait(), TRANSCODE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        sha256, attempt = job
+        try:
+            await transcode_blob(sha256)
+        except Exception as e:
+            with engine.begin() as connection:
+                status = fail_transcode_job(connection, sha256, attempt, str(e))
+            print(f"Error transcoding blob {sha256} (attempt {attempt}, now {status}): {str(e)}")
+
+async def put_upload(upload: UploadFile, key: str, max_bytes: int) -> str:
+    # Загрузка пишется в локальный staging и переносится в хранилище целиком
+    saved = await save_upload(upload, storage.staging_path(), max_bytes)
+    try:
+        await run_in_threadpool(storage.put, key, saved.path)
+    except BaseException:
+        if os.path.exists(saved.path):
+            os.remove(saved.path)
+        raise
+    return public_path(key)
+
+@app.on_event("startup")
+async def start_background_jobs():
+    await run_in_threadpool(load_track_sampler)
+    await run_in_threadpool(load_trending)
+    await run_in_threadpool(load_suggest_index)
+    periodic_tasks.append(asyncio.create_task(reconcile_counters_periodically()))
+    periodic_tasks.append(asyncio.create_task(refresh_track_sampler_periodically()))
+    periodic_tasks.append(asyncio.create_task(refresh_trending_periodically()))
+    periodic_tasks.append(asyncio.create_task(refresh_suggest_index_periodically()))
+    for _ in range(settings.TRANSCODE_WORKERS):
+        periodic_tasks.append(asyncio.create_task(process_transcode_queue()))
+    play_buffer.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    for task in periodic_tasks:
+        task.cancel()
+    await play_buffer.stop()
+    shutdown_media_executor()
+    password_pool.shutdown()
+    await async_engine.dispose()
+
 # File validation
 def validate_audio_file(file: UploadFile) -> bool:
     return file.filename.lower().endswith('.mp3')
@@ -201,20 +683,23 @@ def validate_audio_file(file: UploadFile) -> bool:
 def validate_image_file(file: UploadFile) -> bool:
     return file.filename.lower().endswith(('.jpg', '.jpeg', '.png'))
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_pool.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_pool.hash(password)
 
 def get_user(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
-def authenticate_user(db: Session, username: str, password: str):
+async def get_user_async(db: AsyncSession, username: str):
+    return await db.get(User, username)
+
+async def authenticate_user(db: Session, username: str, password: str):
     user = get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
@@ -235,24 +720,52 @@ def create_refresh_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+user_cache = TokenUserCache(max_entries=settings.AUTH_CACHE_MAX_ENTRIES, ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS)
+
+# Кэш ответов читающих эндпоинтов. Ключи версий: "track:<id>", "comments:<track_id>",
+# "user:<username>", "stats:<username>" и "users" — меняется при изменении любого
+# профиля (ник и аватар автора встроены в ответы трека и комментариев)
+response_cache = ResponseCache(max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
+        return payload
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
+
+def cache_current_user(token: str, payload: dict, user: Optional[User]) -> UserSnapshot:
     if user is None:
         raise credentials_exception
-    return user
+    snapshot = UserSnapshot.model_validate(user, from_attributes=True)
+    user_cache.put(token, snapshot.username, snapshot, payload.get("exp"))
+    return snapshot
+
+# На теплом пути токен уже проверен и пользователь берется из кэша без обращения к базе
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserSnapshot:
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = decode_token(token)
+    return cache_current_user(token, payload, get_user(db, username=payload["sub"]))
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> UserSnapshot:
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = decode_token(token)
+    return cache_current_user(token, payload, await get_user_async(db, username=payload["sub"]))
 
 # Auth endpoints
 @app.post("/register", response_model=UserBase)
@@ -264,7 +777,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
             detail="Username already registered"
         )
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -275,8 +788,11 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
+    db.flush()
+    create_user_stats(db, db_user.username)
     db.commit()
     db.refresh(db_user)
+    suggest_index.add(user_suggestion(db_user.username, db_user.nickname, db_user.full_name))
     return db_user
 
 @app.post("/login", response_model=Token)
@@ -284,7 +800,7 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -333,35 +849,52 @@ async def refresh_access_token(refresh_token: str, db: Session = Depends(get_db)
 
 # Profile endpoints
 @app.get("/users/me", response_model=UserBase)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: UserSnapshot = Depends(get_current_user)):
     return current_user
 
 @app.get("/users/{username}", response_model=UserBase)
-async def get_user_profile(username: str, db: Session = Depends(get_db)):
-    user = get_user(db, username=username)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    return user
+async def get_user_profile(
+    username: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    async def build():
+        user = await get_user_async(db, username=username)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        return UserBase.model_validate(user, from_attributes=True)
+
+    return await cached_json_response(
+        request, response_cache, ("user", username), [f"user:{username}"], build
+    )
 
 @app.put("/users/me", response_model=UserBase)
 async def update_user(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    user = get_user(db, username=current_user.username)
     for field, value in user_update.dict(exclude_unset=True).items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    user_cache.invalidate_user(user.username)
+    response_cache.bump(f"user:{user.username}", "users")
+    # Популярность остается прежней до следующей пересборки подсказок
+    previous = suggest_index.get("user", user.username)
+    suggest_index.add(user_suggestion(
+        user.username, user.nickname, user.full_name, previous.score if previous else 0
+    ))
+    return user
 
 @app.post("/users/me/avatar")
 async def upload_avatar(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if not validate_image_file(file):
@@ -370,73 +903,92 @@ async def upload_avatar(
     # Generate unique filename
     file_extension = os.path.splitext(file.filename)[1]
     filename = f"{current_user.username}_{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(AVATAR_DIR, filename)
     
     # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    avatar_path = await put_upload(file, f"{AVATAR_PREFIX}/{filename}", MAX_IMAGE_UPLOAD_BYTES)
     
     # Update user avatar path
-    current_user.avatar_path = f"/uploads/avatars/{filename}"
+    user = get_user(db, username=current_user.username)
+    user.avatar_path = avatar_path
     db.commit()
+    user_cache.invalidate_user(user.username)
+    response_cache.bump(f"user:{user.username}", "users")
     
-    return {"avatar_path": current_user.avatar_path}
+    return {"avatar_path": user.avatar_path}
 
 # Track endpoints
 @app.post("/tracks/upload", response_model=TrackResponse)
 async def upload_track(
     request: Request,
+    background: BackgroundTasks,
     file: UploadFile = File(...),
     cover: Optional[UploadFile] = File(None),
     name: str = Form(...),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if not validate_audio_file(file):
         raise HTTPException(status_code=400, detail="Invalid file type. Only MP3 files are allowed.")
+    if cover and not validate_image_file(cover):
+        raise HTTPException(status_code=400, detail="Invalid cover file type. Only images are allowed.")
     
     # Generate unique filenames
     track_id = str(uuid.uuid4())
     file_extension = os.path.splitext(file.filename)[1]
-    track_filename = f"{track_id}{file_extension}"
-    track_path = os.path.join(MUSIC_DIR, track_filename)
     
-    # Save track file
-    with open(track_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Save track file: содержимое хешируется при записи, место в хранилище
+    # блобов определяется после загрузки
+    saved = await save_upload(file, blob_store.incoming_path(), MAX_TRACK_UPLOAD_BYTES)
     
     # Handle cover if provided
     cover_path = None
-    if cover:
-        if not validate_image_file(cover):
-            raise HTTPException(status_code=400, detail="Invalid cover file type. Only images are allowed.")
-        cover_extension = os.path.splitext(cover.filename)[1]
-        cover_filename = f"{track_id}{cover_extension}"
-        cover_path = os.path.join(COVER_DIR, cover_filename)
-        with open(cover_path, "wb") as buffer:
-            shutil.copyfileobj(cover.file, buffer)
-        cover_path = f"/uploads/covers/{cover_filename}"
-    
-    # Create track record
-    track = Track(
-        id=track_id,
-        name=name,
-        owner_username=current_user.username,
-        file_path=f"/uploads/music/{track_filename}",
-        cover_path=cover_path,
-        duration="0:00"  # You might want to add actual duration calculation
-    )
-    
-    db.add(track)
-    db.commit()
+    try:
+        if cover:
+            cover_extension = os.path.splitext(cover.filename)[1]
+            cover_path = await put_upload(cover, f"{COVER_PREFIX}/{track_id}{cover_extension}", MAX_IMAGE_UPLOAD_BYTES)
+        await run_in_threadpool(blob_store.prepare, saved.path, saved.sha256, file_extension)
+    except BaseException:
+        if os.path.exists(saved.path):
+            os.remove(saved.path)
+        raise
+    
+    # Create track record; одинаковый файл другого трека переиспользуется.
+    # Временный файл удаляется только после commit (см. BlobStore.ensure)
+    try:
+        file_path = await run_in_threadpool(blob_store.acquire, db, saved.sha256, saved.size, file_extension)
+        enqueue_transcode(db, saved.sha256)
+        track = Track(
+            id=track_id,
+            name=name,
+            owner_username=current_user.username,
+            file_path=file_path,
+            cover_path=cover_path,
+            duration=PENDING_DURATION
+        )
+        
+        db.add(track)
+        bump_counter(db, UserStats.total_tracks, UserStats.username == current_user.username)
+        db.flush()
+        refresh_top_tracks(db, current_user.username)
+        db.commit()
+        await run_in_threadpool(blob_store.ensure, saved.path, file_path)
+    finally:
+        if os.path.exists(saved.path):
+            os.remove(saved.path)
     db.refresh(track)
+    track_sampler.add(track.id)
+    suggest_index.add(track_suggestion(track.id, track.name, track.owner_username))
+    response_cache.bump(f"stats:{current_user.username}")
+    
+    background.add_task(process_uploaded_track, track.id, track.file_path)
+    transcode_wakeup.set()
     
     return track
 
 @app.delete("/tracks/{track_id}")
 async def delete_track(
     track_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     track = db.query(Track).filter(Track.id == track_id).first()
@@ -445,101 +997,183 @@ async def delete_track(
     if track.owner_username != current_user.username:
         raise HTTPException(status_code=403, detail="Not authorized to delete this track")
     
-    # Delete files
-    if track.file_path:
-        try:
-            os.remove(os.path.join(UPLOAD_DIR, track.file_path.lstrip("/uploads/")))
-        except:
-            pass
+    # Delete files: блоб убирается, если удален последний ссылающийся на него трек;
+    # он и остальные файлы (обложка, волна, еще не перенесенный в блобы файл) — после commit
+    released = await run_in_threadpool(blob_store.release, db, track.file_path)
+    sha256 = blob_store.blob_sha256(track.file_path)
+    renditions_orphaned = bool(sha256) and delete_orphaned_transcode_job(db, sha256)
+    keys = [waveform_key(track.id)]
     if track.cover_path:
-        try:
-            os.remove(os.path.join(UPLOAD_DIR, track.cover_path.lstrip("/uploads/")))
-        except:
-            pass
+        keys.append(storage_key(track.cover_path))
+    if released is None and track.file_path:
+        keys.append(storage_key(track.file_path))
     
     # Delete track record
+    bump_counter(db, UserStats.total_tracks, UserStats.username == current_user.username, -1)
+    bump_counter(db, UserStats.total_plays, UserStats.username == current_user.username, -(track.plays or 0))
+    bump_counter(db, UserStats.total_likes, UserStats.username == current_user.username, -(track.likes_count or 0))
     db.delete(track)
+    db.flush()
+    refresh_top_tracks(db, current_user.username)
     db.commit()
+    if released:
+        await run_in_threadpool(released.finish)
+    if renditions_orphaned:
+        await run_in_threadpool(delete_renditions, sha256)
+    for key in keys:
+        try:
+            await run_in_threadpool(storage.delete, key)
+        except Exception as e:
+            print(f"Error deleting {key}: {str(e)}")
+    track_sampler.remove(track_id)
+    trending.remove(track_id)
+    suggest_index.remove("track", track_id)
+    response_cache.bump(f"track:{track_id}", f"comments:{track_id}", f"stats:{current_user.username}")
     
     return {"message": "Track deleted successfully"}
 
-async def enrich_track_response(track: Track, current_user: User, db: Session) -> TrackResponse:
-    # Получаем количество лайков
-    likes_count = db.query(Like).filter(Like.track_id == track.id).count()
+async def enrich_tracks_response(tracks: List[Track], current_user: UserSnapshot, db: AsyncSession) -> List[TrackResponse]:
+    if not tracks:
+        return []
+    track_ids = [track.id for track in tracks]
     
-    # Проверяем, лайкнул ли текущий пользователь трек
-    is_liked = db.query(Like).filter(
-        Like.track_id == track.id,
-        Like.username == current_user.username
-    ).first() is not None
-    
-    # Получаем информацию о владельце трека
-    owner = db.query(User).filter(User.username == track.owner_username).first()
-    
-    return TrackResponse(
-        id=track.id,
-        name=track.name,
-        owner_username=track.owner_username,
-        owner_avatar=owner.avatar_path if owner else None,
-        file_path=track.file_path,
-        cover_path=track.cover_path,
-        created_at=track.created_at,
-        plays=track.plays,
-        duration=track.duration,
-        likes_count=likes_count,
-        is_liked=is_liked
-    )
+    # Какие из треков лайкнул текущий пользователь
+    liked_track_ids = set((await db.execute(
+        select(Like.track_id).filter(
+            Like.track_id.in_(track_ids),
+            Like.username == current_user.username
+        )
+    )).scalars())
+    
+    # Аватары владельцев треков
+    owner_usernames = {track.owner_username for track in tracks}
+    owner_avatars = dict((await db.execute(
+        select(User.username, User.avatar_path)
+        .filter(User.username.in_(owner_usernames))
+    )).all())
+    
+    return [
+        TrackResponse(
+            id=track.id,
+            name=track.name,
+            owner_username=track.owner_username,
+            owner_avatar=owner_avatars.get(track.owner_username),
+            file_path=track.file_path,
+            cover_path=track.cover_path,
+            created_at=track.created_at,
+            plays=track.plays,
+            duration=track.duration or PENDING_DURATION,
+            likes_count=track.likes_count or 0,
+            is_liked=track.id in liked_track_ids
+        )
+        for track in tracks
+    ]
+
+async def enrich_track_response(track: Track, current_user: UserSnapshot, db: AsyncSession) -> TrackResponse:
+    enriched = await enrich_tracks_response([track], current_user, db)
+    return enriched[0]
 
 @app.get("/tracks", response_model=List[TrackResponse])
 async def list_tracks(
+    response: Response,
     owner_username: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    limit = page_limit(limit, cursor)
     print(f"Fetching tracks for owner_username: {owner_username}")
-    query = db.query(Track)
+    query = select(Track)
     if owner_username:
         query = query.filter(Track.owner_username == owner_username)
-    tracks = query.all()
+    tracks, has_more = split_page(
+        (await db.execute(paginate_by_time(query, Track.created_at, Track.id, cursor, limit))).scalars().all(), limit
+    )
+    if has_more:
+        response.headers["X-Next-Cursor"] = encode_cursor(tracks[-1].created_at, tracks[-1].id)
     print(f"Found {len(tracks)} tracks")
-    enriched_tracks = [await enrich_track_response(track, current_user, db) for track in tracks]
+    enriched_tracks = await enrich_tracks_response(tracks, current_user, db)
     print(f"Enriched tracks: {[track.name for track in enriched_tracks]}")
     return enriched_tracks
 
-@app.get("/tracks/{track_id}", response_model=TrackResponse)
-async def get_track(
+@app.get("/tracks/{track_id}/stream.m3u8")
+async def get_track_playlist(track_id: str, request: Request):
+    # Мастер-плейлист HLS: версии с разным битрейтом, плеер выбирает по скорости канала.
+    # Пока версии не готовы (или трек загружен до их появления) — 404, и клиент
+    # играет /tracks/{id}/stream
+    with SessionLocal() as db:
+        track = db.query(Track.file_path).filter(Track.id == track_id).first()
+        sha256 = blob_store.blob_sha256(track.file_path) if track else None
+        job = transcode_status(db, sha256) if sha256 else None
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    if not job or job["status"] != "done":
+        raise HTTPException(status_code=404, detail="Stream not ready")
+    body = master_playlist(public_path(hls_prefix(sha256)), job["renditions"])
+    etag = f'"{sha256[:16]}-{len(job["renditions"])}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/vnd.apple.mpegurl", headers=headers)
+
+@app.api_route("/tracks/{track_id}/stream", methods=["GET", "HEAD"])
+async def stream_track(
     track_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request
 ):
-    track = db.query(Track).filter(Track.id == track_id).first()
+    # Отдача аудио с поддержкой Range: плеер при перемотке запрашивает только нужные байты.
+    # Сессия из get_db жила бы до конца отдачи файла и держала соединение из пула,
+    # поэтому путь к файлу читаем в короткой сессии
+    with SessionLocal() as db:
+        track = db.query(Track.file_path).filter(Track.id == track_id).first()
     if not track:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Track not found"
-        )
-    return await enrich_track_response(track, current_user, db)
+        raise HTTPException(status_code=404, detail="Track not found")
+    stored = await run_in_threadpool(storage.stat, storage_key(track.file_path))
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Track file not found")
+    return await storage_response(request, storage, stored, "audio/mpeg")
+
+@app.api_route("/uploads/{key:path}", methods=["GET", "HEAD"])
+async def get_uploaded_file(key: str, request: Request):
+    # Аватары, обложки и файлы треков из хранилища (вместо StaticFiles на локальный каталог)
+    stored = await run_in_threadpool(storage.stat, key) if is_public_key(key) else None
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return await storage_response(request, storage, stored, guess_media_type(key))
+
+@app.get("/tracks/{track_id}/waveform")
+async def get_track_waveform(
+    track_id: str,
+    request: Request,
+    resolution: int = Query(DEFAULT_WAVEFORM_RESOLUTION, ge=1, le=max(WAVEFORM_RESOLUTIONS))
+):
+    # Пики волны строятся в фоне после загрузки; ответ — пары (min, max) в int8
+    stored = await run_in_threadpool(storage.stat, waveform_key(track_id))
+    if stored is None:
+        with SessionLocal() as db:
+            exists = db.query(Track.id).filter(Track.id == track_id).first()
+        raise HTTPException(status_code=404, detail="Waveform not ready" if exists else "Track not found")
+    etag = stored.etag[:-1] + f'-{resolution}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if not_modified(request, etag, stored.modified):
+        return Response(status_code=304, headers=headers)
+    level = await run_in_threadpool(read_stored_waveform, stored.key, resolution)
+    headers["X-Waveform-Resolution"] = str(level.resolution)
+    headers["X-Waveform-Duration-Ms"] = str(level.duration_ms)
+    return Response(content=level.peaks, media_type="application/octet-stream", headers=headers)
 
 @app.post("/tracks/{track_id}/like")
 async def like_track(
     track_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     track = db.query(Track).filter(Track.id == track_id).first()
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    # Check if already liked
-    existing_like = db.query(Like).filter(
-        Like.track_id == track_id,
-        Like.username == current_user.username
-    ).first()
-    
-    if existing_like:
-        raise HTTPException(status_code=400, detail="Track already liked")
-    
-    # Create new like
+    # Повторный лайк отсекает уникальный индекс (track_id, username)
     like = Like(
         id=str(uuid.uuid4()),
         track_id=track_id,
@@ -547,14 +1181,24 @@ async def like_track(
     )
     
     db.add(like)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Track already liked")
+    bump_counter(db, Track.likes_count, Track.id == track_id)
+    bump_counter(db, UserStats.total_likes, UserStats.username == track.owner_username)
     db.commit()
+    track_sampler.bump(track_id, "likes", 1)
+    trending.record(track_id, LIKE_WEIGHT, like.created_at)
+    response_cache.bump(f"track:{track_id}", f"stats:{track.owner_username}")
     
     return {"message": "Track liked successfully"}
 
 @app.delete("/tracks/{track_id}/like")
 async def unlike_track(
     track_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     like = db.query(Like).filter(
@@ -565,23 +1209,42 @@ async def unlike_track(
     if not like:
         raise HTTPException(status_code=404, detail="Like not found")
     
+    owner_username = db.query(Track.owner_username).filter(Track.id == track_id).scalar()
     db.delete(like)
+    bump_counter(db, Track.likes_count, Track.id == track_id, -1)
+    bump_counter(db, UserStats.total_likes, UserStats.username == owner_username, -1)
     db.commit()
+    track_sampler.bump(track_id, "likes", -1)
+    # Снятый лайк вычитается с тем же затуханием, с каким был добавлен
+    trending.record(track_id, -LIKE_WEIGHT, like.created_at)
+    response_cache.bump(f"track:{track_id}", f"stats:{owner_username}")
     
     return {"message": "Track unliked successfully"}
 
+async def get_liked_tracks_page(db: AsyncSession, username: str, cursor: Optional[str], limit: int):
+    # Лайкнутые треки идут от последнего лайка к первому, курсор строится по (Like.created_at, Like.id)
+    query = select(Track, Like.created_at, Like.id).join(Like).filter(Like.username == username)
+    rows, has_more = split_page(
+        (await db.execute(paginate_by_time(query, Like.created_at, Like.id, cursor, limit))).all(), limit
+    )
+    next_cursor = encode_cursor(rows[-1][1], rows[-1][2]) if has_more else None
+    return [track for track, _, _ in rows], next_cursor
+
 @app.get("/tracks/liked", response_model=List[TrackResponse])
 async def get_liked_tracks(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    limit = page_limit(limit, cursor)
     print(f"Fetching liked tracks for user: {current_user.username}")
     
     try:
-        # Get all tracks that the user has liked
-        liked_tracks = db.query(Track).join(Like).filter(
-            Like.username == current_user.username
-        ).all()
+        liked_tracks, next_cursor = await get_liked_tracks_page(db, current_user.username, cursor, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         
         print(f"Found {len(liked_tracks)} liked tracks")
         
@@ -590,10 +1253,12 @@ async def get_liked_tracks(
             return []
         
         # Enrich track responses with likes count and is_liked status
-        enriched_tracks = [await enrich_track_response(track, current_user, db) for track in liked_tracks]
+        enriched_tracks = await enrich_tracks_response(liked_tracks, current_user, db)
         print(f"Enriched tracks: {[track.name for track in enriched_tracks]}")
         
         return enriched_tracks
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching liked tracks: {str(e)}")
         return []
@@ -601,16 +1266,19 @@ async def get_liked_tracks(
 @app.get("/users/{username}/liked", response_model=List[TrackResponse])
 async def get_user_liked_tracks(
     username: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    limit = page_limit(limit, cursor)
     print(f"Fetching liked tracks for user: {username}")
     
     try:
-        # Get all tracks that the user has liked
-        liked_tracks = db.query(Track).join(Like).filter(
-            Like.username == username
-        ).all()
+        liked_tracks, next_cursor = await get_liked_tracks_page(db, username, cursor, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         
         print(f"Found {len(liked_tracks)} liked tracks")
         
@@ -619,98 +1287,162 @@ async def get_user_liked_tracks(
             return []
         
         # Enrich track responses with likes count and is_liked status
-        enriched_tracks = [await enrich_track_response(track, current_user, db) for track in liked_tracks]
+        enriched_tracks = await enrich_tracks_response(liked_tracks, current_user, db)
         print(f"Enriched tracks: {[track.name for track in enriched_tracks]}")
         
         return enriched_tracks
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching liked tracks: {str(e)}")
         return []
 
 # Statistics endpoints
+def user_stats_response(stats: Optional[UserStats]):
+    # Статистика поддерживается при записи, поэтому чтение — одна строка user_stats по ключу
+    return {
+        "total_tracks": stats.total_tracks if stats else 0,
+        "total_plays": stats.total_plays if stats else 0,
+        "total_likes": stats.total_likes if stats else 0,
+        "plays_per_day": plays_per_day(stats.plays_by_day if stats else None, datetime.utcnow().date()),
+        "top_tracks": top_tracks(stats.top_tracks if stats else None),
+    }
+
+async def cached_user_stats(request: Request, username: str, db: AsyncSession) -> Response:
+    # plays_per_day зависит от текущей даты, поэтому она входит в ключ
+    async def build():
+        return user_stats_response(await db.get(UserStats, username))
+
+    return await cached_json_response(
+        request, response_cache, ("stats", username, datetime.utcnow().date()), [f"stats:{username}"], build
+    )
+
 @app.get("/users/me/stats")
 async def get_user_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Get total tracks
-    total_tracks = db.query(Track).filter(Track.owner_username == current_user.username).count()
-    
-    # Get total plays
-    total_plays = db.query(Track).filter(
-        Track.owner_username == current_user.username
-    ).with_entities(func.sum(Track.plays)).scalar() or 0
-    
-    # Get total likes
-    total_likes = db.query(Like).join(Track).filter(
-        Track.owner_username == current_user.username
-    ).count()
-    
-    return {
-        "total_tracks": total_tracks,
-        "total_plays": total_plays,
-        "total_likes": total_likes
-    }
+    return await cached_user_stats(request, current_user.username, db)
 
 @app.get("/users/{username}/stats")
 async def get_user_stats_by_username(
     username: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await cached_user_stats(request, username, db)
+
+@app.get("/users/{username}/profile", response_model=UserProfileResponse, response_model_exclude_unset=True)
+async def get_user_profile_page(
+    username: str,
+    fields: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Все данные страницы профиля за один запрос: пользователь, первые страницы
+    # его треков и лайкнутых треков и статистика. Обе страницы треков обогащаются
+    # вместе, поэтому число запросов к базе не зависит от количества треков.
+    # Следующие страницы — через /tracks?owner_username= и /users/{username}/liked с курсором.
+    # Пробелы вокруг имен и пустые элементы ("user, stats,") не учитываются
+    selected = {field.strip() for field in (fields or "").split(",") if field.strip()} or set(PROFILE_FIELDS)
+    unknown = selected - set(PROFILE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown profile fields: {', '.join(sorted(unknown))}")
+
+    user = await get_user_async(db, username=username)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    profile = UserProfileResponse()
+    if "user" in selected:
+        profile.user = UserBase.model_validate(user, from_attributes=True)
+
+    tracks, liked = [], []
+    if "tracks" in selected:
+        tracks, has_more = split_page((await db.execute(paginate_by_time(
+            select(Track).filter(Track.owner_username == username), Track.created_at, Track.id, None, limit
+        ))).scalars().all(), limit)
+        profile.tracks_next_cursor = encode_cursor(tracks[-1].created_at, tracks[-1].id) if has_more else None
+    if "liked" in selected:
+        liked, profile.liked_next_cursor = await get_liked_tracks_page(db, username, None, limit)
+    if tracks or liked:
+        enriched = iter(await enrich_tracks_response(tracks + liked, current_user, db))
+        tracks = [next(enriched) for _ in tracks]
+        liked = list(enriched)
+    if "tracks" in selected:
+        profile.tracks = tracks
+    if "liked" in selected:
+        profile.liked = liked
+
+    if "stats" in selected:
+        profile.stats = user_stats_response(await db.get(UserStats, username))
+    return profile
+
+# Track playback endpoints
+@app.post("/tracks/{track_id}/play")
+async def start_track_play(
+    track_id: str,
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Get total tracks
-    total_tracks = db.query(func.count(Track.id)).filter(Track.owner_username == username).scalar()
-    
-    # Get total plays
-    total_plays = db.query(func.sum(Track.plays)).filter(Track.owner_username == username).scalar() or 0
-    
-    # Get total likes
-    total_likes = db.query(func.count(Like.id)).join(Track).filter(Track.owner_username == username).scalar()
+    track = db.query(Track.id).filter(Track.id == track_id).first()
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
     
-    return {
-        "total_tracks": total_tracks,
-        "total_plays": total_plays,
-        "total_likes": total_likes
-    }
+    # Счетчик не меняется: прослушивание засчитает /play-complete
+    await run_in_threadpool(play_sessions.start, track_id, current_user.username)
+    return {"message": "Play started"}
 
-# Track playback endpoint
-@app.post("/tracks/{track_id}/play")
-async def increment_play_count(
+@app.post("/tracks/{track_id}/play-complete")
+async def complete_track_play(
     track_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = db.query(Track.id, Track.plays).filter(Track.id == track_id).first()
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    # Check if user has already played this track
-    existing_play = db.query(TrackPlay).filter(
+    # Запись о старте забирается атомарно: из нескольких воркеров прослушивание
+    # засчитает только один. Слишком короткое прослушивание (пауза) возвращает
+    # старт на место, чтобы его можно было засчитать позже
+    started_at = await run_in_threadpool(play_sessions.pop, track_id, current_user.username)
+    if started_at is None:
+        return {"status": "no_session", "plays": track.plays}
+    if time.time() - started_at < settings.PLAY_MIN_DURATION_SECONDS:
+        await run_in_threadpool(play_sessions.start, track_id, current_user.username, started_at)
+        return {"status": "too_short", "plays": track.plays}
+    
+    # Прослушивание попадает в буфер и записывается в базу пачкой вместе с другими.
+    # Повторное прослушивание, уже записанное в базу, в буфер не попадает
+    already_played = db.query(TrackPlay.id).filter(
         TrackPlay.track_id == track_id,
         TrackPlay.username == current_user.username
     ).first()
+    if not already_played and play_buffer.add(track_id, current_user.username):
+        return {"status": "success", "message": "Play count incremented", "plays": (track.plays or 0) + 1}
     
-    if not existing_play:
-        # Create new play record
-        play = TrackPlay(
-            id=str(uuid.uuid4()),
-            track_id=track_id,
-            username=current_user.username
-        )
-        db.add(play)
-        
-        # Increment play count
-        track.plays += 1
-        db.commit()
-        return {"message": "Play count incremented"}
-    
-    return {"message": "Track already played by this user"}
+    return {"status": "success", "message": "Track already played by this user", "plays": track.plays}
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "play_buffer": play_buffer.metrics(),
+        "auth_cache": user_cache.metrics(),
+        "response_cache": response_cache.metrics(),
+        "password_pool": password_pool.metrics(),
+    }
 
 # Comment endpoints
 @app.post("/tracks/{track_id}/comments", response_model=CommentResponse)
 async def create_comment(
     track_id: str,
     comment: CommentCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Check if track exists
@@ -733,40 +1465,171 @@ async def create_comment(
     )
     
     db.add(new_comment)
+    bump_counter(db, Track.comments_count, Track.id == track_id)
     db.commit()
     db.refresh(new_comment)
     
-    # Get user info for response
-    user = db.query(User).filter(User.username == current_user.username).first()
-    new_comment.user = user
+    # Автор — текущий пользователь, отдельный запрос за ним не нужен
+    new_comment.user = current_user
+    response_cache.bump(f"comments:{track_id}")
     
     return new_comment
 
+def comment_with_author():
+    # Комментарий, его автор и число прямых ответов одной строкой результата
+    reply = aliased(Comment)
+    replies_count = (
+        select(func.count(reply.id))
+        .where(reply.parent_id == Comment.id)
+        .correlate(Comment)
+        .scalar_subquery()
+        .label("replies_count")
+    )
+    return select(Comment, User, replies_count).join(User, User.username == Comment.username)
+
+def comment_thread_response(row, replies: Optional[list] = None) -> CommentThreadResponse:
+    comment = row.Comment
+    return CommentThreadResponse(
+        id=comment.id,
+        track_id=comment.track_id,
+        username=comment.username,
+        text=comment.text,
+        created_at=comment.created_at,
+        parent_id=comment.parent_id,
+        user=UserBase.model_validate(row.User, from_attributes=True),
+        replies_count=row.replies_count,
+        replies=replies or [],
+    )
+
+async def ensure_track_exists(track_id: str, db: AsyncSession):
+    if await db.scalar(select(Track.id).filter(Track.id == track_id)) is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+
 @app.get("/tracks/{track_id}/comments", response_model=List[CommentResponse])
 async def get_comments(
     track_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Check if track exists
-    track = db.query(Track).filter(Track.id == track_id).first()
-    if not track:
-        raise HTTPException(status_code=404, detail="Track not found")
-    
-    # Get all comments for the track
-    comments = db.query(Comment).filter(Comment.track_id == track_id).all()
-    
-    # Get user info for each comment
-    for comment in comments:
-        user = db.query(User).filter(User.username == comment.username).first()
-        comment.user = user
-    
-    return comments
+    # Плоский список всех комментариев (дерево строит клиент); авторы приходят
+    # тем же запросом через JOIN, а не отдельным запросом на каждый комментарий
+    async def build():
+        await ensure_track_exists(track_id, db)
+        rows = (await db.execute(
+            select(Comment, User)
+            .join(User, User.username == Comment.username)
+            .filter(Comment.track_id == track_id)
+            .order_by(Comment.created_at, Comment.id)
+        )).all()
+        return [
+            CommentResponse(
+                id=comment.id,
+                track_id=comment.track_id,
+                username=comment.username,
+                text=comment.text,
+                created_at=comment.created_at,
+                parent_id=comment.parent_id,
+                user=UserBase.model_validate(user, from_attributes=True),
+            )
+            for comment, user in rows
+        ]
+
+    return await cached_json_response(
+        request, response_cache, ("comments", track_id), [f"comments:{track_id}", "users"], build
+    )
+
+@app.get("/tracks/{track_id}/comments/threads", response_model=List[CommentThreadResponse])
+async def get_comment_threads(
+    track_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    replies_limit: int = Query(settings.COMMENT_REPLIES_PREVIEW, ge=0, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Страница верхнеуровневых комментариев (от новых к старым) вместе с первыми
+    # replies_limit ответами на каждый — одним запросом: id страницы и id ответов
+    # (row_number по parent_id) объединяются и join-ятся с comments и users
+    await ensure_track_exists(track_id, db)
+    top = paginate_by_time(
+        select(Comment.id, Comment.created_at).filter(Comment.track_id == track_id, Comment.parent_id.is_(None)),
+        Comment.created_at, Comment.id, cursor, limit
+    ).subquery()
+    ranked = (
+        select(
+            Comment.id,
+            func.row_number().over(
+                partition_by=Comment.parent_id, order_by=(Comment.created_at, Comment.id)
+            ).label("position")
+        )
+        .filter(Comment.parent_id.in_(select(top.c.id)))
+        .subquery()
+    )
+    thread_ids = union_all(
+        select(top.c.id),
+        select(ranked.c.id).filter(ranked.c.position <= replies_limit)
+    ).subquery()
+    rows = (await db.execute(
+        comment_with_author().join(thread_ids, thread_ids.c.id == Comment.id)
+    )).all()
+
+    replies = defaultdict(list)
+    top_level = []
+    for row in rows:
+        if row.Comment.parent_id is None:
+            top_level.append(row)
+        else:
+            replies[row.Comment.parent_id].append(row)
+    top_level.sort(key=lambda row: (row.Comment.created_at, row.Comment.id), reverse=True)
+    top_level, has_more = split_page(top_level, limit)
+    if has_more:
+        last = top_level[-1].Comment
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
+    threads = []
+    for row in top_level:
+        children = sorted(replies[row.Comment.id], key=lambda child: (child.Comment.created_at, child.Comment.id))
+        thread = comment_thread_response(row, [comment_thread_response(child) for child in children])
+        if row.replies_count > len(children):
+            # Курсор есть всегда, когда пришли не все ответы; при replies_limit=0
+            # он указывает на начало списка ответов
+            last = children[-1].Comment if children else None
+            after = (last.created_at, last.id) if last else (datetime.min, "")
+            thread.replies_next_cursor = encode_cursor(*after)
+        threads.append(thread)
+    return threads
+
+@app.get("/tracks/{track_id}/comments/{comment_id}/replies", response_model=List[CommentThreadResponse])
+async def get_comment_replies(
+    track_id: str,
+    comment_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Ленивая догрузка ответов на комментарий, от старых к новым
+    query = comment_with_author().filter(Comment.track_id == track_id, Comment.parent_id == comment_id)
+    rows, has_more = split_page(
+        (await db.execute(paginate_by_time(query, Comment.created_at, Comment.id, cursor, limit, ascending=True))).all(),
+        limit
+    )
+    if not rows and not cursor:
+        parent = await db.scalar(
+            select(Comment.id).filter(Comment.id == comment_id, Comment.track_id == track_id)
+        )
+        if parent is None:
+            raise HTTPException(status_code=404, detail="Comment not found")
+    if has_more:
+        last = rows[-1].Comment
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+    return [comment_thread_response(row) for row in rows]
 
 @app.delete("/tracks/{track_id}/comments/{comment_id}")
 async def delete_comment(
     track_id: str,
     comment_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Check if track exists
@@ -789,88 +1652,203 @@ async def delete_comment(
     
     # Delete comment
     db.delete(comment)
+    bump_counter(db, Track.comments_count, Track.id == track_id, -1)
     db.commit()
+    response_cache.bump(f"comments:{track_id}")
     
     return {"message": "Comment deleted successfully"}
 
 # Search endpoints
+async def ranked_search_page(db: AsyncSession, model, key_column, statement_factory, query: str, cursor: Optional[str], limit: int):
+    # Поиск по FTS5-индексу: результаты упорядочены по релевантности (bm25), курсор — (score, key)
+    match = build_match_query(query)
+    if not match:
+        return [], None
+    after = decode_rank_cursor(cursor) if cursor else None
+    # LIMIT -1 в SQLite — без ограничения
+    statement, params = statement_factory(match, limit + 1 if limit is not None else -1, after)
+    rows, has_more = split_page((await db.execute(statement, params)).all(), limit)
+    if not rows:
+        return [], None
+    keys = [row.key for row in rows]
+    objects = {
+        getattr(obj, key_column.key): obj
+        for obj in (await db.execute(select(model).filter(key_column.in_(keys)))).scalars()
+    }
+    next_cursor = encode_cursor(rows[-1].score, rows[-1].key) if has_more else None
+    return [objects[key] for key in keys if key in objects], next_cursor
+
+async def search_users_page(db: AsyncSession, query: str, cursor: Optional[str], limit: int):
+    if SEARCH_INDEX_ENABLED:
+        return await ranked_search_page(db, User, User.username, user_search_statement, query, cursor, limit)
+    
+    # Search in username, nickname, and full_name
+    users_query = select(User).filter(
+        (User.username.ilike(f"%{query}%")) |
+        (User.nickname.ilike(f"%{query}%")) |
+        (User.full_name.ilike(f"%{query}%"))
+    )
+    users, has_more = split_page(
+        (await db.execute(paginate_by_key(users_query, User.username, cursor, limit))).scalars().all(), limit
+    )
+    return users, encode_cursor(users[-1].username) if has_more else None
+
+async def search_tracks_page(db: AsyncSession, query: str, cursor: Optional[str], limit: int):
+    if SEARCH_INDEX_ENABLED:
+        return await ranked_search_page(db, Track, Track.id, track_search_statement, query, cursor, limit)
+    
+    # Search in track name and owner username
+    tracks_query = select(Track).filter(
+        (Track.name.ilike(f"%{query}%")) |
+        (Track.owner_username.ilike(f"%{query}%"))
+    )
+    tracks, has_more = split_page(
+        (await db.execute(paginate_by_time(tracks_query, Track.created_at, Track.id, cursor, limit))).scalars().all(),
+        limit
+    )
+    return tracks, encode_cursor(tracks[-1].created_at, tracks[-1].id) if has_more else None
+
+@app.get("/search/suggest", response_model=List[SuggestionResponse])
+async def search_suggest(
+    query: str = "",
+    limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS)
+):
+    # Подсказки по префиксу из дерева в памяти, без обращения к базе
+    return [
+        SuggestionResponse(type=entry.kind, id=entry.id, text=entry.text, detail=entry.detail)
+        for entry in suggest_index.suggest(query, limit)
+    ]
+
 @app.get("/search/users", response_model=List[UserBase])
 async def search_users(
     query: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    limit = page_limit(limit, cursor)
     if not query:
         return []
     
-    # Search in username, nickname, and full_name
-    users = db.query(User).filter(
-        (User.username.ilike(f"%{query}%")) |
-        (User.nickname.ilike(f"%{query}%")) |
-        (User.full_name.ilike(f"%{query}%"))
-    ).all()
+    users, next_cursor = await search_users_page(db, query, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return users
 
 @app.get("/search/tracks", response_model=List[TrackResponse])
 async def search_tracks(
     query: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    limit = page_limit(limit, cursor)
     if not query:
         return []
     
-    # Search in track name and owner username
-    tracks = db.query(Track).filter(
-        (Track.name.ilike(f"%{query}%")) |
-        (Track.owner_username.ilike(f"%{query}%"))
-    ).all()
+    tracks, next_cursor = await search_tracks_page(db, query, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     # Enrich track responses with likes count and is_liked status
-    return [await enrich_track_response(track, current_user, db) for track in tracks]
+    return await enrich_tracks_response(tracks, current_user, db)
 
 @app.get("/search", response_model=dict)
 async def search_all(
     query: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    users_cursor: Optional[str] = None,
+    tracks_cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    limit = page_limit(limit, users_cursor or tracks_cursor)
     if not query:
-        return {"users": [], "tracks": []}
-    
-    # Search users
-    users = db.query(User).filter(
-        (User.username.ilike(f"%{query}%")) |
-        (User.nickname.ilike(f"%{query}%")) |
-        (User.full_name.ilike(f"%{query}%"))
-    ).all()
+        return {"users": [], "tracks": [], "users_next_cursor": None, "tracks_next_cursor": None}
     
-    # Search tracks
-    tracks = db.query(Track).filter(
-        (Track.name.ilike(f"%{query}%")) |
-        (Track.owner_username.ilike(f"%{query}%"))
-    ).all()
+    # Результаты пользователей и треков листаются независимо, у каждого списка свой курсор
+    users, users_next_cursor = await search_users_page(db, query, users_cursor, limit)
+    tracks, tracks_next_cursor = await search_tracks_page(db, query, tracks_cursor, limit)
     
     # Enrich track responses
-    enriched_tracks = [await enrich_track_response(track, current_user, db) for track in tracks]
+    enriched_tracks = await enrich_tracks_response(tracks, current_user, db)
     
     return {
-        "users": users,
-        "tracks": enriched_tracks
+        "users": [UserBase.model_validate(user, from_attributes=True) for user in users],
+        "tracks": enriched_tracks,
+        "users_next_cursor": users_next_cursor,
+        "tracks_next_cursor": tracks_next_cursor
     }
 
+@app.get("/tracks/trending", response_model=List[TrackResponse])
+async def get_trending_tracks(
+    response: Response,
+    window: str = Query(DEFAULT_TRENDING_WINDOW, pattern=f"^({'|'.join(TRENDING_WINDOWS)})$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Порядок берется из готового рейтинга в памяти, из базы читаются только треки страницы
+    after = decode_rank_cursor(cursor) if cursor else None
+    ranked, has_more = split_page(trending.page(window, after, limit + 1), limit)
+    track_ids = [track_id for _, track_id in ranked]
+    tracks = {
+        track.id: track
+        for track in (await db.execute(select(Track).filter(Track.id.in_(track_ids)))).scalars()
+    }
+    if has_more:
+        response.headers["X-Next-Cursor"] = encode_cursor(*ranked[-1])
+    return await enrich_tracks_response([tracks[track_id] for track_id in track_ids if track_id in tracks], current_user, db)
+
 @app.get("/tracks/random", response_model=TrackResponse)
 async def get_random_track(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    mode: str = Query("uniform", pattern="^(uniform|plays|likes)$"),
+    exclude_recent: bool = True,
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Получаем все треки
-    tracks = db.query(Track).all()
-    if not tracks:
+    # uniform — равновероятно, plays/likes — с весом по прослушиваниям или лайкам;
+    # exclude_recent отсеивает треки, недавно выданные этому пользователю
+    exclude = recent_tracks.get(current_user.username) if exclude_recent else set()
+    for _ in range(3):
+        track_id = track_sampler.sample(mode, exclude)
+        if track_id is None:
+            raise HTTPException(status_code=404, detail="No tracks found")
+        random_track = await db.get(Track, track_id)
+        if random_track:
+            break
+        # Трек удален в другом воркере и еще не исчез из выборки этого процесса
+        track_sampler.remove(track_id)
+    else:
         raise HTTPException(status_code=404, detail="No tracks found")
-    
-    # Выбираем случайный трек
-    random_track = random.choice(tracks)
+    recent_tracks.remember(current_user.username, random_track.id)
     
     # Обогащаем ответ информацией о лайках
-    return await enrich_track_response(random_track, current_user, db) 
\ No newline at end of file
+    return await enrich_track_response(random_track, current_user, db)
+
+# GET /tracks/{track_id} объявлен последним, иначе он перехватит /tracks/liked, /tracks/random и т.п.
+@app.get("/tracks/{track_id}", response_model=TrackResponse)
+async def get_track(
+    track_id: str,
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # is_liked зависит от смотрящего, поэтому ответ кэшируется для каждого пользователя
+    async def build():
+        track = await db.get(Track, track_id)
+        if not track:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Track not found"
+            )
+        return await enrich_track_response(track, current_user, db)
+
+    return await cached_json_response(
+        request, response_cache, ("track", track_id, current_user.username), [f"track:{track_id}", "users"], build
+    )
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+# Настройки читаются из окружения при импорте main, поэтому отдельная база и
+# каталог загрузок для тестов задаются до импорта
+TEST_DIR = tempfile.mkdtemp(prefix="audiobridge-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'audiobridge.db')}"
+os.environ["STORAGE_LOCAL_ROOT"] = os.path.join(TEST_DIR, "uploads")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+@pytest.fixture(scope="session")
+def client():
+    # Без контекстного менеджера: фоновые задачи startup тестам не нужны
+    return TestClient(main.app)
+
+@pytest.fixture
+def register(client):
+    def register_user(prefix: str = "user"):
+        username = f"{prefix}-{uuid.uuid4().hex[:8]}"
+        client.post("/register", json={"username": username, "password": "password"})
+        token = client.post("/login", data={"username": username, "password": "password"}).json()["access_token"]
+        return username, {"Authorization": f"Bearer {token}"}
+    return register_user
+
+@pytest.fixture
+def add_tracks():
+    def add(owner: str, count: int, name: str = "Track"):
+        with main.SessionLocal() as db:
+            tracks = [
+                main.Track(id=str(uuid.uuid4()), name=f"{name} {i}", owner_username=owner,
+                           file_path=f"/uploads/music/{uuid.uuid4()}.mp3", plays=0)
+                for i in range(count)
+            ]
+            db.add_all(tracks)
+            db.commit()
+            return [track.id for track in tracks]
+    return add
+
+@pytest.fixture
+def count_queries():
+    # Число SQL-запросов к базе (синхронный и асинхронный движки) за время блока
+    class QueryCounter:
+        count = 0
+
+        def __enter__(self):
+            self.count = 0
+            for engine in self.engines:
+                event.listen(engine, "before_cursor_execute", self.on_execute)
+            return self
+
+        def __exit__(self, *exc_info):
+            for engine in self.engines:
+                event.remove(engine, "before_cursor_execute", self.on_execute)
+
+        def on_execute(self, *args):
+            self.count += 1
+
+    counter = QueryCounter()
+    counter.engines = (main.engine, main.async_engine.sync_engine)
+    return counter
@@ -0,0 +1,49 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+
+from app.media import backfill
+from app.utils.storage import LocalStorage
+
+TRACKS = 20
+
+class RemoteStorage(LocalStorage):
+    # Как S3: локального пути нет, local_copy() скачивает файл во временный
+    def local_path(self, key):
+        return None
+
+def test_backfill_downloads_in_bounded_window(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    storage = RemoteStorage(str(tmp_path / "uploads"))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE tracks (id VARCHAR PRIMARY KEY, file_path VARCHAR, duration VARCHAR)"))
+        for i in range(TRACKS):
+            source = storage.staging_path()
+            with open(source, "wb") as file:
+                file.write(b"mp3")
+            storage.put(f"blobs/{i}.mp3", source)
+            connection.execute(
+                text("INSERT INTO tracks (id, file_path) VALUES (:id, :path)"),
+                {"id": str(i), "path": f"/uploads/blobs/{i}.mp3"},
+            )
+
+    copies_seen = []
+    lock = threading.Lock()
+
+    def analyze(path):
+        with lock:
+            copies_seen.append(sum(name.startswith(".copy-") for name in os.listdir(storage.staging_dir)))
+        return {"duration": "0:01", "duration_seconds": 1.0, "bitrate_kbps": 128, "sample_rate": 44100, "channels": 2}
+
+    monkeypatch.setattr(backfill, "analyze_track_file", analyze)
+    monkeypatch.setattr(backfill, "create_media_executor", lambda workers: ThreadPoolExecutor(workers))
+    summary = backfill.backfill(engine, storage, workers=1, batch_size=7)
+
+    assert summary == {"tracks": TRACKS, "updated": TRACKS, "failed": 0}
+    # Окно — 2 файла на воркер (плюс копия, еще не удаленная callback-ом)
+    assert max(copies_seen) <= 3
+    assert not [name for name in os.listdir(storage.staging_dir) if name.startswith(".copy-")]
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM tracks WHERE duration_seconds = 1.0")).scalar() == TRACKS
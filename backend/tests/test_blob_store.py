@@ -0,0 +1,103 @@
+import os
+import uuid
+
+import pytest
+
+import main
+from app.utils import blob_store
+from app.utils.uploads import resolve_upload_path
+
+def legacy_track(add_tracks, register, upload_dir, content: bytes):
+    owner, _ = register("owner")
+    (track_id,) = add_tracks(owner, 1)
+    with main.SessionLocal() as db:
+        file_path = db.get(main.Track, track_id).file_path
+    source = resolve_upload_path(file_path, str(upload_dir))
+    os.makedirs(os.path.dirname(source), exist_ok=True)
+    with open(source, "wb") as file:
+        file.write(content)
+    return track_id, source
+
+class RecordingStorage:
+    # Обертка над хранилищем, записывающая вызовы его методов
+    def __init__(self, storage):
+        self.storage = storage
+        self.calls = []
+
+    def __getattr__(self, name):
+        attribute = getattr(self.storage, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return attribute(*args, **kwargs)
+        return call
+
+def stored_blob(store, content: bytes) -> str:
+    source = store.incoming_path()
+    with open(source, "wb") as file:
+        file.write(content)
+    sha256 = blob_store.file_sha256(source)
+    store.prepare(source, sha256, ".mp3")
+    with main.engine.begin() as connection:
+        file_path = store.acquire(connection, sha256, len(content), ".mp3")
+    store.ensure(source, file_path)
+    return file_path
+
+def test_acquire_does_not_touch_storage():
+    # Внутри транзакции меняется только счетчик; хранилище — в prepare()/ensure()
+    store = blob_store.BlobStore(object(), main.engine)
+    with main.engine.begin() as connection:
+        path = store.acquire(connection, uuid.uuid4().hex * 2, 3, ".mp3")
+        connection.rollback()
+    assert path.startswith("/uploads/blobs/")
+
+def test_migrate_removes_source_only_after_commit(monkeypatch, tmp_path, register, add_tracks):
+    track_id, source = legacy_track(add_tracks, register, tmp_path, uuid.uuid4().bytes * 64)
+
+    def fail(*args):
+        raise RuntimeError("transaction failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(blob_store, "enqueue_transcode", fail)
+        with pytest.raises(RuntimeError):
+            blob_store.migrate_uploads(main.engine, main.blob_store, str(tmp_path))
+    assert os.path.exists(source)
+
+    blob_store.migrate_uploads(main.engine, main.blob_store, str(tmp_path))
+    assert not os.path.exists(source)
+    with main.SessionLocal() as db:
+        file_path = db.get(main.Track, track_id).file_path
+    assert main.storage.stat(blob_store.storage_key(file_path)) is not None
+
+def test_release_touches_storage_only_after_commit():
+    storage = RecordingStorage(main.storage)
+    store = blob_store.BlobStore(storage, main.engine)
+    file_path = stored_blob(store, uuid.uuid4().bytes * 64)
+    key = blob_store.storage_key(file_path)
+
+    storage.calls.clear()
+    with main.engine.begin() as connection:
+        released = store.release(connection, file_path)
+        assert storage.calls == []
+    assert released.orphaned
+    assert main.storage.stat(key) is not None
+
+    released.finish()
+    assert main.storage.stat(key) is None
+    assert not [
+        item for item in main.storage.list(key.rpartition("/")[0] + "/") if item.key.endswith(blob_store.TOMBSTONE_SUFFIX)
+    ]
+
+def test_finish_keeps_blob_referenced_again_after_commit():
+    store = blob_store.BlobStore(main.storage, main.engine)
+    content = uuid.uuid4().bytes * 64
+    file_path = stored_blob(store, content)
+    with main.engine.begin() as connection:
+        released = store.release(connection, file_path)
+
+    # Та же загрузка успела снова сослаться на блоб до finish()
+    assert stored_blob(store, content) == file_path
+    released.finish()
+    assert main.storage.stat(blob_store.storage_key(file_path)) is not None
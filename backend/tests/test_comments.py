@@ -0,0 +1,31 @@
+import pytest
+
+@pytest.mark.parametrize("replies_limit", [0, 2])
+def test_reply_cursor_loads_the_remaining_replies(client, register, add_tracks, replies_limit):
+    owner, headers = register("owner")
+    (track_id,) = add_tracks(owner, 1)
+    comments = f"/tracks/{track_id}/comments"
+    parent_id = client.post(comments, headers=headers, json={"text": "parent"}).json()["id"]
+    reply_ids = [
+        client.post(comments, headers=headers, json={"text": f"reply {i}", "parent_id": parent_id}).json()["id"]
+        for i in range(5)
+    ]
+
+    (thread,) = client.get(f"{comments}/threads", params={"replies_limit": replies_limit}).json()
+    assert thread["replies_count"] == 5
+    assert len(thread["replies"]) == replies_limit
+    assert thread["replies_next_cursor"] is not None
+
+    rest = client.get(f"{comments}/{parent_id}/replies", params={"cursor": thread["replies_next_cursor"]}).json()
+    assert [reply["id"] for reply in thread["replies"] + rest] == reply_ids
+
+def test_reply_cursor_is_null_when_all_replies_are_shown(client, register, add_tracks):
+    owner, headers = register("owner")
+    (track_id,) = add_tracks(owner, 1)
+    comments = f"/tracks/{track_id}/comments"
+    parent_id = client.post(comments, headers=headers, json={"text": "parent"}).json()["id"]
+    client.post(comments, headers=headers, json={"text": "reply", "parent_id": parent_id})
+
+    (thread,) = client.get(f"{comments}/threads", params={"replies_limit": 3}).json()
+    assert len(thread["replies"]) == 1
+    assert thread["replies_next_cursor"] is None
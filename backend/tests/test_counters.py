@@ -0,0 +1,17 @@
+import main
+
+def test_reconciliation_repairs_play_counts(register, add_tracks):
+    owner, _ = register("owner")
+    (track_id,) = add_tracks(owner, 1)
+    now = main.datetime.utcnow()
+    main.flush_play_events([(track_id, "listener-a", now), (track_id, "listener-b", now)])
+
+    # Сбой между записью track_plays и счетчика: plays разошелся с событиями
+    with main.SessionLocal() as db:
+        db.query(main.Track).filter(main.Track.id == track_id).update({"plays": 10})
+        db.commit()
+
+    main.run_counter_reconciliation()
+    with main.SessionLocal() as db:
+        assert db.get(main.Track, track_id).plays == 2
+        assert db.get(main.UserStats, owner).total_plays == 2
@@ -0,0 +1,38 @@
+import uuid
+
+import pytest
+
+import main
+
+# Обогащение списков треков — постоянное число запросов на страницу,
+# а не несколько запросов на каждый трек
+
+def like_tracks(username: str, track_ids):
+    with main.SessionLocal() as db:
+        db.add_all(main.Like(id=str(uuid.uuid4()), track_id=track_id, username=username) for track_id in track_ids)
+        db.commit()
+
+def queries_for(client, count_queries, url, headers, expected):
+    client.get(url, headers=headers)  # прогрев кэша авторизации
+    with count_queries:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == expected
+    return count_queries.count
+
+@pytest.mark.parametrize("path", ["/tracks?owner_username={owner}", "/search/tracks?query={name}", "/tracks/liked"])
+def test_list_query_count_is_flat(client, register, add_tracks, count_queries, path):
+    owner, _ = register("owner")
+    viewer, headers = register("viewer")
+    name = f"n{uuid.uuid4().hex[:8]}"
+    url = path.format(owner=owner, name=name)
+
+    track_ids = add_tracks(owner, 10, name)
+    like_tracks(viewer, track_ids)
+    small = queries_for(client, count_queries, url, headers, 10)
+
+    track_ids = add_tracks(owner, 10, name)
+    like_tracks(viewer, track_ids)
+    large = queries_for(client, count_queries, url, headers, 20)
+
+    assert 0 < large == small
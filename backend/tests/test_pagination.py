@@ -0,0 +1,27 @@
+from app.utils.pagination import DEFAULT_PAGE_SIZE
+
+def test_list_without_limit_returns_everything(client, register, add_tracks):
+    owner, headers = register("owner")
+    add_tracks(owner, DEFAULT_PAGE_SIZE + 5)
+
+    response = client.get("/tracks", params={"owner_username": owner}, headers=headers)
+    assert len(response.json()) == DEFAULT_PAGE_SIZE + 5
+    assert "X-Next-Cursor" not in response.headers
+
+def test_cursor_pages_cover_the_list(client, register, add_tracks):
+    owner, headers = register("owner")
+    track_ids = add_tracks(owner, 12)
+
+    seen, cursor = [], None
+    while True:
+        params = {"owner_username": owner, "limit": 5}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/tracks", params=params, headers=headers)
+        assert len(response.json()) <= 5
+        seen += [track["id"] for track in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(track_ids)
+    assert len(seen) == len(set(seen))
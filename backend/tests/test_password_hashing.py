@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.password_hashing import PasswordHashPool
+
+class BlockingContext:
+    # Вместо bcrypt: hash ждет, пока тест его не отпустит
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.release.wait(5)
+        if password == "bad":
+            raise ValueError("bad password")
+        return f"hashed:{password}"
+
+def test_cancelled_request_keeps_its_slot_until_the_hash_finishes():
+    context = BlockingContext()
+    pool = PasswordHashPool(context, max_workers=1, max_pending=0)
+
+    async def scenario():
+        request = asyncio.create_task(pool.hash("secret"))
+        await asyncio.sleep(0.05)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        # bcrypt все еще занимает поток — новый запрос получает 429
+        with pytest.raises(HTTPException) as rejected:
+            await pool.hash("other")
+        assert rejected.value.status_code == 429
+        context.release.set()
+        await asyncio.sleep(0.05)
+        assert await pool.hash("other") == "hashed:other"
+
+    asyncio.run(scenario())
+    assert pool.metrics()["in_flight"] == 0
+    pool.shutdown()
+
+def test_failed_hashes_are_counted_separately():
+    context = BlockingContext()
+    context.release.set()
+    pool = PasswordHashPool(context, max_workers=1, max_pending=1)
+
+    async def scenario():
+        assert await pool.hash("good") == "hashed:good"
+        with pytest.raises(ValueError):
+            await pool.hash("bad")
+
+    asyncio.run(scenario())
+    metrics = pool.metrics()
+    assert (metrics["completed"], metrics["failed"], metrics["in_flight"]) == (1, 1, 0)
+    pool.shutdown()
+
+def test_main_and_security_share_one_pool():
+    import main
+    from app.utils import security
+
+    assert main.password_pool is security.password_pool
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+import main
+from app.core.play_sessions import MemoryPlaySessionStore, SQLitePlaySessionStore
+
+TTL = 60
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request):
+    if request.param == "memory":
+        return MemoryPlaySessionStore(TTL, max_entries=3)
+    store = SQLitePlaySessionStore(main.engine, TTL)
+    store.purge_expired(now=time.time() + 10 * TTL)
+    return store
+
+def test_pop_returns_start_once(store):
+    now = time.time()
+    store.start("track", "user", now - 5)
+    assert store.pop("track", "user") == pytest.approx(now - 5)
+    assert store.pop("track", "user") is None
+
+def test_expired_sessions_are_ignored_and_purged(store):
+    now = time.time()
+    store.start("old", "user", now - TTL - 1)
+    store.start("new", "user", now)
+    assert store.pop("old", "user") is None
+
+    store.start("old", "user", now - TTL - 1)
+    store.purge_expired(now)
+    assert store.pop("old", "user") is None
+    assert store.pop("new", "user") == pytest.approx(now)
+
+def test_restarting_with_older_time_is_purged_in_order():
+    # Старт, возвращенный с более ранним временем, истекает вовремя, хотя записан последним
+    store = MemoryPlaySessionStore(TTL)
+    now = time.time()
+    store.start("a", "user", now)
+    store.start("b", "user", now - TTL + 1)
+    assert store.purge_expired(now + 2) == 1
+    assert store.pop("b", "user") is None
+    assert store.pop("a", "user") == pytest.approx(now)
+
+def test_memory_store_evicts_earliest_start_when_full():
+    store = MemoryPlaySessionStore(TTL, max_entries=2)
+    now = time.time()
+    store.start("a", "user", now - 1)
+    store.start("b", "user", now - 3)
+    store.start("a", "user", now - 2)  # перезапись: старая запись кучи пропускается
+    store.start("c", "user", now)
+    assert len(store) == 2
+    assert store.pop("b", "user") is None
+    assert store.pop("a", "user") == pytest.approx(now - 2)
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+import main
+
+def test_play_counts_only_after_min_duration(client, register, add_tracks):
+    owner, _ = register("owner")
+    listener, headers = register("listener")
+    (track_id,) = add_tracks(owner, 1)
+
+    complete = f"/tracks/{track_id}/play-complete"
+    assert client.post(complete, headers=headers).json()["status"] == "no_session"
+    assert client.post(f"/tracks/{track_id}/play", headers=headers).json() == {"message": "Play started"}
+    # Пауза раньше времени не засчитывается и не теряет старт
+    assert client.post(complete, headers=headers).json()["status"] == "too_short"
+
+    started_at = main.play_sessions.pop(track_id, listener)
+    main.play_sessions.start(track_id, listener, started_at - settings_min_duration())
+    response = client.post(complete, headers=headers).json()
+    assert response == {"status": "success", "message": "Play count incremented", "plays": 1}
+    assert client.post(complete, headers=headers).json()["status"] == "no_session"
+
+def test_repeat_play_is_reported_after_flush(client, register, add_tracks):
+    owner, _ = register("owner")
+    listener, headers = register("listener")
+    (track_id,) = add_tracks(owner, 1)
+
+    def listen():
+        main.play_sessions.start(track_id, listener, time.time() - settings_min_duration())
+        return client.post(f"/tracks/{track_id}/play-complete", headers=headers).json()["message"]
+
+    assert listen() == "Play count incremented"
+    assert listen() == "Track already played by this user"
+
+    asyncio.run(main.play_buffer.flush())
+    assert listen() == "Track already played by this user"
+    assert client.get(f"/tracks/{track_id}", headers=headers).json()["plays"] == 1
+
+def settings_min_duration() -> int:
+    return main.settings.PLAY_MIN_DURATION_SECONDS + 1
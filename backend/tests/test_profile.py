@@ -0,0 +1,10 @@
+def test_profile_fields_ignore_whitespace_and_empty_items(client, register, add_tracks):
+    owner, headers = register("owner")
+    add_tracks(owner, 2)
+
+    response = client.get(f"/users/{owner}/profile", params={"fields": " user , stats,"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert set(response.json()) == {"user", "stats"}
+
+    response = client.get(f"/users/{owner}/profile", params={"fields": "user, bogus"}, headers=headers)
+    assert response.status_code == 400
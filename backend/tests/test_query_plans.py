@@ -0,0 +1,155 @@
+import re
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+import main
+
+# Планы запросов горячих путей: каждый SQL, который выполняют эндпоинты и
+# фоновые задачи, проверяется через EXPLAIN QUERY PLAN с теми же параметрами.
+# Запрещены полное сканирование таблицы и временное B-дерево для сортировки или
+# группировки. Сканирование по индексу допустимо только в запросе с LIMIT —
+# такой обход останавливается на размере страницы. Обход уже посчитанного
+# подзапроса (MATERIALIZE / CO-ROUTINE) сканированием таблицы не считается.
+# Полнотекстовый поиск (MATCH по FTS5) ищет по своему индексу, но ранжирование
+# по bm25 сортирует найденные строки — для него разрешено B-дерево ORDER BY.
+
+TEMP_B_TREE = "USE TEMP B-TREE"
+LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+FTS_MATCH = re.compile(r"_fts MATCH\b", re.IGNORECASE)
+RANKING_SORT = "USE TEMP B-TREE FOR ORDER BY"
+SUBQUERY = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (\S+)")
+
+def plan_problems(connection: sqlite3.Connection, statement: str, parameters) -> list:
+    plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    subqueries = {match.group(1) for match in map(SUBQUERY.match, plan) if match}
+    problems = []
+    for step in plan:
+        if TEMP_B_TREE in step:
+            if not (step == RANKING_SORT and FTS_MATCH.search(statement)):
+                problems.append(step)
+        elif step.startswith("SCAN "):
+            name = step.split()[1]
+            if name in subqueries or name.startswith("(subquery"):
+                continue
+            if not ("INDEX" in step and LIMIT.search(statement)):
+                problems.append(step)
+    return problems
+
+@pytest.fixture
+def captured_statements():
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    engines = (main.engine, main.async_engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", capture)
+
+@pytest.fixture
+def catalogue(client, register, add_tracks):
+    owner, owner_headers = register("owner")
+    listener, headers = register("listener")
+    track_ids = add_tracks(owner, 30)
+    track_id = track_ids[0]
+    for liked in track_ids[:10]:
+        client.post(f"/tracks/{liked}/like", headers=headers)
+    comment_id = client.post(f"/tracks/{track_id}/comments", headers=headers, json={"text": "first"}).json()["id"]
+    for i in range(5):
+        client.post(
+            f"/tracks/{track_id}/comments", headers=owner_headers, json={"text": f"reply {i}", "parent_id": comment_id}
+        )
+    # Выборка случайного трека и тренды строятся в памяти при старте приложения
+    main.load_track_sampler()
+    main.load_trending()
+    return {
+        "owner": owner, "listener": listener, "headers": headers, "owner_headers": owner_headers,
+        "track_id": track_id, "unliked_track_id": track_ids[-1], "deleted_track_id": track_ids[-2],
+        "comment_id": comment_id,
+    }
+
+UPLOAD = {"files": {"file": ("song.mp3", b"\xff\xfb\x90\x00" * 100, "audio/mpeg")}, "data": {"name": "Song"}}
+
+# (метод, путь[, параметры запроса]); as_owner — запрос от владельца треков
+REQUESTS = [
+    ("GET", "/tracks?limit=10"),
+    ("GET", "/tracks?limit=10&cursor={tracks_cursor}"),
+    ("GET", "/tracks?owner_username={owner}"),
+    ("GET", "/tracks?owner_username={owner}&limit=10&cursor={owner_cursor}"),
+    ("GET", "/tracks/{track_id}"),
+    ("GET", "/tracks/liked"),
+    ("GET", "/tracks/liked?limit=5&cursor={liked_cursor}"),
+    ("GET", "/tracks/trending"),
+    ("GET", "/tracks/random"),
+    ("GET", "/users/{listener}/liked"),
+    ("GET", "/users/{listener}/liked?limit=5&cursor={liked_cursor}"),
+    ("GET", "/users/{owner}/profile"),
+    ("GET", "/users/{owner}/stats"),
+    ("GET", "/search/users?query={owner}"),
+    ("GET", "/search/tracks?query=Track"),
+    ("GET", "/search/tracks?query=Track&limit=10&cursor={search_cursor}"),
+    ("GET", "/search?query=Track&limit=10"),
+    ("GET", "/tracks/{track_id}/comments"),
+    ("GET", "/tracks/{track_id}/comments/threads"),
+    ("GET", "/tracks/{track_id}/comments/{comment_id}/replies?limit=2"),
+    ("POST", "/tracks/{unliked_track_id}/like"),
+    ("DELETE", "/tracks/{unliked_track_id}/like"),
+    ("POST", "/tracks/{track_id}/play"),
+    ("POST", "/tracks/{track_id}/play-complete"),
+    ("POST", "/tracks/upload", UPLOAD),
+    ("DELETE", "/tracks/{deleted_track_id}", {"as_owner": True}),
+]
+
+def test_endpoint_queries_are_index_backed(client, catalogue, captured_statements):
+    headers = catalogue["headers"]
+    values = dict(catalogue)
+    values["tracks_cursor"] = client.get("/tracks?limit=10", headers=headers).headers["X-Next-Cursor"]
+    values["owner_cursor"] = client.get(
+        f"/tracks?owner_username={catalogue['owner']}&limit=10", headers=headers
+    ).headers["X-Next-Cursor"]
+    values["liked_cursor"] = client.get("/tracks/liked?limit=5", headers=headers).headers["X-Next-Cursor"]
+    values["search_cursor"] = client.get(
+        "/search/tracks?query=Track&limit=10", headers=headers
+    ).headers["X-Next-Cursor"]
+
+    failures = {}
+    with sqlite3.connect(main.engine.url.database) as connection:
+        for method, path, *options in REQUESTS:
+            options = dict(options[0]) if options else {}
+            as_owner = options.pop("as_owner", False)
+            captured_statements.clear()
+            url = path.format(**values)
+            response = client.request(
+                method, url, headers=catalogue["owner_headers"] if as_owner else headers, **options
+            )
+            assert response.status_code == 200, f"{method} {url}: {response.text}"
+            for statement, parameters in captured_statements:
+                problems = plan_problems(connection, statement, parameters)
+                if problems:
+                    failures.setdefault(f"{method} {path}", []).append((statement, problems))
+    assert not failures, failures
+
+def test_background_queries_are_index_backed(catalogue, captured_statements):
+    track_id = catalogue["track_id"]
+    main.flush_play_events([(track_id, f"listener-{uuid.uuid4().hex[:8]}", main.datetime.utcnow())])
+    main.load_trending()
+    with main.engine.begin() as connection:
+        main.claim_transcode_job(connection)
+        main.blob_store.release(connection, "/uploads/blobs/ab/cd/abcd.mp3")
+        connection.rollback()
+
+    with sqlite3.connect(main.engine.url.database) as connection:
+        failures = [
+            (statement, problems)
+            for statement, parameters in captured_statements
+            for problems in [plan_problems(connection, statement, parameters)]
+            if problems
+        ]
+    assert not failures, failures
@@ -0,0 +1,70 @@
+import main
+
+def test_cached_response_is_served_from_cache(client, register, add_tracks):
+    owner, headers = register("owner")
+    track_id = add_tracks(owner, 1)[0]
+
+    first = client.get(f"/tracks/{track_id}", headers=headers)
+    hits = main.response_cache.metrics()["hits"]
+    second = client.get(f"/tracks/{track_id}", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert main.response_cache.metrics()["hits"] == hits + 1
+
+def test_matching_etag_returns_not_modified(client, register):
+    username, _ = register("profile")
+    etag = client.get(f"/users/{username}").headers["etag"]
+
+    response = client.get(f"/users/{username}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # Слабое сравнение и список тегов
+    response = client.get(f"/users/{username}", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+    response = client.get(f"/users/{username}", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+def test_like_invalidates_cached_track(client, register, add_tracks):
+    owner, _ = register("owner")
+    _, headers = register("listener")
+    track_id = add_tracks(owner, 1)[0]
+
+    before = client.get(f"/tracks/{track_id}", headers=headers)
+    assert before.json()["is_liked"] is False
+
+    client.post(f"/tracks/{track_id}/like", headers=headers)
+    after = client.get(f"/tracks/{track_id}", headers={**headers, "If-None-Match": before.headers["etag"]})
+
+    assert after.status_code == 200
+    assert after.json()["is_liked"] is True
+    assert after.json()["likes_count"] == before.json()["likes_count"] + 1
+    assert after.headers["etag"] != before.headers["etag"]
+
+def test_comment_invalidates_cached_comments(client, register, add_tracks):
+    owner, headers = register("owner")
+    track_id = add_tracks(owner, 1)[0]
+
+    before = client.get(f"/tracks/{track_id}/comments")
+    assert before.json() == []
+
+    client.post(f"/tracks/{track_id}/comments", headers=headers, json={"text": "Hello"})
+    after = client.get(f"/tracks/{track_id}/comments", headers={"If-None-Match": before.headers["etag"]})
+
+    assert after.status_code == 200
+    assert [comment["text"] for comment in after.json()] == ["Hello"]
+
+def test_profile_update_invalidates_cached_profile(client, register):
+    username, headers = register("profile")
+    before = client.get(f"/users/{username}")
+
+    client.put("/users/me", headers=headers, json={"nickname": "Renamed"})
+    after = client.get(f"/users/{username}", headers={"If-None-Match": before.headers["etag"]})
+
+    assert after.status_code == 200
+    assert after.json()["nickname"] == "Renamed"
+    assert after.headers["etag"] != before.headers["etag"]
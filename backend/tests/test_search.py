@@ -0,0 +1,24 @@
+import uuid
+
+from sqlalchemy import text
+
+import main
+
+def test_reconciliation_rebuilds_search_index_after_rowid_change(client, register, add_tracks):
+    owner, headers = register("owner")
+    name = f"n{uuid.uuid4().hex[:8]}"
+    (track_id,) = add_tracks(owner, 1, name)
+
+    def found():
+        return [track["id"] for track in client.get("/search/tracks", params={"query": name}, headers=headers).json()]
+
+    assert found() == [track_id]
+    # Как после VACUUM: строка получила другой rowid, индекс о нем не знает
+    with main.engine.begin() as connection:
+        connection.execute(
+            text("UPDATE tracks SET rowid = (SELECT MAX(rowid) FROM tracks) + 1 WHERE id = :id"), {"id": track_id}
+        )
+    assert found() == []
+
+    main.run_counter_reconciliation()
+    assert found() == [track_id]
@@ -0,0 +1,108 @@
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.utils.storage import STAGING_DIR_NAME, create_storage, is_public_key, storage_response
+
+DATA = bytes(range(256)) * 64
+
+def test_local_storage_uses_configured_staging_dir(tmp_path):
+    staging_dir = tmp_path / "staging"
+    storage = create_storage("local", str(tmp_path / "root"), staging_dir=str(staging_dir))
+    assert storage.staging_path().startswith(str(staging_dir))
+
+    source = storage.staging_path()
+    with open(source, "wb") as file:
+        file.write(b"data")
+    storage.put("covers/x.png", source)
+    assert storage.stat("covers/x.png").size == 4
+
+    default = create_storage("local", str(tmp_path / "other"))
+    assert default.staging_dir == str(tmp_path / "other" / STAGING_DIR_NAME)
+
+def test_local_storage_keys_stay_under_root(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "secret.txt").write_bytes(b"secret")
+    storage = create_storage("local", str(tmp_path / "root"))
+    os.symlink(outside, tmp_path / "root" / "link")
+
+    for key in ("../outside/secret.txt", "covers/../../outside/secret.txt", "link/secret.txt"):
+        assert storage.stat(key) is None
+        with pytest.raises(ValueError):
+            storage.path(key)
+    for key in ("..\\outside\\secret.txt", "C:/secret.txt", "covers/.hidden", "covers//x.png"):
+        assert not is_public_key(key)
+    assert is_public_key("covers/x.png")
+
+def test_uploaded_file_rejects_escaping_keys(client):
+    assert client.get("/uploads/..%2F..%2Fetc%2Fpasswd").status_code == 404
+    assert client.get("/uploads/covers/..%5C..%5Csecret").status_code == 404
+
+@pytest.fixture
+def s3_storage(monkeypatch, tmp_path):
+    for name, value in {
+        "AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing", "AWS_DEFAULT_REGION": "us-east-1",
+    }.items():
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="audiobridge")
+        yield create_storage(
+            "s3", bucket="audiobridge", prefix="media", region_name="us-east-1", staging_dir=str(tmp_path)
+        )
+
+def put_bytes(storage, key: str, data: bytes) -> None:
+    source = storage.staging_path()
+    with open(source, "wb") as file:
+        file.write(data)
+    storage.put(key, source)
+    assert not os.path.exists(source)
+
+def test_s3_storage_operations(s3_storage):
+    assert s3_storage.stat("blobs/ab/missing.mp3") is None
+    put_bytes(s3_storage, "blobs/ab/one.mp3", DATA)
+    put_bytes(s3_storage, "covers/x.png", b"png")
+
+    stored = s3_storage.stat("blobs/ab/one.mp3")
+    assert (stored.key, stored.size) == ("blobs/ab/one.mp3", len(DATA))
+    assert b"".join(s3_storage.get_range("blobs/ab/one.mp3", 10, 19)) == DATA[10:20]
+    assert [item.key for item in s3_storage.list("blobs/")] == ["blobs/ab/one.mp3"]
+
+    s3_storage.move("blobs/ab/one.mp3", "blobs/ab/two.mp3")
+    assert s3_storage.stat("blobs/ab/one.mp3") is None
+    assert s3_storage.stat("blobs/ab/two.mp3").size == len(DATA)
+
+    copy = s3_storage.local_copy("blobs/ab/two.mp3")
+    with open(copy.path, "rb") as file:
+        assert file.read() == DATA
+    copy.release()
+
+    s3_storage.delete("blobs/ab/two.mp3")
+    assert s3_storage.stat("blobs/ab/two.mp3") is None
+    assert sorted(item.key for item in s3_storage.list("")) == ["covers/x.png"]
+
+def test_s3_storage_response_ranges(s3_storage):
+    put_bytes(s3_storage, "blobs/ab/one.mp3", DATA)
+
+    async def serve(request):
+        return await storage_response(request, s3_storage, s3_storage.stat("blobs/ab/one.mp3"), "audio/mpeg")
+
+    client = TestClient(Starlette(routes=[Route("/file", serve)]))
+
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == DATA
+
+    response = client.get("/file", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+    assert response.content == DATA[100:200]
+
+    response = client.get("/file", headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
@@ -0,0 +1,58 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.utils.streaming import range_file_response
+
+DATA = bytes(range(256)) * 40
+
+@pytest.fixture
+def file_client(tmp_path):
+    path = tmp_path / "track.mp3"
+    path.write_bytes(DATA)
+
+    async def serve(request):
+        return await range_file_response(request, str(path), "audio/mpeg")
+
+    return TestClient(Starlette(routes=[Route("/file", serve, methods=["GET", "HEAD"])]))
+
+def test_single_range_is_partial_content(file_client):
+    response = file_client.get("/file", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+    assert response.headers["content-length"] == "100"
+    assert response.content == DATA[100:200]
+
+    response = file_client.get("/file", headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.content == DATA[-10:]
+
+def test_unsatisfiable_range(file_client):
+    response = file_client.get("/file", headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+def test_if_range_mismatch_returns_whole_file(file_client):
+    etag = file_client.head("/file").headers["etag"]
+    response = file_client.get("/file", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+
+    response = file_client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+def test_multiple_ranges_are_multipart(file_client):
+    response = file_client.get("/file", headers={"Range": "bytes=0-9,1000-1019"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    parts = response.content.split(b"--" + boundary)
+    assert parts[-1].strip() == b"--"
+    bodies = [part.split(b"\r\n\r\n", 1) for part in parts[1:-1]]
+    assert [b"Content-Range: bytes 0-9/" in head for head, _ in bodies] == [True, False]
+    # Каждая часть отделена от следующей границы CRLF
+    assert [body[:-2] for _, body in bodies] == [DATA[0:10], DATA[1000:1020]]
@@ -0,0 +1,20 @@
+import uuid
+
+from sqlalchemy import text
+
+import main
+from app.media import transcode
+
+def test_stale_job_without_attempts_left_is_failed():
+    sha256 = uuid.uuid4().hex * 2
+    stale = main.datetime.utcnow() - transcode.TRANSCODE_JOB_TIMEOUT - main.timedelta(minutes=1)
+    with main.engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO transcode_jobs (blob_sha256, status, attempts, available_at, updated_at) "
+            "VALUES (:sha256, 'running', :attempts, :stale, :stale)"
+        ), {"sha256": sha256, "attempts": transcode.TRANSCODE_MAX_ATTEMPTS, "stale": stale})
+
+        claimed = transcode.claim_transcode_job(connection)
+        assert claimed is None or claimed[0] != sha256
+        assert transcode.transcode_status(connection, sha256)["status"] == "failed"
+        connection.rollback()
@@ -0,0 +1,84 @@
+import asyncio
+
+import main
+from app.utils.uploads import MULTIPART_OVERHEAD_BYTES
+
+def test_new_upload_has_placeholder_duration(client, register):
+    _, headers = register("uploader")
+    response = client.post(
+        "/tracks/upload",
+        headers=headers,
+        files={"file": ("song.mp3", b"\xff\xfb\x90\x00" * 100, "audio/mpeg")},
+        data={"name": "Song"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["duration"] == "0:00"
+
+def limited_client(limit: int):
+    from fastapi import FastAPI, File, UploadFile
+    from fastapi.testclient import TestClient
+    from app.utils.uploads import RequestBodyLimitMiddleware
+
+    handled = []
+    app = FastAPI()
+    app.add_middleware(RequestBodyLimitMiddleware, limits={"/upload": limit})
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        handled.append(file.filename)
+        return {"size": len(await file.read())}
+
+    return TestClient(app), handled
+
+def test_oversized_upload_is_rejected_by_content_length():
+    client, handled = limited_client(1024)
+    response = client.post("/upload", files={"file": ("big.mp3", b"x" * 4096, "audio/mpeg")})
+    assert response.status_code == 413
+    assert handled == []
+
+    response = client.post("/upload", files={"file": ("small.mp3", b"x" * 100, "audio/mpeg")})
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+def test_oversized_chunked_upload_is_rejected_while_streaming():
+    # TestClient собирает тело целиком до вызова приложения, поэтому чтение
+    # потока проверяется прямым вызовом ASGI-приложения
+    client, handled = limited_client(1024)
+    boundary = "limit-boundary"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.mp3\"\r\n"
+            "Content-Type: audio/mpeg\r\n\r\n").encode()
+    chunks = [head] + [b"x" * 512] * 100 + [f"\r\n--{boundary}--\r\n".encode()]
+    received = []
+    sent = []
+
+    async def receive():
+        body = chunks[len(received)]
+        received.append(body)
+        return {"type": "http.request", "body": body, "more_body": len(received) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/upload", "raw_path": b"/upload", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())],
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    asyncio.run(client.app(scope, receive, send))
+
+    assert sent[0]["type"] == "http.response.start"
+    assert sent[0]["status"] == 413
+    assert handled == []
+    # Прием прерван сразу после превышения лимита, а не после всего тела
+    assert len(received) < 5
+
+def test_app_limits_upload_bodies(client, register):
+    _, headers = register("uploader")
+    limit = main.MAX_IMAGE_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    response = client.post(
+        "/users/me/avatar",
+        headers={**headers, "Content-Length": str(limit + 1)},
+        content=b"",
+    )
+    assert response.status_code == 413
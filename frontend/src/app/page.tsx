@@ -62,7 +62,7 @@ export default function Home() {
 
   const handlePlay = async (track: ApiTrack) => {
     try {
-      const response = await apiClient.incrementPlayCount(track.id);
+      // Старт прослушивания отправляет AudioContext, засчитывается оно через /play-complete
       const audioTrack = {
         id: track.id,
         name: track.name,
@@ -72,9 +72,6 @@ export default function Home() {
         plays: track.plays
       };
       playTrack(audioTrack);
-      if (response.message === "Play count incremented") {
-        fetchTracks();
-      }
     } catch (error) {
       console.error('Error playing track:', error);
     }
@@ -8,6 +8,7 @@ import { useAuth } from '@/hooks/useAuth';
 import { useAudio } from '@/contexts/AudioContext';
 import Image from 'next/image';
 import Link from 'next/link';
+import { apiClient } from '@/lib/api';
 
 interface User {
   username: string;
@@ -45,6 +46,10 @@ export default function ProfilePage() {
   const [user, setUser] = useState<User | null>(null);
   const [tracks, setTracks] = useState<Track[]>([]);
   const [likedTracks, setLikedTracks] = useState<Track[]>([]);
+  // Профиль отдает первые страницы списков; дальше — по курсорам
+  const [tracksCursor, setTracksCursor] = useState<string | null>(null);
+  const [likedCursor, setLikedCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [stats, setStats] = useState<UserStats | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -64,9 +69,9 @@ export default function ProfilePage() {
       setError(null);
       console.log('Fetching user data for:', username);
 
-      // Fetch user profile
-      const userResponse = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL}/users/${username}`,
+      // Профиль, первые страницы треков и лайков и статистика — одним запросом
+      const profileResponse = await fetch(
+        `${process.env.NEXT_PUBLIC_API_URL}/users/${encodeURIComponent(username)}/profile`,
         {
           headers: {
             'Authorization': `Bearer ${localStorage.getItem('access_token')}`
@@ -74,8 +79,8 @@ export default function ProfilePage() {
         }
       );
 
-      if (!userResponse.ok) {
-        if (userResponse.status === 404) {
+      if (!profileResponse.ok) {
+        if (profileResponse.status === 404) {
           setError('Пользователь не найден');
         } else {
           setError('Ошибка при загрузке профиля');
@@ -83,70 +88,14 @@ export default function ProfilePage() {
         return;
       }
 
-      const userData = await userResponse.json();
-      console.log('User data received:', userData);
-      setUser(userData);
-
-      // Fetch user tracks
-      const tracksUrl = `${process.env.NEXT_PUBLIC_API_URL}/tracks?owner_username=${encodeURIComponent(username)}`;
-      console.log('Fetching tracks from:', tracksUrl);
-      const tracksResponse = await fetch(tracksUrl, {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('access_token')}`
-        }
-      });
-      if (tracksResponse.ok) {
-        const tracksData = await tracksResponse.json();
-        console.log('Tracks data received:', tracksData);
-        setTracks(tracksData || []);
-      } else {
-        console.error('Error fetching tracks:', await tracksResponse.text());
-        setTracks([]);
-      }
-
-      // Fetch liked tracks for any user
-      console.log('Fetching liked tracks for user:', username);
-      try {
-        const likedResponse = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/users/${encodeURIComponent(username)}/liked`,
-          {
-            headers: {
-              'Authorization': `Bearer ${localStorage.getItem('access_token')}`
-            }
-          }
-        );
-        
-        if (likedResponse.ok) {
-          const likedData = await likedResponse.json();
-          console.log('Liked tracks data received:', likedData);
-          setLikedTracks(Array.isArray(likedData) ? likedData : []);
-        } else {
-          const errorText = await likedResponse.text();
-          console.error('Error fetching liked tracks:', errorText);
-          setLikedTracks([]);
-        }
-      } catch (error) {
-        console.error('Error fetching liked tracks:', error);
-        setLikedTracks([]);
-      }
-
-      // Fetch user stats
-      const statsResponse = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL}/users/${username}/stats`,
-        {
-          headers: {
-            'Authorization': `Bearer ${localStorage.getItem('access_token')}`
-          }
-        }
-      );
-      if (statsResponse.ok) {
-        const statsData = await statsResponse.json();
-        console.log('Stats data received:', statsData);
-        setStats(statsData);
-      } else {
-        console.error('Error fetching stats:', await statsResponse.text());
-        setStats({ total_tracks: 0, total_plays: 0, total_likes: 0 });
-      }
+      const profileData = await profileResponse.json();
+      console.log('Profile data received:', profileData);
+      setUser(profileData.user);
+      setTracks(Array.isArray(profileData.tracks) ? profileData.tracks : []);
+      setLikedTracks(Array.isArray(profileData.liked) ? profileData.liked : []);
+      setTracksCursor(profileData.tracks_next_cursor || null);
+      setLikedCursor(profileData.liked_next_cursor || null);
+      setStats(profileData.stats || { total_tracks: 0, total_plays: 0, total_likes: 0 });
     } catch (error) {
       console.error('Error fetching user data:', error);
       setError('Ошибка при загрузке данных');
@@ -158,6 +107,34 @@ export default function ProfilePage() {
     }
   };
 
+  // Следующая страница дописывается в конец; уже показанные треки не дублируются
+  const appendTracks = (prev: Track[], page: Track[]) => {
+    const seen = new Set(prev.map(track => track.id));
+    return [...prev, ...page.filter(track => !seen.has(track.id))];
+  };
+
+  const loadMore = async () => {
+    const isTracks = activeTab === 'tracks';
+    const cursor = isTracks ? tracksCursor : likedCursor;
+    if (!cursor || isLoadingMore) return;
+    try {
+      setIsLoadingMore(true);
+      if (isTracks) {
+        const page = await apiClient.getTracksPage({ ownerUsername: username, cursor });
+        setTracks(prev => appendTracks(prev, page.items as Track[]));
+        setTracksCursor(page.nextCursor);
+      } else {
+        const page = await apiClient.getLikedTracksPage({ username, cursor });
+        setLikedTracks(prev => appendTracks(prev, page.items as Track[]));
+        setLikedCursor(page.nextCursor);
+      }
+    } catch (error) {
+      console.error('Error loading more tracks:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handlePlayPause = async (track: Track) => {
     if (isPlaying && currentTrack?.id === track.id) {
       togglePlayPause();
@@ -196,7 +173,7 @@ export default function ProfilePage() {
         } else {
           const trackToAdd = tracks.find(track => track.id === trackId);
           if (trackToAdd) {
-            setLikedTracks(prev => [...prev, { ...trackToAdd, is_liked: true }]);
+            setLikedTracks(prev => appendTracks(prev, [{ ...trackToAdd, is_liked: true }]));
           }
         }
       }
@@ -289,6 +266,18 @@ export default function ProfilePage() {
         </div>
       ))}
 
+      {(activeTab === 'tracks' ? tracksCursor : likedCursor) && (
+        <div className="text-center">
+          <button
+            onClick={loadMore}
+            disabled={isLoadingMore}
+            className="px-6 py-2 rounded-full border border-gray-600 text-sm text-gray-300 hover:text-white hover:border-white transition-colors disabled:opacity-50"
+          >
+            {isLoadingMore ? 'Загрузка...' : 'Показать еще'}
+          </button>
+        </div>
+      )}
+
       {tracksList.length === 0 && (
         <div className="text-center py-8 text-gray-400">
           {activeTab === 'tracks' ? 'У пользователя пока нет треков' : 'Нет лайкнутых треков'}
@@ -1,5 +1,6 @@
 "use client"
 import React, { createContext, useContext, useState, useEffect, useRef } from 'react';
+import { apiClient } from '@/lib/api';
 
 interface Track {
   id: string;
@@ -173,8 +174,10 @@ export function AudioProvider({ children }: { children: React.ReactNode }) {
     try {
       if (currentTrack?.id !== track.id) {
         await sendPlayComplete();
-        audioRef.current.src = `${process.env.NEXT_PUBLIC_API_URL}${track.file_path}`;
+        audioRef.current.src = `${process.env.NEXT_PUBLIC_API_URL}/tracks/${track.id}/stream`;
         setCurrentTrack(track);
+        // Сервер запоминает время старта и засчитает прослушивание по /play-complete
+        apiClient.startPlay(track.id).catch(error => console.error('Error starting play:', error));
       }
       await audioRef.current.play();
       setIsPlaying(true);
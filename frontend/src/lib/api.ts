@@ -13,6 +13,7 @@ export const api = {
     updateMe: `${API_BASE_URL}/users/me`,
     uploadAvatar: `${API_BASE_URL}/users/me/avatar`,
     getStats: `${API_BASE_URL}/users/me/stats`,
+    liked: (username: string) => `${API_BASE_URL}/users/${encodeURIComponent(username)}/liked`,
   },
   tracks: {
     upload: `${API_BASE_URL}/tracks/upload`,
@@ -47,6 +48,13 @@ export interface Track {
   is_liked: boolean;
 }
 
+// Страница списка: курсор следующей страницы сервер отдает в заголовке X-Next-Cursor,
+// null — страниц больше нет
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
 export interface UserStats {
   total_tracks: number;
   total_plays: number;
@@ -62,6 +70,26 @@ export const getAuthHeaders = () => {
   };
 };
 
+// Без limit и cursor сервер отдает список целиком, с ними — постранично
+const fetchPage = async <T>(url: string, params: Record<string, string | number | null | undefined>): Promise<Page<T>> => {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== null && value !== undefined) {
+      query.append(key, String(value));
+    }
+  });
+  const response = await fetch(`${url}?${query}`, {
+    headers: getAuthHeaders(),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to fetch page');
+  }
+  return {
+    items: await response.json(),
+    nextCursor: response.headers.get('X-Next-Cursor'),
+  };
+};
+
 // Базовые функции для работы с API
 export const apiClient = {
   // Аутентификация
@@ -166,6 +194,13 @@ export const apiClient = {
     return Array.isArray(data) ? data : [];
   },
 
+  getTracksPage: (params: { ownerUsername?: string; cursor?: string | null; limit?: number } = {}) =>
+    fetchPage<Track>(api.tracks.list, {
+      owner_username: params.ownerUsername,
+      cursor: params.cursor,
+      limit: params.limit ?? 50,
+    }),
+
   deleteTrack: async (id: string) => {
     const response = await fetch(api.tracks.delete(id), {
       method: 'DELETE',
@@ -197,7 +232,15 @@ export const apiClient = {
     return response.json();
   },
 
-  incrementPlayCount: async (id: string) => {
+  // С username — лайки другого пользователя (/users/{username}/liked)
+  getLikedTracksPage: (params: { username?: string; cursor?: string | null; limit?: number } = {}) =>
+    fetchPage<Track>(params.username ? api.profile.liked(params.username) : api.tracks.liked, {
+      cursor: params.cursor,
+      limit: params.limit ?? 50,
+    }),
+
+  // Старт прослушивания; счетчик увеличивает /tracks/{id}/play-complete
+  startPlay: async (id: string) => {
     const response = await fetch(api.tracks.play(id), {
       method: 'POST',
       headers: getAuthHeaders(),